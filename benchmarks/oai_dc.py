@@ -0,0 +1,76 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Benchmark the ``oai_dc`` serializers.
+
+Compares the MARC21 and XSLT path of :func:`invenio_oaiserver.utils.dumps_etree`
+with :func:`invenio_oaiserver.oai_dc.dumps_oai_dc` on the bibliographic test
+records of Invenio-Records, and checks that both produce the same elements.
+
+.. code-block:: console
+
+    $ python benchmarks/oai_dc.py
+"""
+
+import json
+import os
+import timeit
+from copy import deepcopy
+from importlib.resources import files
+
+from dojson.contrib.marc21 import marc21
+from dojson.contrib.marc21.utils import load
+from lxml import etree
+
+from invenio_oaiserver.oai_dc import dumps_oai_dc
+from invenio_oaiserver.utils import dumps_etree
+
+XSLT_FILENAME = os.path.join(
+    files("invenio_oaiserver"), "static/xsl/MARC21slim2OAIDC.xsl"
+)
+
+
+def load_hits():
+    """Load the test records as search hits."""
+    records = load(files("invenio_records") / "data/marc21/bibliographic.xml")
+    return [
+        {"_source": json.loads(json.dumps(dict(marc21.do(record))))}
+        for record in records
+    ]
+
+
+def canonical(element):
+    """Return the canonical form of an element."""
+    return etree.tostring(element, method="c14n", exclusive=True)
+
+
+def main(number=3):
+    """Run the benchmark."""
+    hits = load_hits()
+
+    # dojson pops the ``__order__`` of the records it converts
+    different = [
+        index
+        for index, hit in enumerate(hits)
+        if canonical(dumps_etree(None, deepcopy(hit), xslt_filename=XSLT_FILENAME))
+        != canonical(dumps_oai_dc(None, hit))
+    ]
+    print("{0} records, {1} different".format(len(hits), len(different)))
+
+    for name, dumper, kwargs in [
+        ("dumps_etree (MARC21 + XSLT)", dumps_etree, {"xslt_filename": XSLT_FILENAME}),
+        ("dumps_oai_dc", dumps_oai_dc, {}),
+    ]:
+        copies = [deepcopy(hits) for _ in range(number)]
+        seconds = min(
+            timeit.repeat(
+                lambda: [dumper(None, hit, **kwargs) for hit in copies.pop()],
+                number=1,
+                repeat=number,
+            )
+        )
+        print("{0:<30} {1:8.2f} ms/record".format(name, seconds * 1000 / len(hits)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Benchmark the resumption token layouts.
+
+Compares the length and the encode and decode throughput of the tokens of
+:mod:`invenio_oaiserver.resumption_token`, and of the version 1 tokens with a
+new serializer per call.
+
+.. code-block:: console
+
+    $ python benchmarks/resumption_token.py
+"""
+
+import base64
+import os
+import random
+import timeit
+
+from flask import Flask
+from itsdangerous import URLSafeTimedSerializer
+
+from invenio_oaiserver import InvenioOAIServer
+from invenio_oaiserver.resumption_token import dumps, loads
+
+
+def _search_context_id():
+    """Return an id shaped like the scroll ids of the search cluster."""
+    shard = base64.urlsafe_b64encode(os.urandom(16))[:22]
+    node = base64.urlsafe_b64encode(os.urandom(16))[:22]
+    return base64.urlsafe_b64encode(
+        b"\x14include_context_uuid\rqueryAndFetch\x01\x16"
+        + shard
+        + b"\x00" * 7
+        + b"\x01\x16"
+        + node
+    ).decode("ascii")
+
+
+DATA = dict(
+    page=42,
+    kwargs={"metadataPrefix": "oai_dc", "set": "user-community", "from": "2020-01-01"},
+    search_after=[1577836800000, "0f4a6a4c-5b0c-4a8e-9d3c-1b2e3f4a5b6c"],
+    scroll_id=_search_context_id(),
+)
+
+
+def report(name, function, number=20000):
+    """Print the throughput of a function."""
+    seconds = min(timeit.repeat(function, number=number, repeat=5))
+    print("{0:<24} {1:10.0f} ops/s".format(name, number / seconds))
+
+
+def main():
+    """Run the benchmark."""
+    app = Flask("benchmark")
+    app.config.update(SECRET_KEY="benchmark", OAISERVER_ID_PREFIX="oai:benchmark:")
+    InvenioOAIServer(app)
+
+    def dumps_uncached():
+        serializer = URLSafeTimedSerializer(
+            app.config["SECRET_KEY"], salt="ListRecords"
+        )
+        return serializer.dumps(dict(DATA, seed=random.random()))
+
+    def loads_uncached(token):
+        serializer = URLSafeTimedSerializer(
+            app.config["SECRET_KEY"], salt="ListRecords"
+        )
+        return serializer.loads(token, max_age=60)
+
+    with app.app_context():
+        token = dumps_uncached()
+        print("{0:<24} {1:10d} bytes".format("version 1", len(token)))
+        report("encode uncached", dumps_uncached)
+        report("decode uncached", lambda: loads_uncached(token))
+
+        for version in (1, 2):
+            app.config["OAISERVER_RESUMPTION_TOKEN_VERSION"] = version
+            token = dumps("ListRecords", DATA)
+            assert {
+                key: value
+                for key, value in loads("ListRecords", token, max_age=60).items()
+                if key != "seed"
+            } == DATA
+            print(
+                "{0:<24} {1:10d} bytes".format(
+                    "version {0}".format(version), len(token)
+                )
+            )
+            report(
+                "encode version {0}".format(version), lambda: dumps("ListRecords", DATA)
+            )
+            report(
+                "decode version {0}".format(version),
+                lambda: loads("ListRecords", token, max_age=60),
+            )
+
+
+if __name__ == "__main__":
+    main()
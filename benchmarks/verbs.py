@@ -0,0 +1,83 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Benchmark the validation of the OAI-PMH requests.
+
+Compares :func:`invenio_oaiserver.verbs.make_request_validator` with the
+initialization of a new schema per request, and the parsing of the OAI-PMH
+datestamps with the parser of dateutil.
+
+.. code-block:: console
+
+    $ python benchmarks/verbs.py
+"""
+
+import timeit
+
+from dateutil import parser
+from flask import Flask, request
+
+from invenio_oaiserver import InvenioOAIServer
+from invenio_oaiserver.verbs import (
+    DateTime,
+    Verbs,
+    allowed_arguments,
+    check_extra_params_in_request,
+    make_request_validator,
+)
+
+QUERY_STRING = "verb=ListRecords&metadataPrefix=oai_dc&from=2020-01-01&until=2021-01-01"
+
+DATESTAMPS = ["2020-01-01", "2021-01-01T00:00:00Z"]
+
+
+def new_request_validator(request):
+    """Validate the request with a new schema, as before the cache."""
+    verb = getattr(Verbs, request.values["verb"])(partial=False)
+    check_extra_params_in_request(verb, allowed_arguments(verb))
+    return verb
+
+
+def report(name, function, number):
+    """Print the time per call of a function."""
+    seconds = min(timeit.repeat(function, number=number, repeat=5))
+    print("{0:<32} {1:8.2f} us".format(name, seconds / number * 1e6))
+
+
+def main():
+    """Run the benchmark."""
+    app = Flask("benchmark")
+    app.config.update(SECRET_KEY="benchmark", OAISERVER_ID_PREFIX="oai:benchmark:")
+    InvenioOAIServer(app)
+
+    with app.test_request_context("/oai2d?" + QUERY_STRING):
+        arguments = request.values.to_dict()
+        report("new schema", lambda: new_request_validator(request), 2000)
+        report("cached schema", lambda: make_request_validator(request), 2000)
+        report(
+            "new schema and load",
+            lambda: new_request_validator(request).load(arguments),
+            2000,
+        )
+        report(
+            "cached schema and load",
+            lambda: make_request_validator(request).load(arguments),
+            2000,
+        )
+
+    for datestamp in DATESTAMPS:
+        assert DateTime.from_iso_permissive(datestamp) == parser.parse(datestamp)
+        report(
+            "dateutil " + datestamp,
+            lambda: parser.parse(datestamp),
+            20000,
+        )
+        report(
+            "permissive " + datestamp,
+            lambda: DateTime.from_iso_permissive(datestamp),
+            20000,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Create resumption token table."""
+
+import sqlalchemy as sa
+from alembic import op
+from invenio_db.shared import UTCDateTime
+
+# revision identifiers, used by Alembic.
+revision = "3c1b5e8f2a47"
+down_revision = "f9b1e3f7d3b1"
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.create_table(
+        "oaiserver_resumption_token",
+        sa.Column("created", UTCDateTime(), nullable=False),
+        sa.Column("updated", UTCDateTime(), nullable=False),
+        sa.Column("token", sa.String(length=64), nullable=False),
+        sa.Column("verb", sa.String(length=32), nullable=False),
+        sa.Column("data", sa.JSON(), nullable=False),
+        sa.Column("expires", UTCDateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("token", name=op.f("pk_oaiserver_resumption_token")),
+    )
+    op.create_index(
+        op.f("ix_oaiserver_resumption_token_expires"),
+        "oaiserver_resumption_token",
+        ["expires"],
+        unique=False,
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_index(
+        op.f("ix_oaiserver_resumption_token_expires"),
+        table_name="oaiserver_resumption_token",
+    )
+    op.drop_table("oaiserver_resumption_token")
@@ -0,0 +1,272 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Caches of serialized record fragments and response pages.
+
+The ``<metadata/>`` and ``<about/>`` elements of a record only change with
+the record, so they are cached as bytes under a key made of the record id,
+the record version and the metadata prefix.
+
+The response to a resumption token is cached under the verb and the token,
+so that a harvester retrying a request gets the same page again.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from .proxies import current_oaiserver
+
+
+def fragment_key(record_id, version, metadata_prefix):
+    """Return the cache key of the serialized fragments of a record."""
+    return "{0}:{1}:{2}".format(record_id, version, metadata_prefix)
+
+
+def page_key(verb, token):
+    """Return the cache key of the response to a resumption token."""
+    return "{0}:{1}".format(verb, token)
+
+
+class TimedLRUCache(object):
+    """In-process cache of at most ``max_entries`` values expiring in time.
+
+    The least recently used values are evicted when the cache is full, and
+    the expired values whenever a value is added.
+    """
+
+    def __init__(self, max_entries):
+        """Initialize the cache.
+
+        :param max_entries: The maximum number of cached values.
+        """
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of cached values."""
+        return len(self._data)
+
+    def get(self, key):
+        """Return an unexpired value and mark it as recently used, or ``None``."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, timeout):
+        """Cache a value for ``timeout`` seconds."""
+        if self.max_entries <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for expired in [k for k, (_, exp) in self._data.items() if exp <= now]:
+                del self._data[expired]
+            self._data[key] = (value, now + timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        """Remove a value."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove all the values."""
+        with self._lock:
+            self._data.clear()
+
+
+class Cache(object):
+    """Base class of the caches of serialized bytes."""
+
+    def __init__(self, app):
+        """Initialize the cache.
+
+        :param app: An instance of :class:`flask.Flask`.
+        """
+        self.app = app
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached value or ``None``."""
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def _get(self, key):
+        """Return the cached value or ``None``."""
+        raise NotImplementedError()
+
+    def set(self, key, value):
+        """Cache a value."""
+        raise NotImplementedError()
+
+
+class LRUCache(Cache):
+    """In-process cache evicting the least recently used values.
+
+    The cache holds at most the bytes given by ``max_size_config``.
+    """
+
+    max_size_config = None
+    """Configuration of the maximum size in bytes of the cache."""
+
+    timeout_config = None
+    """Configuration of the timeout in seconds of the values, if any."""
+
+    def __init__(self, app):
+        """Initialize the cache."""
+        super(LRUCache, self).__init__(app)
+        self.max_size = app.config[self.max_size_config]
+        self.timeout = app.config[self.timeout_config] if self.timeout_config else None
+        self.size = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of cached values."""
+        return len(self._data)
+
+    @staticmethod
+    def _size(value):
+        """Return the size in bytes of a value."""
+        return len(value)
+
+    def _get(self, key):
+        """Return the cached value and mark it as recently used."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                self._pop(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def _pop(self, key, last=None):
+        """Remove a value, or the least recently used one, and its size."""
+        if last is None:
+            value, _ = self._data.pop(key)
+        else:
+            _, (value, _) = self._data.popitem(last=last)
+        self.size -= self._size(value)
+
+    def set(self, key, value):
+        """Cache a value and evict the least recently used ones."""
+        size = self._size(value)
+        if size > self.max_size:
+            return
+        expires = time.monotonic() + self.timeout if self.timeout else None
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (value, expires)
+            self.size += size
+            while self.size > self.max_size:
+                self._pop(None, last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all the cached values."""
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+
+class SharedCache(Cache):
+    """Cache stored in the cache server of the application.
+
+    It uses the cache given to :class:`invenio_oaiserver.ext.InvenioOAIServer`
+    and keeps the values for the seconds given by ``timeout_config``.
+    """
+
+    prefix = None
+    """Prefix of the keys in the cache server."""
+
+    timeout_config = None
+    """Configuration of the timeout in seconds of the values."""
+
+    def _key(self, key):
+        """Return the key in the cache server."""
+        return "{0}{1}::{2}".format(
+            self.app.config["OAISERVER_CACHE_KEY"], self.prefix, key
+        )
+
+    def _get(self, key):
+        """Return the value from the cache server."""
+        if current_oaiserver.cache:
+            return current_oaiserver.cache.get(self._key(key))
+
+    def set(self, key, value):
+        """Store a value in the cache server."""
+        if current_oaiserver.cache:
+            current_oaiserver.cache.set(
+                self._key(key),
+                value,
+                timeout=self.app.config[self.timeout_config],
+            )
+
+
+class LRUFragmentCache(LRUCache):
+    """In-process cache of the serialized fragments of the records.
+
+    A value is the tuple of the fragments of a record, and the cache holds at
+    most ``OAISERVER_FRAGMENT_CACHE_MAX_SIZE`` bytes.
+    """
+
+    max_size_config = "OAISERVER_FRAGMENT_CACHE_MAX_SIZE"
+
+    @staticmethod
+    def _size(value):
+        """Return the size in bytes of the fragments."""
+        return sum(len(fragment) for fragment in value)
+
+
+class SharedFragmentCache(SharedCache):
+    """Cache of the serialized fragments of the records in the cache server.
+
+    The fragments are kept for ``OAISERVER_FRAGMENT_CACHE_TIMEOUT`` seconds.
+    """
+
+    prefix = "fragments"
+
+    timeout_config = "OAISERVER_FRAGMENT_CACHE_TIMEOUT"
+
+
+class LRUPageCache(LRUCache):
+    """In-process cache of the responses to the resumption tokens.
+
+    A value is the body of a response, and the cache holds at most
+    ``OAISERVER_PAGE_CACHE_MAX_SIZE`` bytes for
+    ``OAISERVER_PAGE_CACHE_TIMEOUT`` seconds.
+    """
+
+    max_size_config = "OAISERVER_PAGE_CACHE_MAX_SIZE"
+
+    timeout_config = "OAISERVER_PAGE_CACHE_TIMEOUT"
+
+
+class SharedPageCache(SharedCache):
+    """Cache of the responses to the resumption tokens in the cache server.
+
+    The pages are kept for ``OAISERVER_PAGE_CACHE_TIMEOUT`` seconds.
+    """
+
+    prefix = "pages"
+
+    timeout_config = "OAISERVER_PAGE_CACHE_TIMEOUT"
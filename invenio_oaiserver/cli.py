@@ -0,0 +1,134 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+
+"""CLI for Invenio-OAIServer."""
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+
+@click.group()
+def oaiserver():
+    """OAI-PMH server commands."""
+
+
+@oaiserver.command("init-percolators")
+@with_appcontext
+def init_percolators():
+    """Create and verify the percolator indices of the OAI record indices."""
+    from .percolator import init_percolator_indices
+
+    for percolator_index in init_percolator_indices():
+        click.secho("Percolator index {0} is ready.".format(percolator_index))
+
+
+@oaiserver.command("prerender")
+@with_appcontext
+def prerender():
+    """Reindex all the records to store their pre-rendered metadata formats."""
+    from .tasks import prerender_records
+
+    if not current_app.config["OAISERVER_PRERENDER_FORMATS"]:
+        raise click.UsageError("OAISERVER_PRERENDER_FORMATS is not configured.")
+    prerender_records()
+    click.secho("Records scheduled for reindexing.")
+
+
+@oaiserver.command("check-prerendered")
+@click.option(
+    "--metadata-prefix",
+    "-p",
+    multiple=True,
+    help="Check only the given metadata formats.",
+)
+@with_appcontext
+def check_prerendered(metadata_prefix):
+    """Compare the pre-rendered metadata formats with the live serializers."""
+    from .proxies import current_oaiserver
+    from .response import render_fragments
+
+    prefixes = metadata_prefix or current_app.config["OAISERVER_PRERENDER_FORMATS"]
+    search = current_oaiserver.search_cls(
+        index=current_app.config["OAISERVER_RECORD_INDEX"],
+    ).params(version=True)
+
+    errors = 0
+    for hit in search.scan():
+        source = hit.to_dict()
+        rendered = source["_oai"].pop("rendered", {})
+        record = {"_id": hit.meta.id, "_version": hit.meta.version, "_source": source}
+        pid = current_oaiserver.oaiid_fetcher(hit.meta.id, source)
+        for prefix in prefixes:
+            if prefix not in rendered:
+                status = "missing"
+            elif rendered[prefix] != render_fragments(pid, record, prefix):
+                status = "outdated"
+            else:
+                continue
+            errors += 1
+            click.secho("{0} {1}: {2}".format(pid.pid_value, prefix, status), fg="red")
+
+    if errors:
+        raise click.ClickException("{0} pre-rendered formats differ.".format(errors))
+    click.secho("All pre-rendered formats are up to date.", fg="green")
+
+
+@oaiserver.group()
+def tokens():
+    """Resumption token commands."""
+
+
+def _token_store():
+    """Return the configured token store or fail."""
+    from .proxies import current_oaiserver
+
+    if current_oaiserver.token_store is None:
+        raise click.UsageError("OAISERVER_RESUMPTION_TOKEN_STORE is not configured.")
+    return current_oaiserver.token_store
+
+
+@tokens.command("list")
+@with_appcontext
+def list_tokens():
+    """List the active resumption tokens."""
+    try:
+        entries = _token_store().active()
+    except NotImplementedError as e:
+        raise click.ClickException(str(e))
+    for token, verb, data, expires in entries:
+        click.secho(
+            "{0} {1} page={2} {3} expires={4}".format(
+                token,
+                verb,
+                data.get("page"),
+                " ".join(
+                    "{0}={1}".format(key, value)
+                    for key, value in sorted(data.get("kwargs", {}).items())
+                ),
+                expires.isoformat(),
+            )
+        )
+
+
+@tokens.command("sweep")
+@with_appcontext
+def sweep_tokens():
+    """Remove the expired resumption tokens and clear their search contexts."""
+    from .token_store import expire_tokens
+
+    _token_store()
+    click.secho("Removed {0} expired tokens.".format(expire_tokens()))
+
+
+@tokens.command("revoke")
+@click.argument("token")
+@with_appcontext
+def revoke(token):
+    """Remove a resumption token and clear its search context."""
+    from .token_store import revoke_token
+
+    _token_store()
+    if not revoke_token(token):
+        raise click.ClickException("Unknown or expired token.")
+    click.secho("Token revoked.")
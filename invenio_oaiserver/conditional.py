@@ -0,0 +1,115 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+
+"""HTTP validators of the OAI-PMH responses.
+
+Every function computes, without serializing the response, the entity tag
+and the last modification date of the response to a verb. They only read
+the record loaded for the response, the state of the sets table or the
+configuration.
+
+The entity tags are weak, since the same tag is sent with every content
+coding of a response.
+"""
+
+import hashlib
+from datetime import timezone
+
+from flask import current_app
+from invenio_db import db
+from sqlalchemy import func
+
+from .models import OAISet
+from .provider import OAIIDProvider
+from .proxies import current_oaiserver
+
+
+def _etag(*parts):
+    """Return an entity tag made of the given values."""
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+def _utc(dt):
+    """Return a naive UTC datetime as timezone aware."""
+    return dt.replace(tzinfo=timezone.utc) if dt is not None else None
+
+
+def _record_state(identifier):
+    """Return the version and the modification date of a record."""
+    pid = OAIIDProvider.get(pid_value=identifier).pid
+    model_cls = current_oaiserver.record_cls.model_cls
+    return (
+        db.session.query(model_cls.version_id, model_cls.updated)
+        .filter(model_cls.id == pid.object_uuid)
+        .one()
+    )
+
+
+def _sets_state():
+    """Return the number of sets and the date of the last modified set."""
+    return db.session.query(func.count(OAISet.id), func.max(OAISet.updated)).one()
+
+
+def getrecord(**kwargs):
+    """Return the validators of the GetRecord response.
+
+    They are computed from the record loaded for the response.
+    """
+    from .response import getrecord_data
+
+    data = getrecord_data(kwargs["identifier"], kwargs["metadataPrefix"])
+    etag = _etag(
+        "GetRecord",
+        kwargs["identifier"],
+        kwargs["metadataPrefix"],
+        data["version"],
+        str(data["updated"]),
+        sorted(data["sets"] or []),
+    )
+    return etag, _utc(data["updated"])
+
+
+def identify(**kwargs):
+    """Return the validators of the Identify response."""
+    from .response import earliest_datestamp
+
+    cfg = current_app.config
+    etag = _etag(
+        "Identify",
+        earliest_datestamp(),
+        cfg["OAISERVER_REPOSITORY_NAME"],
+        cfg["OAISERVER_ADMIN_EMAILS"],
+        cfg["OAISERVER_COMPRESSIONS"],
+        cfg.get("OAISERVER_DESCRIPTIONS", []),
+    )
+    return etag, None
+
+
+def listmetadataformats(**kwargs):
+    """Return the validators of the ListMetadataFormats response."""
+    formats = sorted(
+        (prefix, metadata["schema"], metadata["namespace"])
+        for prefix, metadata in current_app.config["OAISERVER_METADATA_FORMATS"].items()
+    )
+    if "identifier" not in kwargs:
+        return _etag("ListMetadataFormats", formats), None
+
+    version_id, updated = _record_state(kwargs["identifier"])
+    etag = _etag("ListMetadataFormats", formats, kwargs["identifier"], version_id)
+    return etag, _utc(updated)
+
+
+def listsets(**kwargs):
+    """Return the validators of the ListSets response."""
+    count, updated = _sets_state()
+    token = kwargs.get("resumptionToken", {}).get("token")
+    return _etag("ListSets", token, count, updated), _utc(updated)
+
+
+VALIDATORS = {
+    "GetRecord": getrecord,
+    "Identify": identify,
+    "ListMetadataFormats": listmetadataformats,
+    "ListSets": listsets,
+}
+"""Functions returning the entity tag and the last modification date."""
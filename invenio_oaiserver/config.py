@@ -5,6 +5,7 @@
 """The details of the configuration options for OAI-PMH server."""
 
 import os
+from datetime import timedelta
 from importlib.resources import files
 
 import invenio_search
@@ -37,10 +38,24 @@ OAISERVER_ADMIN_EMAILS = [
 It **must** include one or more instances.
 """
 
-# TODO Add support for compressions.
 OAISERVER_COMPRESSIONS = [
     "identity",
 ]
+"""The content codings of the responses supported by the repository.
+
+The supported values are ``identity``, ``gzip`` and ``deflate``. They are
+advertised by the ``Identify`` verb and the responses are encoded with the
+one preferred in the ``Accept-Encoding`` header of the request.
+"""
+
+OAISERVER_COMPRESSION_LEVEL = 6
+"""The zlib compression level (``1``-``9``) of the encoded responses."""
+
+OAISERVER_COMPRESSION_MIN_SIZE = 1024
+"""Do not encode responses smaller than this number of bytes.
+
+Streamed responses are always encoded as their size is not known upfront.
+"""
 
 OAISERVER_GRANULARITY = "YYYY-MM-DDThh:mm:ssZ"
 """The finest harvesting granularity supported by the repository.
@@ -62,6 +77,94 @@ OAISERVER_RESUMPTION_TOKEN_EXPIRE_TIME = 1 * 60
     https://www.elastic.co/guide/en/elasticsearch/reference/current/search-request-scroll.html
 """
 
+OAISERVER_PAGINATION_MODE = "scroll"
+"""Define how ``ListRecords`` and ``ListIdentifiers`` results are paginated.
+
+* ``scroll`` - open a scroll context on the first page and keep it alive for
+  ``OAISERVER_RESUMPTION_TOKEN_EXPIRE_TIME`` seconds;
+* ``pit`` - open a point in time and page through it with ``search_after``
+  using a deterministic ``(OAISERVER_LAST_UPDATE_KEY,
+  OAISERVER_SORT_TIEBREAKER_KEY)`` sort. The sort values of the last hit are
+  carried in the resumption token.
+
+.. note::
+
+    Point in time is available since Elasticsearch 7.10 and OpenSearch 2.4.
+
+In the ``pit`` mode, and in the ``scroll`` mode with
+``OAISERVER_SCROLL_SEARCH_AFTER``, the resumption token also carries the sort
+values of the last returned hit. If the scroll or point in time has expired,
+the next page is fetched with ``search_after`` from that position and the
+original ``set``, ``from`` and ``until`` filters, so the harvest does not
+restart from the first page.
+"""
+
+OAISERVER_SCROLL_SEARCH_AFTER = False
+"""Sort the scroll of the ``scroll`` pagination mode for ``search_after``.
+
+The scroll is sorted like the ``pit`` mode, so that a harvest continues
+after its scroll has expired and its next page can be prefetched. By
+default, the scroll is unsorted, and a resumption token of an expired
+scroll is rejected.
+"""
+
+OAISERVER_SORT_TIEBREAKER_KEY = None
+"""Field breaking the ties of the ``search_after`` sort.
+
+It must be a unique field with doc values, such as a ``keyword``. Defaults
+to the field of the ``exists`` filter of ``OAISERVER_SEARCH_CLS``, which is
+``_oai.id`` for the default class.
+"""
+
+OAISERVER_RESUMPTION_TOKEN_MAX_AGE = None
+"""The validity of a resumption token in seconds.
+
+Defaults to ``OAISERVER_RESUMPTION_TOKEN_EXPIRE_TIME``. As the tokens can
+resume a harvest after the search context has expired, they can be accepted
+for longer than the search cluster keeps the context open.
+"""
+
+OAISERVER_RESUMPTION_TOKEN_VERSION = 1
+"""The layout of the issued resumption tokens.
+
+* ``1`` - the signed JSON data, several hundred bytes with a search context;
+* ``2`` - the packed and compressed fields, see
+  :mod:`invenio_oaiserver.resumption_token`.
+
+Tokens of both layouts are accepted, set it to ``2`` once all the processes
+serving the OAI-PMH endpoint can read them.
+"""
+
+OAISERVER_RESUMPTION_TOKEN_STORE = None
+"""Keep the resumption token data on the server.
+
+The harvesters get a short random token and the page number, the request
+arguments and the search context are stored until the token expires, after
+``OAISERVER_RESUMPTION_TOKEN_EXPIRE_TIME`` seconds unless
+``OAISERVER_RESUMPTION_TOKEN_MAX_AGE`` is set. The available stores are:
+
+* ``invenio_oaiserver.token_store:SQLTokenStore`` - in the database;
+* ``invenio_oaiserver.token_store:CacheTokenStore`` - in the cache server
+  given to the extension;
+* ``invenio_oaiserver.token_store:MemoryTokenStore`` - in the process, for
+  tests.
+
+``invenio oaiserver tokens`` lists and revokes the active tokens, and removes
+the expired ones with their search contexts, as does the
+``invenio_oaiserver.tasks.expire_resumption_tokens`` task scheduled every
+``OAISERVER_RESUMPTION_TOKEN_EXPIRE_INTERVAL``. By default, the data is signed
+into the token.
+"""
+
+OAISERVER_RESUMPTION_TOKEN_EXPIRE_INTERVAL = timedelta(hours=1)
+"""Interval of the removal of the expired resumption tokens.
+
+With ``OAISERVER_RESUMPTION_TOKEN_STORE``, the
+``invenio_oaiserver.tasks.expire_resumption_tokens`` task is added to
+``CELERY_BEAT_SCHEDULE`` with this schedule. Set to ``None`` to schedule it
+yourself.
+"""
+
 OAISERVER_METADATA_FORMATS = {
     "oai_dc": {
         "serializer": (
@@ -94,7 +197,20 @@ structure.
 * ``schema`` - the location of an XML Schema describing the format;
 * ``namespace`` - the namespace of serialized document;
 * ``serializer`` - the importable string or tuple with the importable string
-  and keyword arguments.
+  and keyword arguments;
+* ``source`` - (optional) the ``includes`` and/or ``excludes`` lists of
+  fields of the record ``_source`` fetched from the search index for
+  ``ListRecords`` and ``ListIdentifiers``. The fields ``_oai`` and
+  ``OAISERVER_LAST_UPDATE_KEY`` are always included, and the sets of the
+  records are found by percolating the indexed records;
+* ``processes`` - (optional) the serializers run in processes, without
+  application context, see ``OAISERVER_SERIALIZATION_WORKERS``.
+
+.. note::
+
+    The ``oai_dc`` format can be serialized without MARC21 and XSLT with
+    ``invenio_oaiserver.oai_dc:dumps_oai_dc``, which creates the same
+    elements as ``MARC21slim2OAIDC.xsl``.
 
 .. note::
 
@@ -104,6 +220,227 @@ structure.
 
 """
 
+OAISERVER_LISTIDENTIFIERS_SOURCE_FREE = False
+"""Do not fetch the record ``_source`` for ``ListIdentifiers``.
+
+The OAI identifier and the datestamp are read from the docvalues of the
+``_oai.id`` and ``OAISERVER_LAST_UPDATE_KEY`` fields, and the sets are found
+by percolating the indexed records by reference. Both fields must be indexed
+with docvalues (e.g. ``keyword`` and ``date``).
+"""
+
+OAISERVER_STREAMING_RESPONSE = False
+"""Stream the responses of ``ListRecords`` and ``ListIdentifiers``.
+
+The envelope is sent first and every record is written as soon as it is
+serialized, instead of building the whole document in memory.
+"""
+
+OAISERVER_FRAGMENT_CACHE = None
+"""Cache the serialized ``<metadata/>`` and ``<about/>`` of the records.
+
+The fragments are cached by record id, record version and metadata prefix,
+so an updated record is serialized again. The available backends are:
+
+* ``invenio_oaiserver.cache:LRUFragmentCache`` - in-process cache of at most
+  ``OAISERVER_FRAGMENT_CACHE_MAX_SIZE`` bytes;
+* ``invenio_oaiserver.cache:SharedFragmentCache`` - the cache server given to
+  the extension, shared by all the processes.
+
+By default, the records are serialized on every request.
+
+.. note::
+
+    Outdated fragments are not invalidated when the configuration of a
+    metadata format changes. Clear the cache after changing a serializer.
+"""
+
+OAISERVER_FRAGMENT_CACHE_MAX_SIZE = 64 * 1024 * 1024
+"""Maximum size in bytes of the in-process fragment cache."""
+
+OAISERVER_FRAGMENT_CACHE_TIMEOUT = None
+"""Timeout in seconds of the fragments in the shared cache.
+
+Defaults to the default timeout of the cache server.
+"""
+
+OAISERVER_PAGE_CACHE = None
+"""Cache the responses to the requests with a ``resumptionToken``.
+
+Harvesters on unreliable networks resend the same resumption token. Without
+the cache, the retried request advances the scroll of ``get_records`` and
+returns the following page, or fails. With the cache, it returns the same
+response without searching again. The available backends are:
+
+* ``invenio_oaiserver.cache:LRUPageCache`` - in-process cache of at most
+  ``OAISERVER_PAGE_CACHE_MAX_SIZE`` bytes;
+* ``invenio_oaiserver.cache:SharedPageCache`` - the cache server given to
+  the extension, shared by all the processes.
+
+The ``hits`` and ``misses`` of the cache count the replayed and the new
+pages. By default, the responses are not cached.
+"""
+
+OAISERVER_PAGE_CACHE_MAX_SIZE = 64 * 1024 * 1024
+"""Maximum size in bytes of the in-process page cache.
+
+A streamed response is buffered until it is sent to be cached, and is not
+cached once it exceeds this size.
+"""
+
+OAISERVER_PAGE_CACHE_TIMEOUT = 300
+"""Timeout in seconds of the cached pages."""
+
+OAISERVER_SERIALIZATION_WORKERS = 0
+"""Number of workers serializing the records of a ``ListRecords`` page.
+
+The records are serialized in threads running in the application context,
+which suits the serializers releasing the GIL like lxml XSLT transforms.
+The metadata formats marked with ``processes`` are serialized in processes
+instead: the workers receive the OAI identifier and the search hit of a
+record, and run without application context. The workers are shut down
+when the process exits. By default, the records are serialized
+sequentially.
+"""
+
+OAISERVER_TRACK_TOTAL_HITS = True
+"""Number of hits counted by the ``ListRecords`` and ``ListIdentifiers``
+searches.
+
+By default, the hits are counted exactly, which is expensive on large lists.
+With a number, the hits are counted up to it and, on larger lists, the next
+page is expected when a page is full and the ``completeListSize`` of the
+resumption token is omitted, unless ``OAISERVER_LIST_SIZE_CACHE_TIMEOUT`` is
+set. ``False`` never counts the hits.
+
+A scroll always counts all its hits, so in the ``scroll`` pagination mode
+the pages are searched with ``search_after`` when the count is limited.
+"""
+
+OAISERVER_LIST_SIZE_CACHE_TIMEOUT = 0
+"""Cache the number of records of a list for this number of seconds.
+
+When the hits are not counted exactly (see ``OAISERVER_TRACK_TOTAL_HITS``),
+the records of a set and date range are counted once and the number is
+shared by the harvests of the same list, in the cache server given to the
+extension or in the process. By default, ``completeListSize`` is then
+omitted.
+"""
+
+OAISERVER_LIST_SIZE_CACHE_MAX_ENTRIES = 1024
+"""Maximum number of list sizes cached per process, without cache server.
+
+The least recently used sizes are evicted first.
+"""
+
+OAISERVER_PREFETCH_WORKERS = 0
+"""Number of threads prefetching the next page of the harvests.
+
+After a ``ListRecords`` or ``ListIdentifiers`` page with a resumption token,
+the next page and the sets of its records are searched in the background and
+kept until the harvester resumes. The next page is searched with
+``search_after``, so the ``scroll`` pagination mode needs
+``OAISERVER_SCROLL_SEARCH_AFTER``, and the harvest continues without scroll
+once a prefetched page is served. By default, the pages are searched when
+they are requested.
+"""
+
+OAISERVER_PREFETCH_MAX_PAGES = 32
+"""Maximum number of prefetched pages kept per process."""
+
+OAISERVER_PREFETCH_TIMEOUT = 60
+"""Number of seconds a prefetched page is kept."""
+
+OAISERVER_PREFETCH_SERIALIZE = False
+"""Serialize the records of the prefetched ``ListRecords`` pages.
+
+The serialized records are stored in the ``OAISERVER_FRAGMENT_CACHE``, which
+must be configured.
+"""
+
+OAISERVER_PRERENDER_FORMATS = []
+"""Metadata formats rendered when a record is indexed.
+
+The serialized ``<metadata/>`` and ``<about/>`` elements of every listed
+``metadataPrefix`` are stored in ``_oai.rendered.<metadataPrefix>`` of the
+indexed record, and ``ListRecords`` and ``GetRecord`` served from the index
+(see ``OAISERVER_GETRECORD_FETCHER``) use them instead of calling the
+serializer. Records indexed before are serialized on every
+request until they are reindexed with ``invenio oaiserver prerender``, and
+``invenio oaiserver check-prerendered`` compares the stored formats with the
+current serializers.
+
+The field must not be indexed, add it to the mapping of the record index:
+
+.. code-block:: json
+
+    "_oai": {
+      "properties": {
+        "rendered": {"type": "object", "enabled": false}
+      }
+    }
+
+.. note::
+
+    Requires ``invenio-indexer`` and ``OAISERVER_REGISTER_RECORD_SIGNALS``.
+"""
+
+OAISERVER_CONDITIONAL_REQUESTS = False
+"""Answer conditional requests to the verbs which change rarely.
+
+The ``GetRecord``, ``Identify``, ``ListMetadataFormats`` and ``ListSets``
+responses get an ``ETag`` computed from the record version, the state of the
+sets table or the configuration, and a ``Last-Modified`` date when there is
+one. Requests with a matching ``If-None-Match`` or ``If-Modified-Since``
+header are answered with ``304 Not Modified`` before the response is built.
+"""
+
+OAISERVER_CACHE_CONTROL = {}
+"""The ``Cache-Control`` header of the responses to every verb.
+
+E.g. to let a CDN cache records and sets for an hour:
+
+.. code-block:: python
+
+    OAISERVER_CACHE_CONTROL = {
+        "GetRecord": "public, max-age=3600",
+        "ListSets": "public, max-age=3600",
+    }
+"""
+
+OAISERVER_IDENTIFY_CACHE = False
+"""Cache the body of the ``Identify`` response.
+
+The ``<Identify/>`` element is rendered once per base URL and only the
+``<responseDate/>`` and ``<request/>`` elements are built per request. The
+``earliestDatestamp`` is searched once and kept in the cache server given to
+the extension, then lowered whenever an older record is indexed. Deleting the
+oldest record does not move it forward.
+
+Without cache server, the records indexed by other processes are not seen, so
+the ``earliestDatestamp`` is searched again after
+``OAISERVER_IDENTIFY_CACHE_TIMEOUT``.
+
+.. note::
+
+    Requires ``invenio-indexer`` and ``OAISERVER_REGISTER_RECORD_SIGNALS``.
+"""
+
+OAISERVER_IDENTIFY_CACHE_TIMEOUT = 60
+"""Timeout in seconds of the ``Identify`` cache of a process.
+
+Applies to the ``earliestDatestamp`` kept without cache server and to the
+rendered ``<Identify/>`` elements.
+"""
+
+OAISERVER_IDENTIFY_CACHE_MAX_ENTRIES = 8
+"""Maximum number of ``<Identify/>`` elements cached per process.
+
+One element is rendered per base URL, which depends on the ``Host`` of the
+request unless ``SERVER_NAME`` is set. The least recently used elements are
+evicted first.
+"""
+
 OAISERVER_REGISTER_RECORD_SIGNALS = True
 """Catch record/set insert/update/delete signals and update the `_oai`
 field."""
@@ -130,17 +467,79 @@ OAISERVER_RECORD_SETS_FETCHER = "invenio_oaiserver.percolator:find_sets_for_reco
 OAISERVER_PERCOLATOR_DEDICATED_INDEX = True
 """Create a dedicated index for the percolators, instead of storing them in
 the same index as the records.
+
+The percolator indices are created with ``invenio oaiserver init-percolators``
+or when a set changes. The requests only read the state of the indices, once
+per process.
+"""
+
+OAISERVER_MATERIALIZE_SETS = False
+"""Store the sets of a record in ``_oai.sets`` when the record is indexed.
+
+The sets are found by percolation once, when the record is indexed, instead
+of on every ``ListRecords`` and ``ListIdentifiers`` page, and the ``set``
+argument becomes a ``term`` filter on ``_oai.sets``. Changes to an
+``OAISet`` reindex the affected records in background tasks of
+``OAISERVER_CELERY_TASK_CHUNK_SIZE`` records.
+
+.. note::
+
+    Requires ``invenio-indexer`` and ``OAISERVER_REGISTER_RECORD_SIGNALS``.
+"""
+
+OAISERVER_PERCOLATOR_SEARCH_SIZE = None
+"""Maximum number of sets matched by a page fetched with a single search.
+
+When set, the sets of the records on a page are found with one search
+request returning up to this many percolators (set it to the number of
+sets). Only when more sets match, the percolators are read with a scroll
+(scan). By default, the scan is always used.
 """
 
 OAISERVER_SET_RECORDS_QUERY_FETCHER = (
     "invenio_oaiserver.fetchers:set_records_query_fetcher"
 )
 
+OAISERVER_SET_QUERY_CACHE_TIMEOUT = 0
+"""Cache the compiled query of a set for this number of seconds.
+
+The cache is kept per process and cleared by the ``OAISet`` signals, the
+timeout bounds how long other processes can use an outdated query.
+By default, the queries are not cached.
+"""
+
+OAISERVER_SET_QUERY_CACHE_MAX_ENTRIES = 1024
+"""Maximum number of set queries cached per process.
+
+The least recently used queries are evicted first. Queries of unknown sets
+are never cached.
+"""
+
+OAISERVER_SET_FRAGMENT_CACHE_TIMEOUT = 0
+"""Cache the rendered ``<set/>`` elements of ``ListSets`` for this number of
+seconds.
+
+Like the set queries, the fragments are kept per process and cleared by the
+``OAISet`` signals. By default, the sets are rendered on every request.
+"""
+
 OAISERVER_RECORD_CLS = "invenio_records.api:Record"
 """Record retrieval class."""
 
 OAISERVER_GETRECORD_FETCHER = "invenio_oaiserver.utils:getrecord_fetcher"
-"""Record data fetcher for serialization."""
+"""Record data fetcher for serialization.
+
+The default fetcher reads the record from the database. Set it to
+``invenio_oaiserver.utils:search_getrecord_fetcher`` to resolve the record
+by ``_oai.id`` with a single search query and serialize it like the records
+of ``ListRecords``. Fetchers with a true ``from_index`` attribute are called
+with the OAI identifier and the metadata prefix, and return a search hit.
+Records missing from the index are still read from the database.
+
+The other fetchers are called with the record UUID and return the record
+data, with its version under ``invenio_oaiserver.utils.VERSION_KEY`` if
+known; otherwise the version is read from the database.
+"""
 
 OAISERVER_QUERY_PARSER = invenio_search.engine.dsl.Q
 """Define query parser for OIASet definition."""
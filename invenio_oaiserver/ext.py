@@ -4,10 +4,18 @@
 
 """Invenio-OAIServer extension implementation."""
 
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 from invenio_base.utils import obj_or_import_string
 from sqlalchemy.event import contains, listen, remove
 
 from . import config
+from .cache import TimedLRUCache
+from .prefetch import PrefetchedPages
+from .utils import init_xslt_transforms
 
 
 class _AppState(object):
@@ -20,6 +28,26 @@ class _AppState(object):
         """
         self.app = app
         self.cache = cache
+        self.percolator_indices = {}
+        self.set_queries = TimedLRUCache(
+            app.config["OAISERVER_SET_QUERY_CACHE_MAX_ENTRIES"]
+        )
+        self.set_fragments = {}
+        self.list_sizes = TimedLRUCache(
+            app.config["OAISERVER_LIST_SIZE_CACHE_MAX_ENTRIES"]
+        )
+        self.verb_schemas = {}
+        self.token_signers = {}
+        self._fragment_cache = None
+        self._page_cache = None
+        self._token_store = None
+        self._executors = {}
+        self._executors_lock = threading.Lock()
+        self._prefetched_pages = None
+        self._earliest_datestamp = TimedLRUCache(1)
+        self.identify_bodies = TimedLRUCache(
+            app.config["OAISERVER_IDENTIFY_CACHE_MAX_ENTRIES"]
+        )
         if self.app.config["OAISERVER_REGISTER_RECORD_SIGNALS"]:
             self.register_signals()
 
@@ -55,6 +83,107 @@ class _AppState(object):
             self.app.config["OAISERVER_SET_RECORDS_QUERY_FETCHER"]
         )
 
+    @property
+    def fragment_cache(self):
+        """Get the cache of serialized record fragments."""
+        backend = self.app.config["OAISERVER_FRAGMENT_CACHE"]
+        if not backend:
+            return None
+        if self._fragment_cache is None:
+            self._fragment_cache = obj_or_import_string(backend)(self.app)
+        return self._fragment_cache
+
+    @property
+    def page_cache(self):
+        """Get the cache of the responses to the resumption tokens."""
+        backend = self.app.config["OAISERVER_PAGE_CACHE"]
+        if not backend:
+            return None
+        if self._page_cache is None:
+            self._page_cache = obj_or_import_string(backend)(self.app)
+        return self._page_cache
+
+    @property
+    def token_store(self):
+        """Get the server-side store of the resumption tokens."""
+        backend = self.app.config["OAISERVER_RESUMPTION_TOKEN_STORE"]
+        if not backend:
+            return None
+        if self._token_store is None:
+            self._token_store = obj_or_import_string(backend)(self.app)
+        return self._token_store
+
+    def _executor(self, key, factory):
+        """Get an executor, created on first use and shut down at exit."""
+        with self._executors_lock:
+            if key not in self._executors:
+                if not self._executors:
+                    atexit.register(self.shutdown_executors)
+                self._executors[key] = factory()
+            return self._executors[key]
+
+    def shutdown_executors(self):
+        """Shut down the serialization and prefetch workers."""
+        with self._executors_lock:
+            executors = list(self._executors.values())
+            self._executors.clear()
+        for executor in executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def serialization_executor(self, metadata_prefix):
+        """Get the executor serializing the records of a metadata format.
+
+        The records are serialized in threads, or in processes for the
+        formats marked with ``processes``.
+
+        :param metadata_prefix: One of the metadata identifiers configured in
+            ``OAISERVER_METADATA_FORMATS``.
+        :returns: An executor or ``None`` if the serialization is sequential.
+        """
+        workers = self.app.config["OAISERVER_SERIALIZATION_WORKERS"]
+        if not workers:
+            return None
+
+        metadata_format = self.app.config["OAISERVER_METADATA_FORMATS"][metadata_prefix]
+        if metadata_format.get("processes", False):
+            return self._executor(
+                "processes",
+                lambda: ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                ),
+            )
+        return self._executor(
+            "threads",
+            lambda: ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="oaiserver"
+            ),
+        )
+
+    @property
+    def prefetch_executor(self):
+        """Get the executor prefetching the next pages of the harvests.
+
+        :returns: A thread pool or ``None`` if the pages are not prefetched.
+        """
+        workers = self.app.config["OAISERVER_PREFETCH_WORKERS"]
+        if not workers:
+            return None
+
+        return self._executor(
+            "prefetch",
+            lambda: ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="oaiserver-prefetch"
+            ),
+        )
+
+    @property
+    def prefetched_pages(self):
+        """Get the pages prefetched for the harvests."""
+        if self._prefetched_pages is None:
+            self._prefetched_pages = PrefetchedPages(self.app)
+        return self._prefetched_pages
+
     @property
     def last_update_key(self):
         """Get record update key."""
@@ -78,35 +207,108 @@ class _AppState(object):
         if self.cache:
             self.cache.set(self.app.config["OAISERVER_CACHE_KEY"], values)
 
+    @property
+    def earliest_datestamp(self):
+        """Get the creation date of the oldest record, as ISO 8601 string."""
+        if self.cache:
+            return self.cache.get(
+                self.app.config["OAISERVER_CACHE_KEY"] + "earliestDatestamp"
+            )
+        return self._earliest_datestamp.get("earliestDatestamp")
+
+    @earliest_datestamp.setter
+    def earliest_datestamp(self, value):
+        """Set the creation date of the oldest record."""
+        if self.cache:
+            self.cache.set(
+                self.app.config["OAISERVER_CACHE_KEY"] + "earliestDatestamp", value
+            )
+        else:
+            self._earliest_datestamp.set(
+                "earliestDatestamp",
+                value,
+                self.app.config["OAISERVER_IDENTIFY_CACHE_TIMEOUT"],
+            )
+
+    def _record_index_receivers(self):
+        """Return the ``before_record_index`` receivers to connect."""
+        from .receivers import (
+            before_record_index_earliest_datestamp,
+            before_record_index_oai_sets,
+            before_record_index_prerender,
+        )
+
+        receivers = []
+        if self.app.config["OAISERVER_MATERIALIZE_SETS"]:
+            receivers.append(before_record_index_oai_sets)
+        if self.app.config["OAISERVER_PRERENDER_FORMATS"]:
+            receivers.append(before_record_index_prerender)
+        if self.app.config["OAISERVER_IDENTIFY_CACHE"]:
+            receivers.append(before_record_index_earliest_datestamp)
+        return receivers
+
     def register_signals(self):
         """Register signals."""
+        if self._record_index_receivers():
+            self.register_signals_record()
         if self.app.config["OAISERVER_REGISTER_SET_SIGNALS"]:
             self.register_signals_oaiset()
 
+    def register_signals_record(self):
+        """Register record signals to enrich the indexed records."""
+        from invenio_indexer.signals import before_record_index
+
+        for receiver in self._record_index_receivers():
+            before_record_index.connect(receiver, sender=self.app)
+
     def register_signals_oaiset(self):
         """Register OAISet signals to update records."""
+        from invenio_db import db
+
         from .models import OAISet
         from .receivers import (
+            after_commit_update_records_sets,
             after_delete_oai_set,
             after_insert_oai_set,
+            after_transaction_end_update_records_sets,
             after_update_oai_set,
         )
 
         listen(OAISet, "after_insert", after_insert_oai_set)
         listen(OAISet, "after_update", after_update_oai_set)
         listen(OAISet, "after_delete", after_delete_oai_set)
+        listen(db.session, "after_commit", after_commit_update_records_sets)
+        listen(
+            db.session,
+            "after_transaction_end",
+            after_transaction_end_update_records_sets,
+        )
 
     def unregister_signals(self):
         """Unregister signals."""
         # Unregister Record signals
+        self.unregister_signals_record()
         self.unregister_signals_oaiset()
 
+    def unregister_signals_record(self):
+        """Unregister record signals."""
+        receivers = self._record_index_receivers()
+        if receivers:
+            from invenio_indexer.signals import before_record_index
+
+            for receiver in receivers:
+                before_record_index.disconnect(receiver, sender=self.app)
+
     def unregister_signals_oaiset(self):
         """Unregister signals oaiset."""
+        from invenio_db import db
+
         from .models import OAISet
         from .receivers import (
+            after_commit_update_records_sets,
             after_delete_oai_set,
             after_insert_oai_set,
+            after_transaction_end_update_records_sets,
             after_update_oai_set,
         )
 
@@ -114,6 +316,13 @@ class _AppState(object):
             remove(OAISet, "after_insert", after_insert_oai_set)
             remove(OAISet, "after_update", after_update_oai_set)
             remove(OAISet, "after_delete", after_delete_oai_set)
+        if contains(db.session, "after_commit", after_commit_update_records_sets):
+            remove(db.session, "after_commit", after_commit_update_records_sets)
+            remove(
+                db.session,
+                "after_transaction_end",
+                after_transaction_end_update_records_sets,
+            )
 
 
 class InvenioOAIServer(object):
@@ -133,6 +342,7 @@ class InvenioOAIServer(object):
         :param app: An instance of :class:`flask.Flask`.
         """
         self.init_config(app)
+        init_xslt_transforms(app.config["OAISERVER_METADATA_FORMATS"])
         state = _AppState(app=app, cache=kwargs.get("cache"))
         app.extensions["invenio-oaiserver"] = state
 
@@ -155,6 +365,16 @@ class InvenioOAIServer(object):
             if k.startswith("OAISERVER_"):
                 app.config.setdefault(k, getattr(config, k))
 
+        interval = app.config["OAISERVER_RESUMPTION_TOKEN_EXPIRE_INTERVAL"]
+        if app.config["OAISERVER_RESUMPTION_TOKEN_STORE"] and interval:
+            app.config.setdefault("CELERY_BEAT_SCHEDULE", {}).setdefault(
+                "oaiserver-expire-resumption-tokens",
+                {
+                    "task": "invenio_oaiserver.tasks.expire_resumption_tokens",
+                    "schedule": interval,
+                },
+            )
+
         # warn user if ID_PREFIX is not set
         if app.config.get("OAISERVER_ID_PREFIX") is None:
             import socket
@@ -167,3 +387,14 @@ class InvenioOAIServer(object):
                     app.config.get("OAISERVER_ID_PREFIX")
                 )
             )
+
+
+def finalize_app(app):
+    """Finalize the application.
+
+    Loads the names of the percolator indices, so that the requests do not
+    check the indices.
+    """
+    from .percolator import load_percolator_indices
+
+    load_percolator_indices()
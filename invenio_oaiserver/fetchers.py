@@ -4,12 +4,14 @@
 
 """Persistent identifier fetchers."""
 
+from flask import current_app
 from invenio_pidstore.errors import PersistentIdentifierError
 from invenio_pidstore.fetchers import FetchedPID
 from invenio_search.engine import dsl
 
 from .models import OAISet
 from .provider import OAIIDProvider
+from .proxies import current_oaiserver
 from .query import query_string_parser
 
 
@@ -32,12 +34,34 @@ def oaiid_fetcher(record_uuid, data):
 
 
 def set_records_query_fetcher(setSpec):
-    """Fetch query to retrieve records based on provided set spec."""
+    """Fetch query to retrieve records based on provided set spec.
+
+    The compiled query of an existing set is cached per application for
+    ``OAISERVER_SET_QUERY_CACHE_TIMEOUT`` seconds.
+    """
+    timeout = current_app.config["OAISERVER_SET_QUERY_CACHE_TIMEOUT"]
+    if timeout:
+        cached = current_oaiserver.set_queries.get(setSpec)
+        if cached is not None:
+            return dsl.Q(cached)
+
     set = OAISet.query.filter(OAISet.spec == setSpec).first()
     if set is None:
-        # raise error that no matches can be found ?
-        query = dsl.Q("match_none")
-    else:
-        query = dsl.Q(query_string_parser(set.search_pattern))
+        # unknown specs come from the requests, they are not cached
+        return dsl.Q("match_none")
 
+    query = dsl.Q(query_string_parser(set.search_pattern))
+    if timeout:
+        current_oaiserver.set_queries.set(setSpec, query.to_dict(), timeout)
     return query
+
+
+def clear_set_query_cache(setSpec=None):
+    """Forget the cached set queries.
+
+    :param setSpec: The set to forget. (Default: all sets)
+    """
+    if setSpec is None:
+        current_oaiserver.set_queries.clear()
+    else:
+        current_oaiserver.set_queries.pop(setSpec)
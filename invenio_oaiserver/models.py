@@ -81,4 +81,22 @@ class OAISet(db.Model, db.Timestamp):
         return value
 
 
-__all__ = ("OAISet",)
+class OAIResumptionToken(db.Model, db.Timestamp):
+    """Data of a resumption token kept on the server."""
+
+    __tablename__ = "oaiserver_resumption_token"
+
+    token = db.Column(db.String(64), primary_key=True)
+    """Random token given to the harvester."""
+
+    verb = db.Column(db.String(32), nullable=False)
+    """Verb of the request which issued the token."""
+
+    data = db.Column(db.JSON, nullable=False)
+    """Page number, request arguments and search context."""
+
+    expires = db.Column(db.UTCDateTime, nullable=False, index=True)
+    """Expiration date of the token."""
+
+
+__all__ = ("OAIResumptionToken", "OAISet")
@@ -0,0 +1,670 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Direct serializer of MARC 21 records to Dublin Core (``oai_dc``).
+
+The serializer reads the MARC 21 JSON of ``dojson`` and builds the elements
+selected by ``MARC21slim2OAIDC.xsl`` in one pass, without converting the
+record to MARCXML and running the XSLT transformation.
+
+To use it, change the serializer of the ``oai_dc`` metadata format:
+
+.. code-block:: python
+
+    OAISERVER_METADATA_FORMATS = {
+        "oai_dc": {
+            "serializer": "invenio_oaiserver.oai_dc:dumps_oai_dc",
+            "schema": "http://www.openarchives.org/OAI/2.0/oai_dc.xsd",
+            "namespace": "http://www.openarchives.org/OAI/2.0/oai_dc/",
+        },
+    }
+"""
+
+from collections import Counter, defaultdict
+from itertools import chain
+
+from lxml import etree
+from lxml.etree import Element, SubElement
+
+NS_OAIDC = "http://www.openarchives.org/OAI/2.0/oai_dc/"
+NS_DC = "http://purl.org/dc/elements/1.1/"
+NS_XSI = "http://www.w3.org/2001/XMLSchema-instance"
+
+NSMAP = {
+    "oai_dc": NS_OAIDC,
+    "dc": NS_DC,
+    "xsi": NS_XSI,
+}
+
+SCHEMA_LOCATION = (
+    "http://www.openarchives.org/OAI/2.0/oai_dc/ "
+    "http://www.openarchives.org/OAI/2.0/oai_dc.xsd"
+)
+
+FIELDS = {
+    "international_standard_book_number": (
+        "020",
+        {"international_standard_book_number": "a"},
+    ),
+    "main_entry_personal_name": (
+        "100",
+        {
+            "authority_record_control_number_or_standard_number": "0",
+            "relator_code": "4",
+            "linkage": "6",
+            "field_link_and_sequence_number": "8",
+            "personal_name": "a",
+            "numeration": "b",
+            "titles_and_words_associated_with_a_name": "c",
+            "dates_associated_with_a_name": "d",
+            "relator_term": "e",
+            "date_of_a_work": "f",
+            "miscellaneous_information": "g",
+            "attribution_qualifier": "j",
+            "form_subheading": "k",
+            "language_of_a_work": "l",
+            "number_of_part_section_of_a_work": "n",
+            "name_of_part_section_of_a_work": "p",
+            "fuller_form_of_name": "q",
+            "title_of_a_work": "t",
+            "affiliation": "u",
+        },
+    ),
+    "main_entry_corporate_name": (
+        "110",
+        {
+            "authority_record_control_number_or_standard_number": "0",
+            "relator_code": "4",
+            "linkage": "6",
+            "field_link_and_sequence_number": "8",
+            "corporate_name_or_jurisdiction_name_as_entry_element": "a",
+            "subordinate_unit": "b",
+            "location_of_meeting": "c",
+            "date_of_meeting_or_treaty_signing": "d",
+            "relator_term": "e",
+            "date_of_a_work": "f",
+            "miscellaneous_information": "g",
+            "form_subheading": "k",
+            "language_of_a_work": "l",
+            "number_of_part_section_meeting": "n",
+            "name_of_part_section_of_a_work": "p",
+            "title_of_a_work": "t",
+            "affiliation": "u",
+        },
+    ),
+    "main_entry_meeting_name": (
+        "111",
+        {
+            "authority_record_control_number_or_standard_number": "0",
+            "relator_code": "4",
+            "linkage": "6",
+            "field_link_and_sequence_number": "8",
+            "meeting_name_or_jurisdiction_name_as_entry_element": "a",
+            "location_of_meeting": "c",
+            "date_of_meeting": "d",
+            "subordinate_unit": "e",
+            "date_of_a_work": "f",
+            "miscellaneous_information": "g",
+            "relator_term": "j",
+            "form_subheading": "k",
+            "language_of_a_work": "l",
+            "number_of_part_section_meeting": "n",
+            "name_of_part_section_of_a_work": "p",
+            "name_of_meeting_following_jurisdiction_name_entry_element": "q",
+            "title_of_a_work": "t",
+            "affiliation": "u",
+        },
+    ),
+    "title_statement": (
+        "245",
+        {
+            "title": "a",
+            "remainder_of_title": "b",
+            "inclusive_dates": "f",
+            "bulk_dates": "g",
+            "medium": "h",
+            "form": "k",
+        },
+    ),
+    "publication_distribution_imprint": (
+        "260",
+        {
+            "place_of_publication_distribution": "a",
+            "name_of_publisher_distributor": "b",
+            "date_of_publication_distribution": "c",
+        },
+    ),
+    "general_note": ("500", {"general_note": "a"}),
+    "with_note": ("501", {"with_note": "a"}),
+    "dissertation_note": ("502", {"dissertation_note": "a"}),
+    "bibliography_note": ("504", {"bibliography_note": "a"}),
+    "formatted_contents_note": ("505", {"formatted_contents_note": "a"}),
+    "restrictions_on_access_note": ("506", {"terms_governing_access": "a"}),
+    "scale_note_for_graphic_material": (
+        "507",
+        {"representative_fraction_of_scale_note": "a"},
+    ),
+    "creation_production_credits_note": (
+        "508",
+        {"creation_production_credits_note": "a"},
+    ),
+    "citation_references_note": ("510", {"name_of_source": "a"}),
+    "participant_or_performer_note": ("511", {"participant_or_performer_note": "a"}),
+    "type_of_report_and_period_covered_note": ("513", {"type_of_report": "a"}),
+    "data_quality_note": ("514", {"attribute_accuracy_report": "a"}),
+    "numbering_peculiarities_note": ("515", {"numbering_peculiarities_note": "a"}),
+    "type_of_computer_file_or_data_note": (
+        "516",
+        {"type_of_computer_file_or_data_note": "a"},
+    ),
+    "date_time_and_place_of_an_event_note": (
+        "518",
+        {"date_time_and_place_of_an_event_note": "a"},
+    ),
+    "summary": ("520", {"summary": "a"}),
+    "target_audience_note": ("521", {"target_audience_note": "a"}),
+    "geographic_coverage_note": ("522", {"geographic_coverage_note": "a"}),
+    "preferred_citation_of_described_materials_note": (
+        "524",
+        {"preferred_citation_of_described_materials_note": "a"},
+    ),
+    "supplement_note": ("525", {"supplement_note": "a"}),
+    "study_program_information_note": ("526", {"program_name": "a"}),
+    "additional_physical_form_available_note": (
+        "530",
+        {
+            "additional_physical_form_available_note": "a",
+            "availability_source": "b",
+            "availability_conditions": "c",
+            "order_number": "d",
+            "uniform_resource_identifier": "u",
+        },
+    ),
+    "reproduction_note": ("533", {"type_of_reproduction": "a"}),
+    "original_version_note": ("534", {"main_entry_of_original": "a"}),
+    "location_of_originals_duplicates_note": ("535", {"custodian": "a"}),
+    "funding_information_note": ("536", {"text_of_note": "a"}),
+    "system_details_note": ("538", {"system_details_note": "a"}),
+    "terms_governing_use_and_reproduction_note": (
+        "540",
+        {"terms_governing_use_and_reproduction": "a"},
+    ),
+    "immediate_source_of_acquisition_note": ("541", {"source_of_acquisition": "a"}),
+    "information_relating_to_copyright_status": ("542", {"personal_creator": "a"}),
+    "location_of_other_archival_materials_note": ("544", {"custodian": "a"}),
+    "biographical_or_historical_data": (
+        "545",
+        {"biographical_or_historical_data": "a"},
+    ),
+    "language_note": ("546", {"language_note": "a"}),
+    "former_title_complexity_note": ("547", {"former_title_complexity_note": "a"}),
+    "issuing_body_note": ("550", {"issuing_body_note": "a"}),
+    "entity_and_attribute_information_note": ("552", {"entity_type_label": "a"}),
+    "cumulative_index_finding_aids_note": (
+        "555",
+        {"cumulative_index_finding_aids_note": "a"},
+    ),
+    "information_about_documentation_note": (
+        "556",
+        {"information_about_documentation_note": "a"},
+    ),
+    "ownership_and_custodial_history": ("561", {"history": "a"}),
+    "copy_and_version_identification_note": ("562", {"identifying_markings": "a"}),
+    "binding_information": ("563", {"binding_note": "a"}),
+    "case_file_characteristics_note": ("565", {"number_of_cases_variables": "a"}),
+    "methodology_note": ("567", {"methodology_note": "a"}),
+    "linking_entry_complexity_note": ("580", {"linking_entry_complexity_note": "a"}),
+    "publications_about_described_materials_note": (
+        "581",
+        {"publications_about_described_materials_note": "a"},
+    ),
+    "action_note": ("583", {"action": "a"}),
+    "accumulation_and_frequency_of_use_note": ("584", {"accumulation": "a"}),
+    "exhibitions_note": ("585", {"exhibitions_note": "a"}),
+    "awards_note": ("586", {"awards_note": "a"}),
+    "source_of_description_note": ("588", {"source_of_description_note": "a"}),
+    "subject_added_entry_personal_name": (
+        "600",
+        {
+            "personal_name": "a",
+            "numeration": "b",
+            "titles_and_other_words_associated_with_a_name": "c",
+            "dates_associated_with_a_name": "d",
+            "fuller_form_of_name": "q",
+        },
+    ),
+    "subject_added_entry_corporate_name": (
+        "610",
+        {
+            "corporate_name_or_jurisdiction_name_as_entry_element": "a",
+            "subordinate_unit": "b",
+            "location_of_meeting": "c",
+            "date_of_meeting_or_treaty_signing": "d",
+        },
+    ),
+    "subject_added_entry_meeting_name": (
+        "611",
+        {
+            "meeting_name_or_jurisdiction_name_as_entry_element": "a",
+            "location_of_meeting": "c",
+            "date_of_meeting": "d",
+            "name_of_meeting_following_jurisdiction_name_entry_element": "q",
+        },
+    ),
+    "subject_added_entry_uniform_title": (
+        "630",
+        {"uniform_title": "a", "date_of_treaty_signing": "d"},
+    ),
+    "subject_added_entry_topical_term": (
+        "650",
+        {
+            "topical_term_or_geographic_name_entry_element": "a",
+            "topical_term_following_geographic_name_entry_element": "b",
+            "location_of_event": "c",
+            "active_dates": "d",
+        },
+    ),
+    "index_term_uncontrolled": ("653", {"uncontrolled_term": "a"}),
+    "index_term_genre_form": (
+        "655",
+        {
+            "authority_record_control_number": "0",
+            "source_of_term": "2",
+            "materials_specified": "3",
+            "institution_to_which_field_applies": "5",
+            "linkage": "6",
+            "field_link_and_sequence_number": "8",
+            "genre_form_data_or_focus_term": "a",
+            "non_focus_term": "b",
+            "facet_hierarchy_designation": "c",
+            "form_subdivision": "v",
+            "general_subdivision": "x",
+            "chronological_subdivision": "y",
+            "geographic_subdivision": "z",
+        },
+    ),
+    "added_entry_personal_name": (
+        "700",
+        {
+            "authority_record_control_number_or_standard_number": "0",
+            "materials_specified": "3",
+            "relator_code": "4",
+            "institution_to_which_field_applies": "5",
+            "linkage": "6",
+            "field_link_and_sequence_number": "8",
+            "personal_name": "a",
+            "numeration": "b",
+            "titles_and_other_words_associated_with_a_name": "c",
+            "dates_associated_with_a_name": "d",
+            "relator_term": "e",
+            "date_of_a_work": "f",
+            "miscellaneous_information": "g",
+            "medium": "h",
+            "relationship_information": "i",
+            "attribution_qualifier": "j",
+            "form_subheading": "k",
+            "language_of_a_work": "l",
+            "medium_of_performance_for_music": "m",
+            "number_of_part_section_of_a_work": "n",
+            "arranged_statement_for_music": "o",
+            "name_of_part_section_of_a_work": "p",
+            "fuller_form_of_name": "q",
+            "key_for_music": "r",
+            "version": "s",
+            "title_of_a_work": "t",
+            "affiliation": "u",
+            "international_standard_serial_number": "x",
+        },
+    ),
+    "added_entry_corporate_name": (
+        "710",
+        {
+            "authority_record_control_number_or_standard_number": "0",
+            "materials_specified": "3",
+            "relator_code": "4",
+            "institution_to_which_field_applies": "5",
+            "linkage": "6",
+            "field_link_and_sequence_number": "8",
+            "corporate_name_or_jurisdiction_name_as_entry_element": "a",
+            "subordinate_unit": "b",
+            "location_of_meeting": "c",
+            "date_of_meeting_or_treaty_signing": "d",
+            "relator_term": "e",
+            "date_of_a_work": "f",
+            "miscellaneous_information": "g",
+            "medium": "h",
+            "relationship_information": "i",
+            "form_subheading": "k",
+            "language_of_a_work": "l",
+            "medium_of_performance_for_music": "m",
+            "number_of_part_section_meeting": "n",
+            "arranged_statement_for_music": "o",
+            "name_of_part_section_of_a_work": "p",
+            "key_for_music": "r",
+            "version": "s",
+            "title_of_a_work": "t",
+            "affiliation": "u",
+            "international_standard_serial_number": "x",
+        },
+    ),
+    "added_entry_meeting_name": (
+        "711",
+        {
+            "authority_record_control_number_or_standard_number": "0",
+            "materials_specified": "3",
+            "relator_code": "4",
+            "institution_to_which_field_applies": "5",
+            "linkage": "6",
+            "field_link_and_sequence_number": "8",
+            "meeting_name_or_jurisdiction_name_as_entry_element": "a",
+            "location_of_meeting": "c",
+            "date_of_meeting": "d",
+            "subordinate_unit": "e",
+            "date_of_a_work": "f",
+            "miscellaneous_information": "g",
+            "medium": "h",
+            "relationship_information": "i",
+            "relator_term": "j",
+            "form_subheading": "k",
+            "language_of_a_work": "l",
+            "number_of_part_section_meeting": "n",
+            "name_of_part_section_of_a_work": "p",
+            "name_of_meeting_following_jurisdiction_name_entry_element": "q",
+            "version": "s",
+            "title_of_a_work": "t",
+            "affiliation": "u",
+            "international_standard_serial_number": "x",
+        },
+    ),
+    "added_entry_uncontrolled_name": (
+        "720",
+        {
+            "relator_code": "4",
+            "linkage": "6",
+            "field_link_and_sequence_number": "8",
+            "name": "a",
+            "relator_term": "e",
+        },
+    ),
+    "added_entry_hierarchical_place_name": (
+        "752",
+        {
+            "country_or_larger_entity": "a",
+            "first_order_political_jurisdiction": "b",
+            "intermediate_political_jurisdiction": "c",
+            "city": "d",
+        },
+    ),
+    "main_series_entry": ("760", {"other_item_identifier": "o", "title": "t"}),
+    "subseries_entry": ("762", {"other_item_identifier": "o", "title": "t"}),
+    "original_language_entry": ("765", {"other_item_identifier": "o", "title": "t"}),
+    "translation_entry": ("767", {"other_item_identifier": "o", "title": "t"}),
+    "supplement_special_issue_entry": (
+        "770",
+        {"other_item_identifier": "o", "title": "t"},
+    ),
+    "supplement_parent_entry": ("772", {"other_item_identifier": "o", "title": "t"}),
+    "host_item_entry": ("773", {"other_item_identifier": "o", "title": "t"}),
+    "constituent_unit_entry": ("774", {"other_item_identifier": "o", "title": "t"}),
+    "other_edition_entry": ("775", {"other_item_identifier": "o", "title": "t"}),
+    "additional_physical_form_entry": (
+        "776",
+        {"other_item_identifier": "o", "title": "t"},
+    ),
+    "issued_with_entry": ("777", {"other_item_identifier": "o", "title": "t"}),
+    "preceding_entry": ("780", {"other_item_identifier": "o", "title": "t"}),
+    "succeeding_entry": ("785", {"other_item_identifier": "o", "title": "t"}),
+    "data_source_entry": ("786", {"other_item_identifier": "o", "title": "t"}),
+    "other_relationship_entry": ("787", {"other_item_identifier": "o", "title": "t"}),
+    "electronic_location_and_access": (
+        "856",
+        {"electronic_format_type": "q", "uniform_resource_identifier": "u"},
+    ),
+}
+"""The MARC 21 fields read by the serializer.
+
+Every key of the record is mapped to the tag of the field and the codes of
+its subfields, as in ``dojson.contrib.to_marc21``. Only the subfields used
+by the Dublin Core elements are listed.
+"""
+
+TYPES_OF_RECORD = {
+    "language_material": "a",
+    "notated_music": "c",
+    "manuscript_notated_music": "d",
+    "cartographic_material": "e",
+    "manuscript_cartographic_material": "f",
+    "projected_medium": "g",
+    "nonmusical_sound_recording": "i",
+    "musical_sound_recording": "j",
+    "two-dimensional_nonprojectable_graphic": "k",
+    "computer_file": "m",
+    "kit": "o",
+    "mixed_materials": "p",
+    "three-dimensional_artifact_or_naturally_occuring_object": "r",
+    "manuscript_language_material": "t",
+}
+"""The codes of the type of record (leader/06)."""
+
+TYPES = (
+    ("at", "text"),
+    ("ef", "cartographic"),
+    ("cd", "notated music"),
+    ("ij", "sound recording"),
+    ("k", "still image"),
+    ("g", "moving image"),
+    ("r", "three dimensional object"),
+    ("m", "software, multimedia"),
+    ("p", "mixed material"),
+)
+"""The ``dc:type`` of the types of record."""
+
+LINKING_ENTRIES = (
+    "760",
+    "762",
+    "765",
+    "767",
+    "770",
+    "772",
+    "773",
+    "774",
+    "775",
+    "776",
+    "777",
+    "780",
+    "785",
+    "786",
+    "787",
+)
+
+NOTES = tuple(
+    sorted(
+        tag
+        for tag, _ in FIELDS.values()
+        if tag.startswith("5") and tag not in ("506", "530", "540", "546")
+    )
+)
+
+ELEMENTS = (
+    ("title", ("245",), "abfghk", "select"),
+    ("creator", ("100", "110", "111", "700", "710", "711", "720"), None, "all"),
+    ("type", (), None, "leader"),
+    ("type", ("655",), None, "all"),
+    ("publisher", ("260",), "ab", "select"),
+    ("date", ("260",), "c", "each"),
+    ("language", (), None, "language"),
+    ("format", ("856",), "q", "each"),
+    ("description", ("520",), "a", "first"),
+    ("description", ("521",), "a", "first"),
+    ("description", NOTES, "a", "first"),
+    ("subject", ("600",), "abcdq", "select"),
+    ("subject", ("610",), "abcdq", "select"),
+    ("subject", ("611",), "abcdq", "select"),
+    ("subject", ("630",), "abcdq", "select"),
+    ("subject", ("650",), "abcdq", "select"),
+    ("subject", ("653",), "abcdq", "select"),
+    ("coverage", ("752",), "abcd", "select"),
+    ("relation", ("530",), "abcdu", "select"),
+    ("relation", LINKING_ENTRIES, "ot", "select"),
+    ("identifier", ("856",), "u", "first"),
+    ("identifier", ("020",), "a", "isbn"),
+    ("rights", ("506",), "a", "first"),
+    ("rights", ("540",), "a", "first"),
+)
+"""The Dublin Core elements in the order of ``MARC21slim2OAIDC.xsl``.
+
+Each element is created from the fields with the given tags, in the order of
+the record, and from the subfields with the given codes:
+
+* ``select`` - the subfields joined with spaces;
+* ``all`` - all the subfields concatenated;
+* ``first`` - the first subfield;
+* ``each`` - one element per subfield;
+* ``isbn`` - the first subfield as ISBN URN;
+* ``leader`` and ``language`` - the type of record from the leader and the
+  language from the fixed-length data elements (008/35-37).
+"""
+
+
+def _occurrences(order, values):
+    """Yield the ``(key, value)`` pairs in the order of the keys.
+
+    A repeated key takes the next item of its list of values.
+    """
+    seen = Counter()
+    for key in order:
+        value = values.get(key)
+        index = seen[key]
+        seen[key] += 1
+        if isinstance(value, (list, tuple)):
+            if index < len(value):
+                yield key, value[index]
+        elif index == 0 and value is not None:
+            yield key, value
+
+
+def _fields(record):
+    """Yield the ``(key, value)`` pairs of the fields of a record in order."""
+    if "__order__" in record:
+        return _occurrences(record["__order__"], record)
+    return chain.from_iterable(
+        ((key, item) for item in value) if isinstance(value, list) else [(key, value)]
+        for key, value in record.items()
+    )
+
+
+def _subfields(value, codes):
+    """Return the ``(code, text)`` pairs of the subfields of a field."""
+    order = value["__order__"] if "__order__" in value else list(value)
+    return [
+        (codes[name], str(text))
+        for name, text in _occurrences(order, value)
+        if name in codes
+    ]
+
+
+def _select(fields, codes):
+    """Join the selected subfields of every field with spaces."""
+    for subfields in fields:
+        yield " ".join(text for code, text in subfields if code in codes)
+
+
+def _all(fields, codes):
+    """Concatenate all the subfields of every field."""
+    for subfields in fields:
+        yield "".join(text for _, text in subfields)
+
+
+def _first(fields, codes):
+    """Return the first selected subfield of every field."""
+    for subfields in fields:
+        yield next((text for code, text in subfields if code in codes), "")
+
+
+def _each(fields, codes):
+    """Return every selected subfield of every field."""
+    for subfields in fields:
+        for code, text in subfields:
+            if code in codes:
+                yield text
+
+
+def _isbn(fields, codes):
+    """Return the first selected subfield of every field as ISBN URN."""
+    for text in _first(fields, codes):
+        yield "URN:ISBN:" + text
+
+
+def _leader(record):
+    """Return the type of a record from its leader."""
+    leader = record.get("leader")
+    if not isinstance(leader, dict):
+        return [""]
+    type_of_record = TYPES_OF_RECORD.get(leader.get("type_of_record"), " ")
+    text = ""
+    if leader.get("bibliographic_level") == "collection":
+        text += "collection"
+    if type_of_record in "dfpt":
+        text += "manuscript"
+    for codes, name in TYPES:
+        if type_of_record in codes:
+            text += name
+            break
+    return [text]
+
+
+def _language(record):
+    """Return the language of a record from the fixed-length data elements."""
+    value = record.get("fixed_length_data_elements")
+    if isinstance(value, (list, tuple)):
+        value = value[0] if value else None
+    return [value[35:38] if isinstance(value, str) else ""]
+
+
+MODES = {
+    "select": _select,
+    "all": _all,
+    "first": _first,
+    "each": _each,
+    "isbn": _isbn,
+}
+
+
+def dumps_oai_dc(pid, record, **kwargs):
+    """Dump a MARC 21 record as ``oai_dc`` element.
+
+    :param pid: The :class:`invenio_pidstore.models.PersistentIdentifier`
+        instance.
+    :param record: The search hit of the record, with the MARC 21 JSON in
+        ``_source``.
+    :returns: A LXML Element instance.
+    """
+    source = record["_source"]
+
+    fields = defaultdict(list)
+    for position, (key, value) in enumerate(_fields(source)):
+        if key in FIELDS and isinstance(value, dict):
+            tag, codes = FIELDS[key]
+            fields[tag].append((position, _subfields(value, codes)))
+
+    e_dc = Element(etree.QName(NS_OAIDC, "dc"), nsmap=NSMAP)
+    e_dc.set(etree.QName(NS_XSI, "schemaLocation"), SCHEMA_LOCATION)
+    for name, tags, codes, mode in ELEMENTS:
+        if mode == "leader":
+            texts = _leader(source)
+        elif mode == "language":
+            texts = _language(source)
+        else:
+            texts = MODES[mode](
+                (
+                    subfields
+                    for _, subfields in sorted(
+                        chain.from_iterable(fields[tag] for tag in tags),
+                        key=lambda field: field[0],
+                    )
+                ),
+                codes,
+            )
+        for text in texts:
+            SubElement(e_dc, etree.QName(NS_DC, name)).text = text or None
+    return e_dc
@@ -13,40 +13,140 @@ from invenio_search import current_search, current_search_client
 from invenio_search.engine import search
 from invenio_search.utils import build_index_name
 
+from invenio_oaiserver.proxies import current_oaiserver
 from invenio_oaiserver.query import query_string_parser
 
 
-def _build_percolator_index_name(index):
-    """Build percolator index name."""
+def _find_percolator_index_name(index):
+    """Return the percolator index name and whether it has the ``query`` mapping.
+
+    Only reads the state of the cluster.
+    """
     # For backward compatibility only: percolators used to be written into a different index, with the suffix
     # `-percolators`. In recent versions, the percolators can coexist in the same indices as the records
-
     percolator_index = build_index_name(index, suffix="", app=current_app)
-    if current_search_client.indices.exists(f"{percolator_index}-percolators"):
-        percolator_index = f"{percolator_index}-percolators"
-    # If it does not exist, but we want it, we create it
+    dedicated_index = f"{percolator_index}-percolators"
+    if current_search_client.indices.exists(dedicated_index):
+        percolator_index = dedicated_index
     elif current_app.config["OAISERVER_PERCOLATOR_DEDICATED_INDEX"]:
-        percolator_index = f"{percolator_index}-percolators"
+        return dedicated_index, False
+
+    mapping = current_search_client.indices.get_field_mapping(
+        index=percolator_index, fields="query"
+    )
+    return percolator_index, (
+        percolator_index in mapping and "query" in mapping[percolator_index]["mappings"]
+    )
+
+
+def _resolve_percolator_index_name(index):
+    """Resolve the percolator index name, creating the index if needed."""
+    percolator_index, has_mapping = _find_percolator_index_name(index)
+    if has_mapping:
+        return percolator_index
+
+    # If it does not exist, but we want it, we create it
+    if not current_search_client.indices.exists(percolator_index):
         mapping_path = current_search.mappings[index]
         with open(mapping_path, "r") as body:
             mapping = json.load(body)
             current_search_client.indices.create(index=percolator_index, body=mapping)
 
-    # Let's check as well that the mapping for `query` exists. It would be better if this was done only once
-    # The main issue is that the first time could be either creating a set, or querying if a record is in any set
-    mapping = current_search_client.indices.get_field_mapping(
-        index=percolator_index, fields="query"
+    # The field is not there. Adding the mapping
+    current_search_client.indices.put_mapping(
+        index=percolator_index,
+        body={"properties": {"query": {"type": "percolator"}}},
     )
-    if (
-        not percolator_index in mapping
-        or "query" not in mapping[percolator_index]["mappings"]
+    return percolator_index
+
+
+def _build_percolator_index_name(index):
+    """Build percolator index name.
+
+    The resolved name is cached per application and index. On a miss, the
+    cluster is only read: the percolator index is created by
+    :func:`init_percolator_indices`, when a set is created.
+
+    :returns: The name of the percolator index, or ``None`` if it has no
+        ``query`` mapping yet, which means that there is no set to percolate.
+    """
+    cache = current_oaiserver.percolator_indices
+    if index not in cache:
+        percolator_index, has_mapping = _find_percolator_index_name(index)
+        if not has_mapping:
+            return None
+        cache[index] = percolator_index
+    return cache[index]
+
+
+def clear_percolator_index_cache(index=None):
+    """Forget the resolved percolator index names.
+
+    :param index: The record index to forget. (Default: all indices)
+    """
+    if index is None:
+        current_oaiserver.percolator_indices.clear()
+    else:
+        current_oaiserver.percolator_indices.pop(index, None)
+
+
+def _oai_record_indices():
+    """Return the indices with records exposed via OAI-PMH."""
+    # NOTE: We call `str` so that we can also handle lazy values (e.g. a LocalProxy)
+    oai_records_index = str(current_app.config["OAISERVER_RECORD_INDEX"])
+    for index, _ in (
+        current_search.mappings.items() | current_search.index_templates.items()
     ):
-        # The field is not there. Adding the mapping
-        current_search_client.indices.put_mapping(
-            index=percolator_index,
-            body={"properties": {"query": {"type": "percolator"}}},
+        # Skip indices/mappings not used by OAI-PMH
+        if index.startswith(oai_records_index):
+            yield index
+
+
+def _percolated_indices():
+    """Return the record indices whose percolator index is used."""
+    record_index = str(current_app.config["OAISERVER_RECORD_INDEX"])
+    return [record_index] + [
+        index for index in _oai_record_indices() if index != record_index
+    ]
+
+
+def init_percolator_indices():
+    """Create and verify the percolator indices of all OAI record indices.
+
+    :returns: The names of the percolator indices.
+    """
+    resolved = {
+        index: _resolve_percolator_index_name(index) for index in _percolated_indices()
+    }
+    # the names are only replaced once they are all resolved
+    current_oaiserver.percolator_indices = resolved
+    return sorted(set(resolved.values()))
+
+
+def load_percolator_indices():
+    """Load the names of the initialized percolator indices.
+
+    It runs once when the application is finalized, and does not create the
+    missing percolator indices.
+    """
+    try:
+        cache = current_oaiserver.percolator_indices
+        for index in _percolated_indices():
+            percolator_index, has_mapping = _find_percolator_index_name(index)
+            if has_mapping:
+                cache[index] = percolator_index
+    except Exception:
+        current_app.logger.warning(
+            "Percolator indices could not be loaded.", exc_info=True
         )
-    return percolator_index
+
+
+def refresh_percolator_indices():
+    """Refresh the percolator indices, to search the last written sets."""
+    for index in _oai_record_indices():
+        percolator_index = _build_percolator_index_name(index)
+        if percolator_index:
+            current_search_client.indices.refresh(index=percolator_index)
 
 
 def _new_percolator(spec, search_pattern):
@@ -54,14 +154,8 @@ def _new_percolator(spec, search_pattern):
     if spec and search_pattern:
         query = query_string_parser(search_pattern=search_pattern).to_dict()
 
-        # NOTE: We call `str` so that we can also handle lazy values (e.g. a LocalProxy)
-        oai_records_index = str(current_app.config["OAISERVER_RECORD_INDEX"])
-        for index, _ in (
-            current_search.mappings.items() | current_search.index_templates.items()
-        ):
-            # Skip indices/mappings not used by OAI-PMH
-            if not index.startswith(oai_records_index):
-                continue
+        init_percolator_indices()
+        for index in _oai_record_indices():
             try:
                 percolator_index = _build_percolator_index_name(index)
                 current_search_client.index(
@@ -75,15 +169,8 @@ def _new_percolator(spec, search_pattern):
 
 def _delete_percolator(spec, search_pattern):
     """Delete percolator associated with the removed/updated oaiset."""
-    # NOTE: We call `str` so that we can also handle lazy values (e.g. a LocalProxy)
-    oai_records_index = str(current_app.config["OAISERVER_RECORD_INDEX"])
-    # Create the percolator doc_type in the existing index for >= ES5
-    for index, _ in (
-        current_search.mappings.items() | current_search.index_templates.items()
-    ):
-        # Skip indices/mappings not used by OAI-PMH
-        if not index.startswith(oai_records_index):
-            continue
+    init_percolator_indices()
+    for index in _oai_record_indices():
         current_search_client.delete(
             index=_build_percolator_index_name(index),
             id="oaiset-{}".format(spec),
@@ -110,11 +197,13 @@ def create_percolate_query(
                 }
             }
         )
+        bool_query = {"must": queries}
     elif (
         document_search_ids is not None
         and document_search_indices is not None
         and len(document_search_ids) == len(document_search_indices)
     ):
+        # one named query per document, a percolator matches any of them
         queries.extend(
             [
                 {
@@ -122,7 +211,7 @@ def create_percolate_query(
                         "field": "query",
                         "index": search_index,
                         "id": search_id,
-                        "name": f"{search_index}:{search_id}",
+                        "name": _document_name(search_index, search_id),
                     }
                 }
                 for (search_id, search_index) in zip(
@@ -130,6 +219,7 @@ def create_percolate_query(
                 )
             ]
         )
+        bool_query = {"should": queries, "minimum_should_match": 1}
     else:
         raise Exception(
             _(
@@ -138,9 +228,9 @@ def create_percolate_query(
         )
 
     if percolator_ids:
-        queries.append({"ids": {"values": percolator_ids}})
+        bool_query["filter"] = [{"ids": {"values": percolator_ids}}]
 
-    query = {"query": {"bool": {"must": queries}}}
+    query = {"query": {"bool": bool_query}}
     return query
 
 
@@ -158,24 +248,65 @@ def percolate_query(
         document_search_ids=document_search_ids,
         document_search_indices=document_search_indices,
     )
-    result = search.helpers.scan(
+    return _execute_percolate_query(percolator_index, query)
+
+
+def _execute_percolate_query(percolator_index, query):
+    """Return the hits of a percolate query.
+
+    Up to ``OAISERVER_PERCOLATOR_SEARCH_SIZE`` matching percolators are fetched
+    with a single search request. A scan is only used when there are more.
+    """
+    size = current_app.config["OAISERVER_PERCOLATOR_SEARCH_SIZE"]
+    if size:
+        response = current_search_client.search(
+            index=percolator_index,
+            body=dict(query, size=size, track_total_hits=True, _source=False),
+            filter_path=["hits.total", "hits.hits._id", "hits.hits.fields"],
+        )
+        hits = response.get("hits", {})
+        if hits.get("total", {}).get("value", 0) <= size:
+            return hits.get("hits", [])
+
+    return search.helpers.scan(
         current_search_client,
         index=percolator_index,
         query=query,
         scroll="1m",
     )
-    return result
 
 
-def sets_search_all(records):
-    """Retrieve sets for provided records."""
-    if not records:
-        return []
+def _document_name(search_index, search_id):
+    """Return the name of the percolate query of an indexed document."""
+    return f"{search_index}:{search_id}"
 
-    record_index = str(current_app.config["OAISERVER_RECORD_INDEX"])
-    percolator_index = _build_percolator_index_name(record_index)
-    record_sets = [[] for _ in range(len(records))]
-    result = percolate_query(percolator_index, documents=records)
+
+def _matching_slots(hit, count, names=None):
+    """Return the slots of the documents matched by a percolator.
+
+    A single percolate query reports the slots in ``_percolator_document_slot``
+    and named ones, by document, in ``_percolator_document_slot_<name>``.
+
+    :param names: The slots of the documents by percolate query name.
+    """
+    fields = hit.get("fields", {})
+    slots = list(fields.get("_percolator_document_slot", []))
+    prefix = "_percolator_document_slot_"
+    for field in fields:
+        if field.startswith(prefix):
+            slots.extend((names or {}).get(field[len(prefix) :], []))
+    if not fields and count == 1:
+        # the slot is not reported for a single document percolated by id
+        slots.append(0)
+    return slots
+
+
+def _percolated_sets(result, count, names=None):
+    """Return the sets of each percolated document from the matching sets.
+
+    :param names: The slots of the documents by percolate query name.
+    """
+    record_sets = [[] for _ in range(count)]
     prefix = "oaiset-"
     prefix_len = len(prefix)
 
@@ -183,13 +314,48 @@ def sets_search_all(records):
         set_index_id = s["_id"]
         if set_index_id.startswith(prefix):
             set_spec = set_index_id[prefix_len:]
-            for record_index in s.get("fields", {}).get(
-                "_percolator_document_slot", []
-            ):
+            for record_index in _matching_slots(s, count, names):
                 record_sets[record_index].append(set_spec)
     return record_sets
 
 
+def sets_search_all(records):
+    """Retrieve sets for provided records."""
+    if not records:
+        return []
+
+    record_index = str(current_app.config["OAISERVER_RECORD_INDEX"])
+    percolator_index = _build_percolator_index_name(record_index)
+    if percolator_index is None:
+        return [[] for _ in records]
+    result = percolate_query(percolator_index, documents=records)
+    return _percolated_sets(result, len(records))
+
+
+def sets_search_by_ids(hits):
+    """Retrieve sets for indexed records without sending their documents.
+
+    The records are percolated by reference (index and id), so the search
+    hits do not need to include the ``_source``.
+    """
+    if not hits:
+        return []
+
+    record_index = str(current_app.config["OAISERVER_RECORD_INDEX"])
+    percolator_index = _build_percolator_index_name(record_index)
+    if percolator_index is None:
+        return [[] for _ in hits]
+    names = {}
+    for slot, hit in enumerate(hits):
+        names.setdefault(_document_name(hit["_index"], hit["_id"]), []).append(slot)
+    result = percolate_query(
+        percolator_index,
+        document_search_ids=[hit["_id"] for hit in hits],
+        document_search_indices=[hit["_index"] for hit in hits],
+    )
+    return _percolated_sets(result, len(hits), names)
+
+
 def find_sets_for_record(record):
     """Fetch a record's sets."""
     return sets_search_all([record])[0]
@@ -0,0 +1,196 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Background prefetch of the next page of a harvest.
+
+Harvesters request the pages of a list one after the other, so when a page
+with a resumption token is served, the next page is searched in a thread and
+kept until the harvester resumes with the token.
+
+The next page is searched with ``search_after`` (and the point in time of the
+token in the ``pit`` pagination mode), which does not move any search context.
+A harvester resuming before the prefetch ends waits for it, and a harvester
+resuming after the page has been dropped gets it from the search context or
+the sort values of its token, as without prefetch.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, request
+
+from .proxies import current_oaiserver
+
+KEY_ARGUMENTS = ("verb", "metadataPrefix", "set", "from", "until")
+"""Request arguments identifying the list of a harvest."""
+
+
+def page_key(params, page, search_after):
+    """Return the key of a page of a harvest.
+
+    :param params: The arguments of the request, merged with the content of
+        the resumption token.
+    :param page: The page number.
+    :param search_after: The sort values of the last hit of the previous page.
+    """
+    return repr(
+        tuple(str(params.get(name)) for name in KEY_ARGUMENTS)
+        + (page, tuple(search_after or ()))
+    )
+
+
+class PrefetchedPages(object):
+    """Pages being prefetched, bounded in number and in time.
+
+    A value is the future of the search response and of the sets of its hits.
+    The futures of the dropped pages are cancelled.
+    """
+
+    def __init__(self, app):
+        """Initialize the pages.
+
+        :param app: An instance of :class:`flask.Flask`.
+        """
+        self.max_pages = app.config["OAISERVER_PREFETCH_MAX_PAGES"]
+        self.timeout = app.config["OAISERVER_PREFETCH_TIMEOUT"]
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of pages."""
+        return len(self._data)
+
+    def __contains__(self, key):
+        """Return whether a page is prefetched."""
+        return key in self._data
+
+    @property
+    def pending(self):
+        """Return the number of pages still being searched."""
+        return sum(1 for future, _ in list(self._data.values()) if not future.done())
+
+    def put(self, key, future):
+        """Add a page and drop the expired and the oldest ones."""
+        now = time.monotonic()
+        with self._lock:
+            dropped = [k for k, (_, expires) in self._data.items() if expires < now]
+            dropped = [self._data.pop(k)[0] for k in dropped]
+            self._data[key] = (future, now + self.timeout)
+            while len(self._data) > self.max_pages:
+                dropped.append(self._data.popitem(last=False)[1][0])
+        for dropped_future in dropped:
+            dropped_future.cancel()
+
+    def pop(self, key):
+        """Remove a page and return its future or ``None``."""
+        with self._lock:
+            future, expires = self._data.pop(key, (None, None))
+        if future is not None and expires < time.monotonic():
+            future.cancel()
+            future = None
+        if future is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return future
+
+
+def _serialize(app, base_url, hits, metadata_prefix):
+    """Serialize the records of a page into the fragment cache."""
+    from .response import page_fragments
+
+    # the serializers may build URLs
+    with app.test_request_context(base_url=base_url):
+        pids = [
+            current_oaiserver.oaiid_fetcher(hit["_id"], hit["_source"]) for hit in hits
+        ]
+        for _ in page_fragments(pids, hits, metadata_prefix):
+            pass
+
+
+def _fetch(app, base_url, params, page, size, keep_alive):
+    """Search a page and the sets of its hits, in a prefetch worker."""
+    from .query import _pit_page, _search_after_page
+    from .response import find_sets
+
+    with app.app_context():
+        if params.get("pit_id"):
+            response = _pit_page(params, page, size, keep_alive)
+        else:
+            response = _search_after_page(params, page, size, keep_alive)
+
+        hits = response["hits"]["hits"]
+        sets = find_sets([{"json": hit} for hit in hits], params.get("metadataPrefix"))
+
+        if (
+            params.get("verb") == "ListRecords"
+            and app.config["OAISERVER_PREFETCH_SERIALIZE"]
+            and current_oaiserver.fragment_cache is not None
+        ):
+            try:
+                _serialize(app, base_url, hits, params["metadataPrefix"])
+            except Exception:
+                # the records are serialized again when the page is served
+                app.logger.exception("Serialization of a prefetched page failed.")
+        return response, sets
+
+
+def prefetch_next_page(pagination, params, keep_alive):
+    """Start the search of the page following a page of a harvest.
+
+    :param pagination: The :class:`invenio_oaiserver.query.Pagination` of the
+        served page.
+    :param params: The arguments of the request, merged with the content of
+        the resumption token.
+    """
+    executor = current_oaiserver.prefetch_executor
+    if executor is None or not pagination.has_next or not pagination._search_after:
+        return
+
+    key = page_key(params, pagination.next_num, pagination._search_after)
+    pages = current_oaiserver.prefetched_pages
+    if key in pages:
+        return
+    # do not queue more searches than the workers can run
+    if pages.pending >= current_app.config["OAISERVER_PREFETCH_WORKERS"]:
+        return
+
+    next_params = {name: params[name] for name in KEY_ARGUMENTS if name in params}
+    next_params["search_after"] = pagination._search_after
+    if pagination._pit_id:
+        next_params["pit_id"] = pagination._pit_id
+    pages.put(
+        key,
+        executor.submit(
+            _fetch,
+            current_app._get_current_object(),
+            request.url_root,
+            next_params,
+            pagination.next_num,
+            pagination.per_page,
+            keep_alive,
+        ),
+    )
+
+
+def prefetched_page(params, page):
+    """Return the prefetched response and sets of a page or ``None``.
+
+    Waits for the prefetch of the page when it is still running.
+    """
+    if current_oaiserver.prefetch_executor is None or page == 1:
+        return None
+
+    future = current_oaiserver.prefetched_pages.pop(
+        page_key(params, page, params.get("search_after"))
+    )
+    if future is None:
+        return None
+    try:
+        return future.result()
+    except Exception:
+        current_app.logger.exception("Prefetch of a harvest page failed.")
+        return None
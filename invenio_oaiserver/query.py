@@ -4,14 +4,21 @@
 
 """Query parser."""
 
+from datetime import datetime
+
 from flask import current_app
 from invenio_search import RecordsSearch, current_search_client
 from invenio_search.engine import dsl
+from invenio_search.engine import search as search_engine
+from invenio_search.utils import build_alias_name
+from itsdangerous import BadSignature
 from werkzeug.utils import cached_property, import_string
 
 from invenio_oaiserver.errors import OAINoRecordsMatchError
 
 from . import current_oaiserver
+from .prefetch import prefetch_next_page, prefetched_page
+from .utils import source_filter
 
 
 def query_string_parser(search_pattern):
@@ -40,91 +47,330 @@ class OAIServerSearch(RecordsSearch):
         default_filter = dsl.Q("exists", field="_oai.id")
 
 
-def get_records(**kwargs):
-    """Get records paginated."""
-    page_ = kwargs.get("resumptionToken", {}).get("page", 1)
-    size_ = current_app.config["OAISERVER_PAGE_SIZE"]
-    scroll = current_app.config["OAISERVER_RESUMPTION_TOKEN_EXPIRE_TIME"]
-    scroll_id = kwargs.get("resumptionToken", {}).get("scroll_id")
+def _build_search(params):
+    """Build the search for the OAI-PMH list request parameters."""
+    search = current_oaiserver.search_cls(
+        index=current_app.config["OAISERVER_RECORD_INDEX"],
+    ).extra(
+        version=True,
+    )
 
-    if scroll_id is None:
-        search = (
-            current_oaiserver.search_cls(
-                index=current_app.config["OAISERVER_RECORD_INDEX"],
-            )
-            .params(
-                scroll="{0}s".format(scroll),
-            )
-            .extra(
-                version=True,
-            )[(page_ - 1) * size_ : page_ * size_]
+    if (
+        params.get("verb") == "ListIdentifiers"
+        and current_app.config["OAISERVER_LISTIDENTIFIERS_SOURCE_FREE"]
+    ):
+        search = search.source(False).extra(
+            docvalue_fields=[
+                "_oai.id",
+                "_oai.sets",
+                {
+                    "field": current_oaiserver.last_update_key,
+                    "format": "strict_date_hour_minute_second",
+                },
+            ]
+        )
+    else:
+        source = source_filter(
+            params.get("metadataPrefix"),
+            rendered=params.get("verb") != "ListIdentifiers",
         )
+        if source:
+            search = search.source(**source)
 
-        if "set" in kwargs:
+    if "set" in params:
+        if current_app.config["OAISERVER_MATERIALIZE_SETS"]:
+            search = search.filter("term", **{"_oai.sets": params["set"]})
+        else:
             search = search.query(
-                current_oaiserver.set_records_query_fetcher(kwargs["set"])
+                current_oaiserver.set_records_query_fetcher(params["set"])
             )
 
-        time_range = {}
-        if "from" in kwargs:
-            time_range["gte"] = kwargs["from"]
-        if "until" in kwargs:
-            time_range["lte"] = kwargs["until"]
-        if time_range:
-            search = search.filter(
-                "range", **{current_oaiserver.last_update_key: time_range}
-            )
+    time_range = {}
+    if "from" in params:
+        time_range["gte"] = params["from"]
+    if "until" in params:
+        time_range["lte"] = params["until"]
+    if time_range:
+        search = search.filter(
+            "range", **{current_oaiserver.last_update_key: time_range}
+        )
+
+    return search
+
+
+def _tiebreaker_key():
+    """Return the field breaking the ties of the ``search_after`` sort.
+
+    Defaults to the field of the ``exists`` filter of the search class, which
+    every listed record has.
+    """
+    key = current_app.config["OAISERVER_SORT_TIEBREAKER_KEY"]
+    if key:
+        return key
+    meta = getattr(current_oaiserver.search_cls, "Meta", None)
+    default_filter = getattr(meta, "default_filter", None)
+    if getattr(default_filter, "name", None) == "exists":
+        return default_filter.field
+    return "_oai.id"
+
+
+def _search_after_sort():
+    """Return deterministic sort used for ``search_after`` pagination."""
+    return [
+        {current_oaiserver.last_update_key: {"order": "asc"}},
+        {_tiebreaker_key(): {"order": "asc"}},
+    ]
 
-        response = search.execute().to_dict()
+
+def _track_total_hits():
+    """Return the ``track_total_hits`` of the list searches."""
+    return current_app.config["OAISERVER_TRACK_TOTAL_HITS"]
+
+
+def list_size(params):
+    """Return the exact number of records of a list, or ``None``.
+
+    The number is counted once per set and date range, and cached for
+    ``OAISERVER_LIST_SIZE_CACHE_TIMEOUT`` seconds in the cache server, if
+    any, or in the process, where at most
+    ``OAISERVER_LIST_SIZE_CACHE_MAX_ENTRIES`` numbers are kept.
+    """
+    timeout = current_app.config["OAISERVER_LIST_SIZE_CACHE_TIMEOUT"]
+    if not timeout:
+        return None
+
+    bucket = repr(tuple(str(params.get(name)) for name in ("set", "from", "until")))
+    if current_oaiserver.cache:
+        key = "{0}listSize::{1}".format(
+            current_app.config["OAISERVER_CACHE_KEY"], bucket
+        )
+        size = current_oaiserver.cache.get(key)
+        if size is None:
+            size = _build_search(params).count()
+            current_oaiserver.cache.set(key, size, timeout=timeout)
+        return size
+
+    size = current_oaiserver.list_sizes.get(bucket)
+    if size is None:
+        size = _build_search(params).count()
+        current_oaiserver.list_sizes.set(bucket, size, timeout)
+    return size
+
+
+def _open_point_in_time(index, keep_alive):
+    """Open a point in time on the given index and return its id."""
+    if hasattr(current_search_client, "create_point_in_time"):
+        # OpenSearch
+        response = current_search_client.create_point_in_time(
+            index=index, keep_alive=keep_alive
+        )
+        return response["pit_id"]
+    response = current_search_client.open_point_in_time(
+        index=index, keep_alive=keep_alive
+    )
+    return response["id"]
+
+
+def _close_point_in_time(pit_id):
+    """Release a point in time."""
+    if hasattr(current_search_client, "delete_point_in_time"):
+        # OpenSearch
+        current_search_client.delete_point_in_time(
+            body={"pit_id": [pit_id]}, ignore=[404]
+        )
     else:
-        response = current_search_client.scroll(
+        current_search_client.close_point_in_time(body={"id": pit_id}, ignore=[404])
+
+
+def _search_after_page(params, page, size, keep_alive):
+    """Fetch a page of results restarting from the last seen sort values.
+
+    No search context is needed, so this works after the scroll or point in
+    time of a resumption token has expired.
+    """
+    search = (
+        _build_search(params)
+        .sort(*_search_after_sort())
+        .extra(track_total_hits=_track_total_hits())[0:size]
+    )
+    if params.get("search_after"):
+        search = search.extra(search_after=params["search_after"])
+    return search.execute().to_dict()
+
+
+def _restart_page(params, page, size, keep_alive):
+    """Fetch the page of an expired search context from its last position.
+
+    :raises itsdangerous.BadSignature: If the token has no last position.
+    """
+    if not params.get("search_after"):
+        raise BadSignature("Expired resumption token.")
+    return _search_after_page(params, page, size, keep_alive)
+
+
+def _scroll_page(params, page, size, keep_alive):
+    """Fetch a page of results using the scroll API."""
+    scroll_id = params.get("scroll_id")
+    if scroll_id is None:
+        # scroll contexts always count all the hits
+        if params.get("search_after") or _track_total_hits() is not True:
+            return _search_after_page(params, page, size, keep_alive)
+
+        search = _build_search(params).params(
+            scroll=keep_alive,
+        )[(page - 1) * size : page * size]
+        if current_app.config["OAISERVER_SCROLL_SEARCH_AFTER"]:
+            search = search.sort(*_search_after_sort())
+        return search.execute().to_dict()
+
+    try:
+        return current_search_client.scroll(
             scroll_id=scroll_id,
-            scroll="{0}s".format(scroll),
+            scroll=keep_alive,
         )
+    except search_engine.NotFoundError:
+        # The scroll context has expired, restart from the last position.
+        return _restart_page(params, page, size, keep_alive)
+
+
+def _pit_page(params, page, size, keep_alive):
+    """Fetch a page of results using a point in time and ``search_after``."""
+    pit_id = params.get("pit_id")
+    if pit_id is None:
+        pit_id = _open_point_in_time(
+            build_alias_name(
+                str(current_app.config["OAISERVER_RECORD_INDEX"]), app=current_app
+            ),
+            keep_alive,
+        )
+
+    body = _build_search(params).to_dict()
+    body.update(
+        pit={"id": pit_id, "keep_alive": keep_alive},
+        sort=_search_after_sort(),
+        size=size,
+        track_total_hits=_track_total_hits(),
+    )
+    if params.get("search_after"):
+        body["search_after"] = params["search_after"]
+
+    try:
+        response = current_search_client.search(body=body)
+    except search_engine.NotFoundError:
+        # The point in time has expired, restart from the last position.
+        return _restart_page(params, page, size, keep_alive)
+    response.setdefault("pit_id", pit_id)
+    return response
+
+
+PAGINATION_MODES = {
+    "scroll": _scroll_page,
+    "pit": _pit_page,
+}
+"""Available implementations of ``OAISERVER_PAGINATION_MODE``."""
 
-    class Pagination(object):
-        """Dummy pagination class."""
 
-        page = page_
-        per_page = size_
+class Pagination(object):
+    """Pagination over a page of OAI-PMH search results.
 
-        def __init__(self, response):
-            """Initilize pagination."""
-            self.response = response
-            self.total = response["hits"]["total"]["value"]
-            self._scroll_id = response.get("_scroll_id")
+    The ``total`` is ``None`` when the hits are not counted exactly, and then
+    the next page is expected if the page is full. ``has_next`` is computed
+    when the pagination is created, so a ``total`` set afterwards (e.g. the
+    cached :func:`list_size`) is only reported in ``completeListSize``.
+    """
 
-            if self.total == 0:
-                raise OAINoRecordsMatchError()
+    def __init__(self, response, page, per_page, sets=None):
+        """Initialize pagination.
 
-            # clean descriptor on last page
-            if not self.has_next:
+        :param sets: The sets of the hits, when they are already known.
+        """
+        self.response = response
+        self.page = page
+        self.per_page = per_page
+        self.sets = sets
+        hits_total = response["hits"].get("total", {})
+        self.total = (
+            hits_total.get("value")
+            if hits_total.get("relation", "eq") == "eq"
+            else None
+        )
+        self._scroll_id = response.get("_scroll_id")
+        self._pit_id = response.get("pit_id")
+
+        if self.total == 0 or (
+            self.total is None and page == 1 and not response["hits"]["hits"]
+        ):
+            raise OAINoRecordsMatchError()
+
+        # clean descriptor on last page
+        if not self.has_next:
+            if self._scroll_id:
                 current_search_client.clear_scroll(scroll_id=self._scroll_id)
-                self._scroll_id = None
-
-        @cached_property
-        def has_next(self):
-            """Return True if there is next page."""
-            return self.page * self.per_page <= self.total
-
-        @cached_property
-        def next_num(self):
-            """Return next page number."""
-            return self.page + 1 if self.has_next else None
-
-        @property
-        def items(self):
-            """Return iterator."""
-            from datetime import datetime
-
-            for result in self.response["hits"]["hits"]:
-                yield {
-                    "id": result["_id"],
-                    "json": result,
-                    "updated": datetime.strptime(
-                        result["_source"][current_oaiserver.last_update_key][:19],
-                        "%Y-%m-%dT%H:%M:%S",
-                    ),
-                }
-
-    return Pagination(response)
+            if self._pit_id:
+                _close_point_in_time(self._pit_id)
+            self._scroll_id = None
+            self._pit_id = None
+
+    @cached_property
+    def has_next(self):
+        """Return True if there is next page."""
+        if self.total is None:
+            return len(self.response["hits"]["hits"]) == self.per_page
+        return self.page * self.per_page <= self.total
+
+    @cached_property
+    def next_num(self):
+        """Return next page number."""
+        return self.page + 1 if self.has_next else None
+
+    @cached_property
+    def _search_after(self):
+        """Return sort values of the last hit on the page."""
+        hits = self.response["hits"]["hits"]
+        if hits and "sort" in hits[-1]:
+            return hits[-1]["sort"]
+
+    @property
+    def items(self):
+        """Return iterator."""
+        for result in self.response["hits"]["hits"]:
+            if "_source" in result:
+                updated = result["_source"][current_oaiserver.last_update_key]
+            else:
+                # Source-free hits carry the values as docvalue fields.
+                updated = result["fields"][current_oaiserver.last_update_key][0]
+            yield {
+                "id": result["_id"],
+                "json": result,
+                "updated": datetime.strptime(updated[:19], "%Y-%m-%dT%H:%M:%S"),
+            }
+
+
+def get_records(**kwargs):
+    """Get records paginated."""
+    params = dict(kwargs, **kwargs.get("resumptionToken", {}))
+    page_ = params.get("page", 1)
+    size_ = current_app.config["OAISERVER_PAGE_SIZE"]
+    keep_alive = "{0}s".format(
+        current_app.config["OAISERVER_RESUMPTION_TOKEN_EXPIRE_TIME"]
+    )
+    fetch_page = PAGINATION_MODES[current_app.config["OAISERVER_PAGINATION_MODE"]]
+
+    prefetched = prefetched_page(params, page_)
+    if prefetched is None:
+        response = fetch_page(params, page_, size_, keep_alive)
+        pagination = Pagination(response, page_, size_)
+    else:
+        if params.get("scroll_id"):
+            # the harvest continues with ``search_after``
+            current_search_client.clear_scroll(
+                scroll_id=params["scroll_id"], ignore=[404]
+            )
+        response, sets = prefetched
+        pagination = Pagination(response, page_, size_, sets=sets)
+
+    if pagination.total is None:
+        # the cached size can be outdated, it does not change ``has_next``
+        pagination.total = list_size(params)
+    prefetch_next_page(pagination, params, keep_alive)
+    return pagination
@@ -4,20 +4,109 @@
 
 """Record field function."""
 
-from .percolator import _delete_percolator, _new_percolator
+from flask import current_app
+from sqlalchemy.orm import object_session
+
+from .fetchers import clear_set_query_cache
+from .percolator import (
+    _delete_percolator,
+    _new_percolator,
+    find_sets_for_record,
+)
+from .proxies import current_oaiserver
+from .response import clear_set_fragment_cache
+
+SETS_UPDATES_KEY = "oaiserver_sets_updates"
+"""Key of the sets changed by a transaction in the session ``info``."""
+
+SETS_COMMITTED_KEY = "oaiserver_sets_committed"
+"""Key marking the committed set changes in the session ``info``."""
+
+
+def _update_records_sets(target, search_pattern=None):
+    """Queue the update of the materialized sets of the records.
+
+    The update is scheduled once the transaction of the set is committed.
+    """
+    if current_app.config["OAISERVER_MATERIALIZE_SETS"]:
+        session = object_session(target)
+        session.info.setdefault(SETS_UPDATES_KEY, {})[target.spec] = search_pattern
+
+
+def after_commit_update_records_sets(session):
+    """Mark the queued set changes as committed."""
+    if SETS_UPDATES_KEY in session.info:
+        session.info[SETS_COMMITTED_KEY] = True
+
+
+def after_transaction_end_update_records_sets(session, transaction):
+    """Schedule the update of the records of the committed sets.
+
+    The tasks are scheduled after the end of the transaction, so that eager
+    tasks can use the session, and the queued changes of a rolled back
+    transaction are dropped.
+    """
+    if transaction.parent is not None:
+        return
+    updates = session.info.pop(SETS_UPDATES_KEY, None)
+    if session.info.pop(SETS_COMMITTED_KEY, False) and updates:
+        from .tasks import update_records_sets
+
+        for spec, search_pattern in updates.items():
+            update_records_sets.delay(spec, search_pattern=search_pattern)
 
 
 def after_insert_oai_set(mapper, connection, target):
     """Update records on OAISet insertion."""
+    clear_set_query_cache(target.spec)
+    clear_set_fragment_cache(target.id)
     _new_percolator(spec=target.spec, search_pattern=target.search_pattern)
+    _update_records_sets(target, search_pattern=target.search_pattern)
 
 
 def after_update_oai_set(mapper, connection, target):
     """Update records on OAISet update."""
+    clear_set_query_cache(target.spec)
+    clear_set_fragment_cache(target.id)
     _delete_percolator(spec=target.spec, search_pattern=target.search_pattern)
     _new_percolator(spec=target.spec, search_pattern=target.search_pattern)
+    _update_records_sets(target, search_pattern=target.search_pattern)
 
 
 def after_delete_oai_set(mapper, connection, target):
     """Update records on OAISet deletion."""
+    clear_set_query_cache(target.spec)
+    clear_set_fragment_cache(target.id)
     _delete_percolator(spec=target.spec, search_pattern=target.search_pattern)
+    _update_records_sets(target)
+
+
+def before_record_index_oai_sets(sender, json=None, **kwargs):
+    """Store the sets of a record in ``_oai.sets`` before it is indexed."""
+    if json and json.get("_oai", {}).get("id"):
+        json["_oai"]["sets"] = find_sets_for_record(json)
+
+
+def before_record_index_prerender(sender, json=None, record=None, **kwargs):
+    """Store the rendered metadata formats of a record before it is indexed."""
+    if not json or not json.get("_oai", {}).get("id"):
+        return
+
+    from .response import render_fragments
+
+    pid = current_oaiserver.oaiid_fetcher(record.id, json)
+    hit = {"_id": str(record.id), "_version": record.revision_id, "_source": json}
+    json["_oai"]["rendered"] = {
+        prefix: render_fragments(pid, hit, prefix)
+        for prefix in current_app.config["OAISERVER_PRERENDER_FORMATS"]
+    }
+
+
+def before_record_index_earliest_datestamp(sender, json=None, **kwargs):
+    """Lower the cached earliest datestamp when an older record is indexed."""
+    if json and json.get("_oai", {}).get("id"):
+        created = json.get(current_oaiserver.created_key)
+        if created:
+            from .response import lower_earliest_datestamp
+
+            lower_earliest_datestamp(created)
@@ -4,25 +4,37 @@
 
 """OAI-PMH 2.0 response generator."""
 
+import time
+from concurrent.futures import Future
 from datetime import MINYEAR, datetime, timedelta, timezone
+from functools import partial
+from io import BytesIO
+from itertools import islice
 
 import arrow
-from flask import current_app, url_for
+from flask import current_app, g, request, url_for
 from lxml import etree
 from lxml.etree import Element, ElementTree, SubElement
 
-from invenio_oaiserver.percolator import sets_search_all
+from invenio_oaiserver.percolator import sets_search_all, sets_search_by_ids
 
+from .cache import fragment_key
 from .models import OAISet
 from .provider import OAIIDProvider
 from .proxies import current_oaiserver
 from .query import get_records
-from .resumption_token import serialize
+from .resumption_token import max_age, serialize
 from .utils import (
+    VERSION_KEY,
     about_serializer,
     datetime_to_datestamp,
+    getrecord_fetcher,
+    record_sets_fetcher,
+    record_version,
+    resolve_serializer,
     sanitize_unicode,
     serializer,
+    source_filtered,
 )
 
 NS_OAIPMH = "http://www.openarchives.org/OAI/2.0/"
@@ -47,6 +59,38 @@ DATETIME_FORMATS = {
 }
 
 
+def _response_date():
+    """Create ``<responseDate/>`` element."""
+    e_responseDate = Element(etree.QName(NS_OAIPMH, "responseDate"), nsmap=NSMAP)
+    # date should be first possible moment
+    e_responseDate.text = datetime_to_datestamp(datetime.now(timezone.utc))
+    return e_responseDate
+
+
+def _request(**kwargs):
+    """Create ``<request/>`` element."""
+    e_request = Element(etree.QName(NS_OAIPMH, "request"), nsmap=NSMAP)
+    for key, value in kwargs.items():
+        if key == "from" or key == "until":
+            value = datetime_to_datestamp(value)
+        elif key == "resumptionToken":
+            value = value["token"]
+        e_request.set(key, value)
+    e_request.text = url_for("invenio_oaiserver.response", _external=True)
+    return e_request
+
+
+def _stylesheet():
+    """Create the XSL stylesheet processing instruction, if configured."""
+    if current_app.config["OAISERVER_XSL_URL"]:
+        return etree.ProcessingInstruction(
+            "xml-stylesheet",
+            'type="text/xsl" href="{0}"'.format(
+                current_app.config["OAISERVER_XSL_URL"]
+            ),
+        )
+
+
 def envelope(**kwargs):
     """Create OAI-PMH envelope for response."""
     e_oaipmh = Element(etree.QName(NS_OAIPMH, "OAI-PMH"), nsmap=NSMAP)
@@ -56,27 +100,12 @@ def envelope(**kwargs):
     )
     e_tree = ElementTree(element=e_oaipmh)
 
-    if current_app.config["OAISERVER_XSL_URL"]:
-        e_oaipmh.addprevious(
-            etree.ProcessingInstruction(
-                "xml-stylesheet",
-                'type="text/xsl" href="{0}"'.format(
-                    current_app.config["OAISERVER_XSL_URL"]
-                ),
-            )
-        )
+    stylesheet = _stylesheet()
+    if stylesheet is not None:
+        e_oaipmh.addprevious(stylesheet)
 
-    e_responseDate = SubElement(e_oaipmh, etree.QName(NS_OAIPMH, "responseDate"))
-    # date should be first possible moment
-    e_responseDate.text = datetime_to_datestamp(datetime.now(timezone.utc))
-    e_request = SubElement(e_oaipmh, etree.QName(NS_OAIPMH, "request"))
-    for key, value in kwargs.items():
-        if key == "from" or key == "until":
-            value = datetime_to_datestamp(value)
-        elif key == "resumptionToken":
-            value = value["token"]
-        e_request.set(key, value)
-    e_request.text = url_for("invenio_oaiserver.response", _external=True)
+    e_oaipmh.append(_response_date())
+    e_oaipmh.append(_request(**kwargs))
     return e_tree, e_oaipmh
 
 
@@ -97,17 +126,75 @@ def verb(**kwargs):
     return e_tree, e_element
 
 
-def identify(**kwargs):
-    """Create OAI-PMH response for verb Identify."""
+def _search_earliest_datestamp():
+    """Return the creation date of the oldest indexed record or ``None``."""
+    earliest_record = (
+        current_oaiserver.search_cls(index=current_app.config["OAISERVER_RECORD_INDEX"])
+        .sort({current_oaiserver.created_key: {"order": "asc"}})[0:1]
+        .execute()
+    )
+    if len(earliest_record.hits.hits) > 0:
+        hit = earliest_record.hits.hits[0]
+        hit = hit.to_dict()
+        created_date_str = hit.get("_source", {}).get(current_oaiserver.created_key)
+        if created_date_str:
+            return arrow.get(created_date_str, tzinfo=timezone.utc).datetime
+
+
+def earliest_datestamp():
+    """Return the creation date of the oldest record.
+
+    With ``OAISERVER_IDENTIFY_CACHE``, the date is searched once and then read
+    from the watermark kept by :func:`lower_earliest_datestamp`. Otherwise,
+    it is searched once per request.
+    """
+    if "oaiserver_earliest_datestamp" not in g:
+        g.oaiserver_earliest_datestamp = _earliest_datestamp()
+    return g.oaiserver_earliest_datestamp
+
+
+def _earliest_datestamp():
+    """Return the creation date of the oldest record, from the watermark."""
+    if not current_app.config["OAISERVER_IDENTIFY_CACHE"]:
+        return _search_earliest_datestamp() or datetime(MINYEAR, 1, 1)
+
+    watermark = current_oaiserver.earliest_datestamp
+    if watermark is None:
+        earliest_date = _search_earliest_datestamp()
+        if earliest_date is None:
+            return datetime(MINYEAR, 1, 1)
+        current_oaiserver.earliest_datestamp = earliest_date.isoformat()
+        return earliest_date
+    return arrow.get(watermark).datetime
+
+
+def lower_earliest_datestamp(created):
+    """Lower the cached earliest datestamp to the creation date of a record.
+
+    Nothing happens until the watermark has been computed by a first
+    ``Identify`` request.
+
+    :param created: Creation date of the record.
+    """
+    watermark = current_oaiserver.earliest_datestamp
+    if watermark is None:
+        return
+    created = arrow.get(created, tzinfo=timezone.utc).datetime
+    if created < arrow.get(watermark).datetime:
+        current_oaiserver.earliest_datestamp = created.isoformat()
+
+
+def _identify(base_url, datestamp):
+    """Create ``<Identify/>`` element."""
     cfg = current_app.config
 
-    e_tree, e_identify = verb(**kwargs)
+    e_identify = Element(etree.QName(NS_OAIPMH, "Identify"), nsmap=NSMAP)
 
     e_repositoryName = SubElement(e_identify, etree.QName(NS_OAIPMH, "repositoryName"))
     e_repositoryName.text = cfg["OAISERVER_REPOSITORY_NAME"]
 
     e_baseURL = SubElement(e_identify, etree.QName(NS_OAIPMH, "baseURL"))
-    e_baseURL.text = url_for("invenio_oaiserver.response", _external=True)
+    e_baseURL.text = base_url
 
     e_protocolVersion = SubElement(
         e_identify, etree.QName(NS_OAIPMH, "protocolVersion")
@@ -121,20 +208,7 @@ def identify(**kwargs):
     e_earliestDatestamp = SubElement(
         e_identify, etree.QName(NS_OAIPMH, "earliestDatestamp")
     )
-    earliest_date = datetime(MINYEAR, 1, 1)
-    earliest_record = (
-        current_oaiserver.search_cls(index=current_app.config["OAISERVER_RECORD_INDEX"])
-        .sort({current_oaiserver.created_key: {"order": "asc"}})[0:1]
-        .execute()
-    )
-    if len(earliest_record.hits.hits) > 0:
-        hit = earliest_record.hits.hits[0]
-        hit = hit.to_dict()
-        created_date_str = hit.get("_source", {}).get(current_oaiserver.created_key)
-        if created_date_str:
-            earliest_date = arrow.get(created_date_str, tzinfo=timezone.utc).datetime
-
-    e_earliestDatestamp.text = datetime_to_datestamp(earliest_date)
+    e_earliestDatestamp.text = datestamp
 
     e_deletedRecord = SubElement(e_identify, etree.QName(NS_OAIPMH, "deletedRecord"))
     e_deletedRecord.text = "no"
@@ -155,6 +229,30 @@ def identify(**kwargs):
         e_description = SubElement(e_identify, etree.QName(NS_OAIPMH, "description"))
         e_description.append(etree.fromstring(description))
 
+    return e_identify
+
+
+def identify(**kwargs):
+    """Create OAI-PMH response for verb Identify.
+
+    With ``OAISERVER_IDENTIFY_CACHE``, the ``<Identify/>`` element is rendered
+    once per base URL and earliest datestamp, and kept in a bounded cache.
+    """
+    e_tree, e_oaipmh = envelope(**kwargs)
+    base_url = url_for("invenio_oaiserver.response", _external=True)
+    datestamp = datetime_to_datestamp(earliest_datestamp())
+
+    if not current_app.config["OAISERVER_IDENTIFY_CACHE"]:
+        e_oaipmh.append(_identify(base_url, datestamp))
+        return e_tree
+
+    cached = current_oaiserver.identify_bodies.get(base_url)
+    if cached is None or cached[0] != datestamp:
+        cached = (datestamp, etree.tostring(_identify(base_url, datestamp)))
+        current_oaiserver.identify_bodies.set(
+            base_url, cached, current_app.config["OAISERVER_IDENTIFY_CACHE_TIMEOUT"]
+        )
+    e_oaipmh.append(etree.fromstring(cached[1]))
     return e_tree
 
 
@@ -166,46 +264,121 @@ def resumption_token(parent, pagination, **kwargs):
 
     token = serialize(pagination, **kwargs)
     e_resumptionToken = SubElement(parent, etree.QName(NS_OAIPMH, "resumptionToken"))
-    if pagination.total:
-        expiration_date = datetime.now(timezone.utc) + timedelta(
-            seconds=current_app.config["OAISERVER_RESUMPTION_TOKEN_EXPIRE_TIME"]
-        )
+    # The total is unknown (``None``) for the lists which are not counted.
+    if pagination.total != 0:
+        expiration_date = datetime.now(timezone.utc) + timedelta(seconds=max_age())
         e_resumptionToken.set("expirationDate", datetime_to_datestamp(expiration_date))
         e_resumptionToken.set(
             "cursor", str((pagination.page - 1) * pagination.per_page)
         )
-        e_resumptionToken.set("completeListSize", str(pagination.total))
+        if pagination.total is not None:
+            e_resumptionToken.set("completeListSize", str(pagination.total))
 
     if token:
         e_resumptionToken.text = token
 
 
+class _SetsPagination(object):
+    """Keyset pagination over the sets ordered by id.
+
+    The query fetches one set more than the page size to know if there is a
+    next page, and the sets are not counted.
+    """
+
+    total = None
+
+    def __init__(self, ids, page, per_page):
+        """Initialize pagination."""
+        self.page = page
+        self.per_page = per_page
+        self.has_next = len(ids) > per_page
+        self.next_num = page + 1 if self.has_next else None
+        self.ids = ids[:per_page]
+        self._search_after = self.ids[-1:] if self.has_next else None
+
+
+def _set_element(oai_set):
+    """Create ``<set/>`` element."""
+    e_set = Element(etree.QName(NS_OAIPMH, "set"), nsmap=NSMAP)
+    e_setSpec = SubElement(e_set, etree.QName(NS_OAIPMH, "setSpec"))
+    e_setSpec.text = oai_set.spec
+    e_setName = SubElement(e_set, etree.QName(NS_OAIPMH, "setName"))
+    e_setName.text = sanitize_unicode(oai_set.name)
+    if oai_set.description:
+        e_setDescription = SubElement(e_set, etree.QName(NS_OAIPMH, "setDescription"))
+        e_dc = SubElement(
+            e_setDescription,
+            etree.QName(NS_OAIDC, "dc"),
+            nsmap=NSMAP_DESCRIPTION,
+        )
+        e_dc.set(etree.QName(NS_XSI, "schemaLocation"), NS_OAIDC)
+        e_description = SubElement(e_dc, etree.QName(NS_DC, "description"))
+        e_description.text = sanitize_unicode(oai_set.description)
+    return e_set
+
+
+def _cached_set_elements(ids, timeout):
+    """Create the ``<set/>`` elements from the cached fragments.
+
+    The sets missing from the cache, or cached for more than ``timeout``
+    seconds, are fetched in one query and rendered again.
+    """
+    now = time.monotonic()
+    fragments = {}
+    for id_ in ids:
+        cached = current_oaiserver.set_fragments.get(id_)
+        if cached and now - cached[1] < timeout:
+            fragments[id_] = cached[0]
+
+    missing = [id_ for id_ in ids if id_ not in fragments]
+    if missing:
+        for oai_set in OAISet.query.filter(OAISet.id.in_(missing)):
+            fragment = etree.tostring(_set_element(oai_set))
+            current_oaiserver.set_fragments[oai_set.id] = (fragment, now)
+            fragments[oai_set.id] = fragment
+
+    return [etree.fromstring(fragments[id_]) for id_ in ids if id_ in fragments]
+
+
+def clear_set_fragment_cache(set_id=None):
+    """Forget the cached ``<set/>`` fragments.
+
+    :param set_id: The id of the set to forget. (Default: all sets)
+    """
+    if set_id is None:
+        current_oaiserver.set_fragments.clear()
+    else:
+        current_oaiserver.set_fragments.pop(set_id, None)
+
+
 def listsets(**kwargs):
-    """Create OAI-PMH response for ListSets verb."""
+    """Create OAI-PMH response for ListSets verb.
+
+    The sets are paginated by id, the last id of a page is stored in the
+    resumption token.
+    """
     e_tree, e_listsets = verb(**kwargs)
 
-    page = kwargs.get("resumptionToken", {}).get("page", 1)
+    token = kwargs.get("resumptionToken", {})
+    page = token.get("page", 1)
     size = current_app.config["OAISERVER_PAGE_SIZE"]
-    oai_sets = OAISet.query.paginate(page=page, per_page=size, error_out=False)
-
-    for oai_set in oai_sets.items:
-        e_set = SubElement(e_listsets, etree.QName(NS_OAIPMH, "set"))
-        e_setSpec = SubElement(e_set, etree.QName(NS_OAIPMH, "setSpec"))
-        e_setSpec.text = oai_set.spec
-        e_setName = SubElement(e_set, etree.QName(NS_OAIPMH, "setName"))
-        e_setName.text = sanitize_unicode(oai_set.name)
-        if oai_set.description:
-            e_setDescription = SubElement(
-                e_set, etree.QName(NS_OAIPMH, "setDescription")
-            )
-            e_dc = SubElement(
-                e_setDescription,
-                etree.QName(NS_OAIDC, "dc"),
-                nsmap=NSMAP_DESCRIPTION,
-            )
-            e_dc.set(etree.QName(NS_XSI, "schemaLocation"), NS_OAIDC)
-            e_description = SubElement(e_dc, etree.QName(NS_DC, "description"))
-            e_description.text = sanitize_unicode(oai_set.description)
+    query = OAISet.query.order_by(OAISet.id)
+    if token.get("search_after"):
+        query = query.filter(OAISet.id > token["search_after"][0])
+    elif page > 1:
+        # tokens issued before the keyset pagination
+        query = query.offset((page - 1) * size)
+    query = query.limit(size + 1)
+
+    timeout = current_app.config["OAISERVER_SET_FRAGMENT_CACHE_TIMEOUT"]
+    if timeout:
+        ids = [id_ for (id_,) in query.with_entities(OAISet.id)]
+        oai_sets = _SetsPagination(ids, page, size)
+        e_listsets.extend(_cached_set_elements(oai_sets.ids, timeout))
+    else:
+        rows = query.all()
+        oai_sets = _SetsPagination([oai_set.id for oai_set in rows], page, size)
+        e_listsets.extend(_set_element(oai_set) for oai_set in rows[:size])
 
     resumption_token(e_listsets, oai_sets, **kwargs)
     return e_tree
@@ -239,8 +412,14 @@ def listmetadataformats(**kwargs):
 
 
 def header(parent, identifier, datestamp, sets=None, deleted=False):
-    """Attach ``<header/>`` element to a parent."""
-    e_header = SubElement(parent, etree.QName(NS_OAIPMH, "header"))
+    """Attach ``<header/>`` element to a parent.
+
+    If the parent is ``None``, a standalone element is returned.
+    """
+    if parent is None:
+        e_header = Element(etree.QName(NS_OAIPMH, "header"), nsmap=NSMAP)
+    else:
+        e_header = SubElement(parent, etree.QName(NS_OAIPMH, "header"))
     if deleted:
         e_header.set("status", "deleted")
     e_identifier = SubElement(e_header, etree.QName(NS_OAIPMH, "identifier"))
@@ -253,89 +432,476 @@ def header(parent, identifier, datestamp, sets=None, deleted=False):
     return e_header
 
 
-def getrecord(**kwargs):
-    """Create OAI-PMH response for verb Identify."""
-    record_dumper = serializer(kwargs["metadataPrefix"])
+def _rendered_fragments(source, metadata_prefix):
+    """Return the fragments pre-rendered at index time, if any."""
+    if metadata_prefix in current_app.config["OAISERVER_PRERENDER_FORMATS"]:
+        return source.get("_oai", {}).get("rendered", {}).get(metadata_prefix)
+
+
+def _build_fragments(record_dumper, about_dumper, pid, record):
+    """Create the ``<metadata/>`` and optional ``<about/>`` elements."""
+    e_metadata = Element(etree.QName(NS_OAIPMH, "metadata"), nsmap=NSMAP)
+    e_metadata.append(record_dumper(pid, record))
+    fragments = [e_metadata]
+
+    if about_dumper:
+        about_payload = about_dumper(pid, record)
+        if about_payload is not None:
+            e_about = Element(etree.QName(NS_OAIPMH, "about"), nsmap=NSMAP)
+            e_about.append(about_payload)
+            fragments.append(e_about)
+    return fragments
+
+
+def _serialize_fragments(pid, record, metadata_prefix):
+    """Serialize the fragments of a record with the configured serializers."""
+    return _build_fragments(
+        serializer(metadata_prefix), about_serializer(metadata_prefix), pid, record
+    )
+
+
+def _serialize_in_thread(app, base_url, metadata_prefix, pid, record):
+    """Serialize the fragments of a record in a serialization thread.
+
+    The serializers may build URLs, so they run in a request context with the
+    base URL of the request.
 
-    pid = OAIIDProvider.get(pid_value=kwargs["identifier"]).pid
-    record = current_oaiserver.record_fetcher(pid.object_uuid)
+    :returns: The tuple of serialized elements.
+    """
+    with app.test_request_context(base_url=base_url):
+        return tuple(
+            etree.tostring(fragment)
+            for fragment in _serialize_fragments(pid, record, metadata_prefix)
+        )
+
+
+def _serialize_in_process(serializers, pid, record):
+    """Serialize the fragments of a record in a serialization process.
+
+    The process runs without application context, so the serializers are
+    resolved from their configuration values.
+
+    :param serializers: The ``serializer`` and ``about_serializer`` values of
+        the metadata format.
+    :returns: The tuple of serialized elements.
+    """
+    record_dumper, about_dumper = (resolve_serializer(value) for value in serializers)
+    return tuple(
+        etree.tostring(fragment)
+        for fragment in _build_fragments(record_dumper, about_dumper, pid, record)
+    )
+
+
+def render_fragments(pid, record, metadata_prefix):
+    """Render the ``<metadata/>`` and optional ``<about/>`` elements.
+
+    :returns: The list of serialized elements, as stored in
+        ``_oai.rendered.<metadataPrefix>`` of the indexed record.
+    """
+    return [
+        etree.tostring(fragment, encoding="unicode")
+        for fragment in _serialize_fragments(pid, record, metadata_prefix)
+    ]
+
+
+def _stored_fragments(record, metadata_prefix, record_id, version):
+    """Return the pre-rendered or cached serialized fragments, if any."""
+    rendered = _rendered_fragments(record.get("_source", {}), metadata_prefix)
+    if rendered:
+        return rendered
+
+    cache = current_oaiserver.fragment_cache
+    if cache is not None and record_id is not None and version is not None:
+        return cache.get(fragment_key(record_id, version, metadata_prefix))
+
+
+def _cache_fragments(fragments, metadata_prefix, record_id, version):
+    """Cache the serialized fragments of a record version."""
+    cache = current_oaiserver.fragment_cache
+    if cache is not None and record_id is not None and version is not None:
+        cache.set(fragment_key(record_id, version, metadata_prefix), fragments)
+
+
+def record_fragments(pid, record, metadata_prefix, record_id=None, version=None):
+    """Return the ``<metadata/>`` and optional ``<about/>`` elements.
+
+    The fragments pre-rendered at index time are used when available.
+    Otherwise, when ``OAISERVER_FRAGMENT_CACHE`` is configured, the serialized
+    elements are cached by record id, version and metadata prefix.
+    """
+    stored = _stored_fragments(record, metadata_prefix, record_id, version)
+    if stored:
+        return [etree.fromstring(fragment) for fragment in stored]
+
+    fragments = _serialize_fragments(pid, record, metadata_prefix)
+    if current_oaiserver.fragment_cache is not None:
+        _cache_fragments(
+            tuple(etree.tostring(fragment) for fragment in fragments),
+            metadata_prefix,
+            record_id,
+            version,
+        )
+    return fragments
+
+
+def page_fragments(pids, records, metadata_prefix):
+    """Yield the fragments of the records of a page, in order.
+
+    When ``OAISERVER_SERIALIZATION_WORKERS`` is set, the records which are
+    neither pre-rendered nor cached are serialized in parallel.
+
+    :param pids: The fetched OAI identifiers of the records.
+    :param records: The search hits of the records.
+    """
+    executor = current_oaiserver.serialization_executor(metadata_prefix)
+    if executor is None:
+        for pid, record in zip(pids, records):
+            yield record_fragments(
+                pid,
+                record,
+                metadata_prefix,
+                record_id=record.get("_id"),
+                version=record.get("_version"),
+            )
+        return
+
+    metadata_format = current_app.config["OAISERVER_METADATA_FORMATS"][metadata_prefix]
+    if metadata_format.get("processes", False):
+        serializers = (
+            metadata_format["serializer"],
+            metadata_format.get("about_serializer"),
+        )
+        submit = partial(executor.submit, _serialize_in_process, serializers)
+    else:
+        submit = partial(
+            executor.submit,
+            _serialize_in_thread,
+            current_app._get_current_object(),
+            request.url_root,
+            metadata_prefix,
+        )
+
+    results = []
+    for pid, record in zip(pids, records):
+        stored = _stored_fragments(
+            record, metadata_prefix, record.get("_id"), record.get("_version")
+        )
+        results.append(stored or submit(pid, record))
+
+    for record, result in zip(records, results):
+        if isinstance(result, Future):
+            result = result.result()
+            _cache_fragments(
+                result, metadata_prefix, record.get("_id"), record.get("_version")
+            )
+        yield [etree.fromstring(fragment) for fragment in result]
+
+
+def _load_getrecord(identifier, metadata_prefix):
+    """Load the record of a ``GetRecord`` request."""
+    fetcher = current_oaiserver.record_fetcher
+    if getattr(fetcher, "from_index", False):
+        hit = fetcher(identifier, metadata_prefix)
+        if hit is not None:
+            source = hit["_source"]
+            if current_app.config["OAISERVER_MATERIALIZE_SETS"]:
+                sets = record_sets_fetcher(source)
+            else:
+                sets = current_oaiserver.record_sets_fetcher(source)
+            return dict(
+                pid=current_oaiserver.oaiid_fetcher(hit["_id"], source),
+                record=hit,
+                record_id=hit["_id"],
+                version=hit.get("_version"),
+                updated=datetime.strptime(
+                    source[current_oaiserver.last_update_key][:19],
+                    "%Y-%m-%dT%H:%M:%S",
+                ),
+                sets=sets,
+                from_index=True,
+            )
+        fetcher = getrecord_fetcher
+
+    pid = OAIIDProvider.get(pid_value=identifier).pid
+    record = fetcher(pid.object_uuid)
+    version = record.pop(VERSION_KEY, None)
+    if version is None:
+        # custom fetchers do not return the version
+        version = record_version(pid.object_uuid)
+    return dict(
+        pid=pid,
+        record={"_source": record},
+        record_id=pid.object_uuid,
+        version=version,
+        updated=record["updated"],
+        sets=current_oaiserver.record_sets_fetcher(record),
+        from_index=False,
+    )
+
+
+def getrecord_data(identifier, metadata_prefix):
+    """Return the record of a ``GetRecord`` request, loaded once per request.
+
+    The response and its HTTP validators use the same data.
+
+    :returns: A dictionary with the ``pid``, the search hit or the data of the
+        ``record``, its ``record_id``, ``version``, ``updated`` date and
+        ``sets``, and whether it comes ``from_index``.
+    """
+    loaded = g.setdefault("oaiserver_getrecord", {})
+    key = (identifier, metadata_prefix)
+    if key not in loaded:
+        loaded[key] = _load_getrecord(identifier, metadata_prefix)
+    return loaded[key]
+
+
+def getrecord(**kwargs):
+    """Create OAI-PMH response for verb GetRecord."""
+    metadata_prefix = kwargs["metadataPrefix"]
+    data = getrecord_data(kwargs["identifier"], metadata_prefix)
 
     e_tree, e_getrecord = verb(**kwargs)
     e_record = SubElement(e_getrecord, etree.QName(NS_OAIPMH, "record"))
-
     header(
         e_record,
-        identifier=pid.pid_value,
-        datestamp=record["updated"],
-        sets=current_oaiserver.record_sets_fetcher(record),
+        identifier=data["pid"].pid_value,
+        datestamp=data["updated"],
+        sets=data["sets"],
     )
-    e_metadata = SubElement(e_record, etree.QName(NS_OAIPMH, "metadata"))
-    e_metadata.append(record_dumper(pid, {"_source": record}))
-    about_dumper = about_serializer(kwargs["metadataPrefix"])
-
-    if about_dumper:
-        about_payload = about_dumper(pid, {"_source": record})
-        if about_payload is not None:
-            e_about = SubElement(e_record, etree.QName(NS_OAIPMH, "about"))
-            e_about.append(about_payload)
 
+    e_record.extend(
+        record_fragments(
+            data["pid"],
+            data["record"],
+            metadata_prefix,
+            record_id=data["record_id"],
+            version=data["version"],
+        )
+    )
     return e_tree
 
 
-def listidentifiers(**kwargs):
-    """Create OAI-PMH response for verb ListIdentifiers."""
-    e_tree, e_listidentifiers = verb(**kwargs)
+def find_sets(records, metadata_prefix=None):
+    """Return the sets of each record on a page.
+
+    The records are percolated by id when their ``_source`` is missing or
+    filtered by the metadata format, which may drop the fields used by the
+    set queries.
+    """
+    hits = [record["json"] for record in records]
+    if current_app.config["OAISERVER_MATERIALIZE_SETS"]:
+        return [
+            (
+                record_sets_fetcher(hit["_source"])
+                if "_source" in hit
+                else hit.get("fields", {}).get("_oai.sets", [])
+            )
+            for hit in hits
+        ]
+    if any("_source" not in hit for hit in hits) or (
+        metadata_prefix and source_filtered(metadata_prefix)
+    ):
+        return sets_search_by_ids(hits)
+    return sets_search_all([hit["_source"] for hit in hits])
+
+
+def _listidentifiers_page(**kwargs):
+    """Fetch a ListIdentifiers page.
+
+    :returns: The pagination and an iterator of ``<header/>`` elements.
+    """
+    metadata_prefix = (
+        kwargs.get("resumptionToken").get("metadataPrefix")
+        if kwargs.get("resumptionToken")
+        else kwargs["metadataPrefix"]
+    )
+
     result = get_records(**kwargs)
 
     all_records = [record for record in result.items]
-    records_sets = sets_search_all([r["json"]["_source"] for r in all_records])
-
-    for index, record in enumerate(all_records):
-        pid = current_oaiserver.oaiid_fetcher(record["id"], record["json"]["_source"])
-        header(
-            e_listidentifiers,
-            identifier=pid.pid_value,
-            datestamp=record["updated"],
-            sets=records_sets[index],
-        )
+    records_sets = (
+        result.sets
+        if result.sets is not None
+        else find_sets(all_records, metadata_prefix)
+    )
 
-    resumption_token(e_listidentifiers, result, **kwargs)
-    return e_tree
+    def headers():
+        for index, record in enumerate(all_records):
+            if "_source" in record["json"]:
+                data = record["json"]["_source"]
+            else:
+                data = {"_oai": {"id": record["json"]["fields"]["_oai.id"][0]}}
+            pid = current_oaiserver.oaiid_fetcher(record["id"], data)
+            yield header(
+                None,
+                identifier=pid.pid_value,
+                datestamp=record["updated"],
+                sets=records_sets[index],
+            )
 
+    return result, headers()
 
-def listrecords(**kwargs):
-    """Create OAI-PMH response for verb ListRecords."""
+
+def _listrecords_page(**kwargs):
+    """Fetch a ListRecords page.
+
+    :returns: The pagination and an iterator of ``<record/>`` elements, which
+        are serialized while iterating.
+    """
     metadataPrefix = (
         kwargs.get("resumptionToken").get("metadataPrefix")
         if kwargs.get("resumptionToken")
         else kwargs["metadataPrefix"]
     )
 
-    e_tree, e_listrecords = verb(**kwargs)
     result = get_records(**kwargs)
 
     all_records = [record for record in result.items]
-    records_sets = sets_search_all([r["json"]["_source"] for r in all_records])
-
-    record_dumper = serializer(metadataPrefix)
-    about_dumper = about_serializer(metadataPrefix)
-
-    for index, record in enumerate(all_records):
-        pid = current_oaiserver.oaiid_fetcher(record["id"], record["json"]["_source"])
-        e_record = SubElement(e_listrecords, etree.QName(NS_OAIPMH, "record"))
-        header(
-            e_record,
-            identifier=pid.pid_value,
-            datestamp=record["updated"],
-            sets=records_sets[index],
+    records_sets = (
+        result.sets
+        if result.sets is not None
+        else find_sets(all_records, metadataPrefix)
+    )
+
+    def records():
+        pids = [
+            current_oaiserver.oaiid_fetcher(record["id"], record["json"]["_source"])
+            for record in all_records
+        ]
+        fragments = page_fragments(
+            pids, [record["json"] for record in all_records], metadataPrefix
         )
-        e_metadata = SubElement(e_record, etree.QName(NS_OAIPMH, "metadata"))
-        e_metadata.append(record_dumper(pid, record["json"]))
-        if about_dumper:
-            about_payload = about_dumper(pid, record["json"])
-            if about_payload is not None:
-                e_about = SubElement(e_record, etree.QName(NS_OAIPMH, "about"))
-                e_about.append(about_payload)
+        for index, record in enumerate(all_records):
+            e_record = Element(etree.QName(NS_OAIPMH, "record"), nsmap=NSMAP)
+            header(
+                e_record,
+                identifier=pids[index].pid_value,
+                datestamp=record["updated"],
+                sets=records_sets[index],
+            )
+            e_record.extend(next(fragments))
+            yield e_record
+
+    return result, records()
+
+
+STREAMING_VERBS = {
+    "ListIdentifiers": _listidentifiers_page,
+    "ListRecords": _listrecords_page,
+}
+"""List verbs which can be streamed and their page builders."""
+
+
+def listidentifiers(**kwargs):
+    """Create OAI-PMH response for verb ListIdentifiers."""
+    e_tree, e_listidentifiers = verb(**kwargs)
+    result, headers = _listidentifiers_page(**kwargs)
+
+    for e_header in headers:
+        e_listidentifiers.append(e_header)
+
+    resumption_token(e_listidentifiers, result, **kwargs)
+    return e_tree
+
+
+def listrecords(**kwargs):
+    """Create OAI-PMH response for verb ListRecords."""
+    e_tree, e_listrecords = verb(**kwargs)
+    result, records = _listrecords_page(**kwargs)
+
+    for e_record in records:
+        e_listrecords.append(e_record)
 
     resumption_token(e_listrecords, result, **kwargs)
     return e_tree
+
+
+def _drain(buffer):
+    """Return and remove the content of a buffer."""
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+DEFAULT_NAMESPACE = ' xmlns="{0}"'.format(NS_OAIPMH).encode("ascii")
+"""Declaration of the OAI-PMH namespace, made by the root of a response."""
+
+
+def _serialize_element(element):
+    """Serialize an element written inside the root of a streamed response.
+
+    The OAI-PMH namespace declared by the root element is not declared again.
+    """
+    data = etree.tostring(
+        element, encoding="UTF-8", xml_declaration=False, pretty_print=True
+    )
+    start_tag, end, rest = data.partition(b">")
+    return start_tag.replace(DEFAULT_NAMESPACE, b"", 1) + end + rest
+
+
+STREAM_FAILED_KEY = "oaiserver_stream_failed"
+"""Key of ``flask.g`` marking a streamed response ended by an error."""
+
+
+def stream(**kwargs):
+    """Create a streamed OAI-PMH response for a list verb.
+
+    The search, the set lookup and the first element are serialized before
+    the first chunk is returned, so that errors are raised before the
+    response starts. Then the envelope, every element (serialized one at a
+    time) and the resumption token are written incrementally.
+
+    An element which cannot be serialized later ends the list without the
+    resumption token, and marks the response as failed in ``flask.g``.
+
+    :returns: An iterator of encoded chunks of the response.
+    """
+    e_responseDate = _response_date()
+    result, elements = STREAMING_VERBS[kwargs["verb"]](**kwargs)
+    e_request = _request(**kwargs)
+    stylesheet = _stylesheet()
+
+    elements = iter(elements)
+    first = [_serialize_element(element) for element in islice(elements, 1)]
+
+    e_verb = Element(etree.QName(NS_OAIPMH, kwargs["verb"]), nsmap=NSMAP)
+    resumption_token(e_verb, result, **kwargs)
+
+    def generate():
+        buffer = BytesIO()
+        with etree.xmlfile(buffer, encoding="UTF-8") as xf:
+            xf.write_declaration()
+            if stylesheet is not None:
+                xf.write(stylesheet)
+            with xf.element(
+                etree.QName(NS_OAIPMH, "OAI-PMH"),
+                {
+                    etree.QName(NS_XSI, "schemaLocation"): "{0} {1}".format(
+                        NS_OAIPMH, NS_OAIPMH_XSD
+                    ),
+                },
+                nsmap=dict(NSMAP, xsi=NS_XSI),
+            ):
+                xf.flush()
+                yield _drain(buffer)
+                yield _serialize_element(e_responseDate)
+                yield _serialize_element(e_request)
+                with xf.element(etree.QName(NS_OAIPMH, kwargs["verb"])):
+                    xf.flush()
+                    yield _drain(buffer)
+                    yield from first
+                    try:
+                        for element in elements:
+                            yield _serialize_element(element)
+                    except Exception:
+                        # the response has started, the list ends here
+                        current_app.logger.exception(
+                            "Streamed {0} response failed.".format(kwargs["verb"])
+                        )
+                        setattr(g, STREAM_FAILED_KEY, True)
+                    else:
+                        yield b"".join(_serialize_element(e) for e in e_verb)
+        yield _drain(buffer)
+
+    return generate()
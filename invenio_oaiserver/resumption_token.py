@@ -2,46 +2,246 @@
 # SPDX-FileCopyrightText: 2021-2026 Graz University of Technology.
 # SPDX-License-Identifier: MIT
 
-"""Implement funtions for managing OAI-PMH resumption token."""
+"""Implement funtions for managing OAI-PMH resumption token.
 
+Two token layouts are supported:
+
+* version 1 - the JSON data signed with
+  :class:`itsdangerous.URLSafeTimedSerializer`;
+* version 2 - a version byte followed by the raw deflate of the packed
+  fields (see :func:`_pack`), encoded in URL-safe base64 and signed with
+  :class:`itsdangerous.TimestampSigner`.
+
+Version 1 tokens start with ``eyJ`` or ``.`` and version 2 tokens with ``A``,
+so both are decoded whatever ``OAISERVER_RESUMPTION_TOKEN_VERSION`` is.
+The random tokens of :mod:`invenio_oaiserver.token_store` have no ``.``.
+"""
+
+import base64
+import json
 import random
+import struct
+import zlib
 
 from flask import current_app
 from invenio_rest.serializer import BaseSchema
-from itsdangerous import URLSafeTimedSerializer
+from itsdangerous import BadSignature, TimestampSigner, URLSafeTimedSerializer
+from itsdangerous.encoding import base64_decode, base64_encode
 from marshmallow import fields
 
+from .proxies import current_oaiserver
+
+TOKEN_VERSION = 2
+"""Version byte of the compact resumption tokens."""
+
+TOKEN_KWARGS = ("metadataPrefix", "set", "from", "until")
+"""Request arguments packed, in this order, in the compact tokens."""
+
+CONTEXT_KEYS = ("scroll_id", "pit_id")
+"""Keys of the search contexts, in the order of their kind flag."""
+
+CONTEXT_ENCODINGS = (
+    None,
+    (base64.urlsafe_b64encode, base64.urlsafe_b64decode),
+    (base64.standard_b64encode, base64.standard_b64decode),
+)
+"""Base64 variants of the search context ids, the first one is plain text."""
+
+CONTEXT_PADDED = 4
+"""Encoding flag of the search context ids ending with base64 padding."""
+
 
 def _schema_from_verb(verb, partial=False):
     """Return an instance of schema for given verb."""
-    from .verbs import Verbs
+    from .verbs import Verbs, _verb_schema
 
+    if not partial:
+        return _verb_schema(Verbs, verb)[0]
     return getattr(Verbs, verb)(partial=partial)
 
 
+def max_age():
+    """Return the validity of a resumption token in seconds."""
+    return (
+        current_app.config["OAISERVER_RESUMPTION_TOKEN_MAX_AGE"]
+        or current_app.config["OAISERVER_RESUMPTION_TOKEN_EXPIRE_TIME"]
+    )
+
+
+def _codec(cls, verb):
+    """Return the cached signer or serializer of the tokens of a verb."""
+    secret_key = current_app.config["SECRET_KEY"]
+    key = (cls, secret_key, verb)
+    codec = current_oaiserver.token_signers.get(key)
+    if codec is None:
+        codec = current_oaiserver.token_signers[key] = cls(secret_key, salt=verb)
+    return codec
+
+
+def _pack_context(data):
+    """Return the flags and the bytes of the search context of a token.
+
+    The scroll and point in time ids are base64 strings, they are stored
+    decoded when they can be encoded back to the same string.
+    """
+    for kind, key in enumerate(CONTEXT_KEYS, 1):
+        context_id = data.get(key)
+        if context_id:
+            break
+    else:
+        return 0, b""
+
+    for encoding, (encode, decode) in enumerate(CONTEXT_ENCODINGS[1:], 1):
+        try:
+            raw = decode(context_id.encode("ascii") + b"=" * (-len(context_id) % 4))
+        except (ValueError, UnicodeEncodeError):
+            continue
+        encoded = encode(raw).decode("ascii")
+        if encoded == context_id:
+            return kind | (encoding | CONTEXT_PADDED) << 2, raw
+        if encoded.rstrip("=") == context_id:
+            return kind | encoding << 2, raw
+    return kind, context_id.encode("utf-8")
+
+
+def _unpack_context(flags, raw):
+    """Return the search context of a token as key and id."""
+    kind = flags & 3
+    if not kind:
+        return None, None
+    encoding = flags >> 2
+    if not encoding:
+        return CONTEXT_KEYS[kind - 1], raw.decode("utf-8")
+    encode, _ = CONTEXT_ENCODINGS[encoding & ~CONTEXT_PADDED]
+    context_id = encode(raw).decode("ascii")
+    if not encoding & CONTEXT_PADDED:
+        context_id = context_id.rstrip("=")
+    return CONTEXT_KEYS[kind - 1], context_id
+
+
+def _pack(data):
+    """Return the binary layout of the token data.
+
+    The layout is the version byte followed by the raw deflate of:
+
+    * the flags of the search context (1 byte): its kind in the two low bits
+      and its encoding in the next ones;
+    * the length of the search context id (2 bytes, big endian);
+    * the search context id;
+    * the JSON array of the page number, the request arguments listed in
+      ``TOKEN_KWARGS`` and the sort values of the last hit.
+    """
+    kwargs = [data["kwargs"].get(key) for key in TOKEN_KWARGS]
+    while kwargs and kwargs[-1] is None:
+        kwargs.pop()
+    fields = [data["page"], kwargs]
+    if data.get("search_after"):
+        fields.append(data["search_after"])
+
+    flags, context = _pack_context(data)
+    payload = (
+        struct.pack(">BH", flags, len(context))
+        + context
+        + json.dumps(fields, separators=(",", ":")).encode("utf-8")
+    )
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return bytes([TOKEN_VERSION]) + compressor.compress(payload) + compressor.flush()
+
+
+def _unpack(value):
+    """Return the token data from its binary layout."""
+    value = base64_decode(value)
+    if value[:1] != bytes([TOKEN_VERSION]):
+        raise BadSignature("Unsupported resumption token version.")
+    payload = zlib.decompress(value[1:], -zlib.MAX_WBITS)
+    flags, length = struct.unpack_from(">BH", payload)
+    offset = struct.calcsize(">BH")
+    context_key, context_id = _unpack_context(flags, payload[offset : offset + length])
+    fields = json.loads(payload[offset + length :])
+
+    data = dict(
+        page=fields[0],
+        kwargs={
+            key: value
+            for key, value in zip(TOKEN_KWARGS, fields[1])
+            if value is not None
+        },
+    )
+    if context_key:
+        data[context_key] = context_id
+    if len(fields) > 2:
+        data["search_after"] = fields[2]
+    return data
+
+
+def dumps(verb, data):
+    """Sign the token data in the configured token layout.
+
+    :param verb: The verb of the request, used as salt of the signature.
+    :param data: The page number, the dumped arguments of the request and
+        the search context.
+    :returns: The resumption token.
+    """
+    if current_oaiserver.token_store is not None:
+        from .token_store import store_token
+
+        return store_token(verb, data, max_age())
+    if current_app.config["OAISERVER_RESUMPTION_TOKEN_VERSION"] < TOKEN_VERSION:
+        return _codec(URLSafeTimedSerializer, verb).dumps(
+            dict(data, seed=random.random())
+        )
+    signer = _codec(TimestampSigner, verb)
+    return signer.sign(base64_encode(_pack(data))).decode("ascii")
+
+
+def loads(verb, token, max_age=None):
+    """Return the data of a resumption token of any layout.
+
+    :raises itsdangerous.BadSignature: If the token is invalid or expired.
+    """
+    if "." not in token:
+        if current_oaiserver.token_store is None:
+            raise BadSignature("Resumption token store is not configured.")
+        from .token_store import load_token
+
+        data = load_token(verb, token)
+        if data is None:
+            raise BadSignature("Unknown or expired resumption token.")
+        return data
+    if token.startswith(("eyJ", ".")):
+        return _codec(URLSafeTimedSerializer, verb).loads(token, max_age=max_age)
+    return _unpack(_codec(TimestampSigner, verb).unsign(token, max_age=max_age))
+
+
 def serialize(pagination, **kwargs):
-    """Return resumption token serializer."""
+    """Return resumption token serializer.
+
+    Besides the search context (``scroll_id`` or ``pit_id``), the token stores
+    the sort values of the last hit and the original request arguments, which
+    is enough to restart the harvest when the context has expired.
+    """
     if not pagination.has_next:
         return
 
-    token_builder = URLSafeTimedSerializer(
-        current_app.config["SECRET_KEY"],
-        salt=kwargs["verb"],
-    )
     schema = _schema_from_verb(kwargs["verb"], partial=False)
     schema_kwargs = kwargs.copy()
     schema_kwargs.update(schema_kwargs.get("resumptionToken", {}))
 
     data = dict(
-        seed=random.random(),
         page=pagination.next_num,
         kwargs=schema.dump(schema_kwargs),
     )
     scroll_id = getattr(pagination, "_scroll_id", None)
     if scroll_id:
         data["scroll_id"] = scroll_id
+    pit_id = getattr(pagination, "_pit_id", None)
+    if pit_id:
+        data["pit_id"] = pit_id
+    search_after = getattr(pagination, "_search_after", None)
+    if search_after:
+        data["search_after"] = search_after
 
-    return token_builder.dumps(data)
+    return dumps(kwargs["verb"], data)
 
 
 class ResumptionToken(fields.Field):
@@ -49,13 +249,7 @@ class ResumptionToken(fields.Field):
 
     def _deserialize(self, value, attr, data, **kwargs):
         """Serialize resumption token."""
-        token_builder = URLSafeTimedSerializer(
-            current_app.config["SECRET_KEY"],
-            salt=data["verb"],
-        )
-        result = token_builder.loads(
-            value, max_age=current_app.config["OAISERVER_RESUMPTION_TOKEN_EXPIRE_TIME"]
-        )
+        result = loads(data["verb"], value, max_age=max_age())
         result["token"] = value
 
         schema_kwargs = result["kwargs"].copy()
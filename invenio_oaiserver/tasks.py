@@ -0,0 +1,87 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Celery tasks to keep the indexed OAI-PMH data of the records up to date."""
+
+from itertools import islice
+
+from celery import shared_task
+from flask import current_app
+from invenio_search.engine import dsl
+
+from .percolator import refresh_percolator_indices
+from .proxies import current_oaiserver
+from .query import query_string_parser
+
+
+def _chunks(iterable, size):
+    """Split an iterable into lists of the given size."""
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def _reindex_search(search):
+    """Schedule the reindexing of the records matching a search in chunks."""
+    record_ids = (hit.meta.id for hit in search.source(False).scan())
+    chunk_size = current_app.config["OAISERVER_CELERY_TASK_CHUNK_SIZE"]
+    for chunk in _chunks(record_ids, chunk_size):
+        reindex_records.delay(chunk)
+
+
+@shared_task(ignore_result=True)
+def update_records_sets(spec, search_pattern=None):
+    """Reindex the records whose membership in a set may have changed.
+
+    The affected records are the ones currently indexed as members of the
+    set and the ones matching its (new) search pattern.
+
+    :param spec: The set identifier.
+    :param search_pattern: The search pattern of the set, if it still exists.
+    """
+    # the records are percolated against the changed set when reindexed
+    refresh_percolator_indices()
+
+    query = dsl.Q("term", **{"_oai.sets": spec})
+    if search_pattern:
+        query |= dsl.Q(query_string_parser(search_pattern))
+
+    _reindex_search(
+        current_oaiserver.search_cls(
+            index=current_app.config["OAISERVER_RECORD_INDEX"],
+        ).query(query)
+    )
+
+
+@shared_task(ignore_result=True)
+def prerender_records():
+    """Reindex all the records to store their pre-rendered metadata formats."""
+    _reindex_search(
+        current_oaiserver.search_cls(
+            index=current_app.config["OAISERVER_RECORD_INDEX"],
+        )
+    )
+
+
+@shared_task(ignore_result=True)
+def reindex_records(record_ids):
+    """Reindex the given records.
+
+    :param record_ids: The list of record identifiers.
+    """
+    from invenio_indexer.api import RecordIndexer
+
+    indexer = RecordIndexer(record_cls=current_oaiserver.record_cls)
+    for record_id in record_ids:
+        indexer.index_by_id(record_id)
+
+
+@shared_task(ignore_result=True)
+def expire_resumption_tokens():
+    """Remove the expired resumption tokens and clear their search contexts."""
+    from .token_store import expire_tokens
+
+    if current_oaiserver.token_store is not None:
+        expire_tokens()
@@ -0,0 +1,275 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Server-side stores of the resumption token data.
+
+With ``OAISERVER_RESUMPTION_TOKEN_STORE``, the resumption token is a short
+random key and the page number, the request arguments and the search context
+are kept on the server until the token expires.
+"""
+
+import secrets
+import threading
+from datetime import datetime, timedelta, timezone
+
+from invenio_db import db
+
+from .models import OAIResumptionToken
+from .proxies import current_oaiserver
+
+TOKEN_BYTES = 16
+"""Number of random bytes of a stored token."""
+
+CONTEXT_KEYS = ("scroll_id", "pit_id")
+"""Keys of the search contexts in the token data."""
+
+
+def new_token():
+    """Return a new random token.
+
+    The tokens are URL-safe and never contain a ``.``, unlike the signed ones.
+    """
+    return secrets.token_urlsafe(TOKEN_BYTES)
+
+
+def _now():
+    """Return the current UTC time."""
+    return datetime.now(timezone.utc)
+
+
+class TokenStore(object):
+    """Base class of the resumption token stores.
+
+    An entry is the verb of the request, the token data and the expiration
+    date of the token.
+    """
+
+    def __init__(self, app):
+        """Initialize the store.
+
+        :param app: An instance of :class:`flask.Flask`.
+        """
+        self.app = app
+
+    def get(self, token):
+        """Return the verb and the data of an unexpired token or ``None``."""
+        raise NotImplementedError()
+
+    def set(self, token, verb, data, expires):
+        """Store the data of a token."""
+        raise NotImplementedError()
+
+    def delete(self, token):
+        """Remove a token."""
+        raise NotImplementedError()
+
+    def active(self):
+        """Return the unexpired entries as ``(token, verb, data, expires)``."""
+        raise NotImplementedError()
+
+    def expire(self):
+        """Remove the expired tokens and return their data."""
+        raise NotImplementedError()
+
+
+class MemoryTokenStore(TokenStore):
+    """In-process store, for tests and single process deployments."""
+
+    def __init__(self, app):
+        """Initialize the store."""
+        super(MemoryTokenStore, self).__init__(app)
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        """Return the verb and the data of an unexpired token."""
+        entry = self._data.get(token)
+        if entry and entry[2] > _now():
+            return entry[0], entry[1]
+
+    def set(self, token, verb, data, expires):
+        """Store the data of a token."""
+        with self._lock:
+            self._data[token] = (verb, data, expires)
+
+    def delete(self, token):
+        """Remove a token."""
+        with self._lock:
+            self._data.pop(token, None)
+
+    def active(self):
+        """Return the unexpired entries."""
+        now = _now()
+        return [
+            (token, verb, data, expires)
+            for token, (verb, data, expires) in list(self._data.items())
+            if expires > now
+        ]
+
+    def expire(self):
+        """Remove the expired tokens."""
+        now = _now()
+        with self._lock:
+            expired = [token for token, entry in self._data.items() if entry[2] <= now]
+            return [self._data.pop(token)[1] for token in expired]
+
+
+class CacheTokenStore(TokenStore):
+    """Store in the cache server of the application.
+
+    It uses the cache given to :class:`invenio_oaiserver.ext.InvenioOAIServer`,
+    which expires the tokens itself and cannot list them.
+    """
+
+    def __init__(self, app):
+        """Initialize the store.
+
+        :raises RuntimeError: If the extension has no cache.
+        """
+        super(CacheTokenStore, self).__init__(app)
+        if not app.extensions["invenio-oaiserver"].cache:
+            raise RuntimeError(
+                "CacheTokenStore needs the cache given to InvenioOAIServer, "
+                "use another OAISERVER_RESUMPTION_TOKEN_STORE without a cache."
+            )
+
+    def _key(self, token):
+        """Return the key in the cache server."""
+        return "{0}tokens::{1}".format(self.app.config["OAISERVER_CACHE_KEY"], token)
+
+    def get(self, token):
+        """Return the verb and the data of a token from the cache server."""
+        entry = current_oaiserver.cache.get(self._key(token))
+        if entry:
+            return entry[0], entry[1]
+
+    def set(self, token, verb, data, expires):
+        """Store the data of a token until it expires."""
+        timeout = max(int((expires - _now()).total_seconds()), 1)
+        current_oaiserver.cache.set(self._key(token), (verb, data), timeout=timeout)
+
+    def delete(self, token):
+        """Remove a token."""
+        current_oaiserver.cache.delete(self._key(token))
+
+    def active(self):
+        """Tokens in the cache server cannot be listed."""
+        raise NotImplementedError("The cache server cannot list the tokens.")
+
+    def expire(self):
+        """The cache server expires the tokens itself."""
+        return []
+
+
+class SQLTokenStore(TokenStore):
+    """Store in the ``oaiserver_resumption_token`` table."""
+
+    def get(self, token):
+        """Return the verb and the data of an unexpired token."""
+        entry = (
+            db.session.query(OAIResumptionToken.verb, OAIResumptionToken.data)
+            .filter(
+                OAIResumptionToken.token == token,
+                OAIResumptionToken.expires > _now(),
+            )
+            .one_or_none()
+        )
+        if entry:
+            return entry.verb, entry.data
+
+    def set(self, token, verb, data, expires):
+        """Store the data of a token."""
+        db.session.add(
+            OAIResumptionToken(token=token, verb=verb, data=data, expires=expires)
+        )
+        db.session.commit()
+
+    def delete(self, token):
+        """Remove a token."""
+        OAIResumptionToken.query.filter_by(token=token).delete()
+        db.session.commit()
+
+    def active(self):
+        """Return the unexpired entries."""
+        return [
+            (entry.token, entry.verb, entry.data, entry.expires)
+            for entry in OAIResumptionToken.query.filter(
+                OAIResumptionToken.expires > _now()
+            ).order_by(OAIResumptionToken.created)
+        ]
+
+    def expire(self):
+        """Remove the expired tokens in one statement."""
+        expired = OAIResumptionToken.query.filter(OAIResumptionToken.expires <= _now())
+        data = [entry.data for entry in expired.with_entities(OAIResumptionToken.data)]
+        expired.delete(synchronize_session=False)
+        db.session.commit()
+        return data
+
+
+def store_token(verb, data, max_age):
+    """Store the token data and return the new token.
+
+    :param verb: The verb of the request.
+    :param data: The token data.
+    :param max_age: The validity of the token in seconds.
+    """
+    token = new_token()
+    current_oaiserver.token_store.set(
+        token, verb, data, _now() + timedelta(seconds=max_age)
+    )
+    return token
+
+
+def load_token(verb, token):
+    """Return the stored data of a token or ``None``.
+
+    Tokens issued for another verb are not returned.
+    """
+    entry = current_oaiserver.token_store.get(token)
+    if entry and entry[0] == verb:
+        return dict(entry[1])
+
+
+def _clear_contexts(expired, active=()):
+    """Clear the search contexts only used by the given token data."""
+    from invenio_search import current_search_client
+
+    from .query import _close_point_in_time
+
+    in_use = {data.get(key) for data in active for key in CONTEXT_KEYS}
+    scroll_ids = {data.get("scroll_id") for data in expired} - in_use - {None}
+    pit_ids = {data.get("pit_id") for data in expired} - in_use - {None}
+    for scroll_id in scroll_ids:
+        current_search_client.clear_scroll(scroll_id=scroll_id, ignore=[404])
+    for pit_id in pit_ids:
+        _close_point_in_time(pit_id)
+
+
+def expire_tokens():
+    """Remove the expired tokens and clear their search contexts.
+
+    :returns: The number of removed tokens.
+    """
+    store = current_oaiserver.token_store
+    expired = store.expire()
+    if expired:
+        _clear_contexts(expired, [entry[2] for entry in store.active()])
+    return len(expired)
+
+
+def revoke_token(token):
+    """Remove a token and clear its search context.
+
+    The other pages of the same harvest then restart from the sort values
+    stored in their tokens.
+
+    :returns: ``True`` if the token existed.
+    """
+    store = current_oaiserver.token_store
+    entry = store.get(token)
+    if entry is None:
+        return False
+    store.delete(token)
+    _clear_contexts([entry[1]])
+    return True
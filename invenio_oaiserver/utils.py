@@ -3,12 +3,15 @@
 
 """Utilities."""
 
+import os
 import re
+import threading
 from datetime import datetime
 from functools import lru_cache, partial
 
 from flask import current_app
 from invenio_base.utils import obj_or_import_string
+from invenio_db import db
 from lxml import etree
 from lxml.builder import E
 from lxml.etree import Element
@@ -35,11 +38,15 @@ NS_FRIENDS = {None: "http://www.openarchives.org/OAI/2.0/friends/"}
 FRIENDS_SCHEMA_LOCATION = "http://www.openarchives.org/OAI/2.0/friends/"
 FRIENDS_SCHEMA_LOCATION_XSD = "http://www.openarchives.org/OAI/2.0/friends/.xsd"
 
+_xslt_transforms = threading.local()
 
-def _resolve_serializer_value(metadata_prefix, key, default=None):
-    """Resolve serializer config value into callable/object."""
-    metadata_formats = current_app.config["OAISERVER_METADATA_FORMATS"]
-    serializer_value = metadata_formats[metadata_prefix].get(key, default)
+
+def resolve_serializer(serializer_value):
+    """Resolve serializer config value into callable/object.
+
+    :param serializer_value: The importable string or tuple with the
+        importable string and keyword arguments.
+    """
     if isinstance(serializer_value, tuple):
         return partial(obj_or_import_string(serializer_value[0]), **serializer_value[1])
     if serializer_value:
@@ -47,6 +54,12 @@ def _resolve_serializer_value(metadata_prefix, key, default=None):
     return serializer_value
 
 
+def _resolve_serializer_value(metadata_prefix, key, default=None):
+    """Resolve serializer config value into callable/object."""
+    metadata_formats = current_app.config["OAISERVER_METADATA_FORMATS"]
+    return resolve_serializer(metadata_formats[metadata_prefix].get(key, default))
+
+
 @lru_cache(maxsize=100)
 def about_serializer(metadata_prefix):
     """Return about serializer instances.
@@ -67,18 +80,103 @@ def serializer(metadata_prefix):
     return _resolve_serializer_value(metadata_prefix, key="serializer")
 
 
+def source_filter(metadata_prefix, rendered=True):
+    """Return the ``_source`` filtering for a metadata format.
+
+    The fields needed to build the OAI-PMH header are always included, the
+    pre-rendered fragments of the other metadata formats are excluded.
+
+    :param metadata_prefix: One of the metadata identifiers configured in
+        ``OAISERVER_METADATA_FORMATS``.
+    :param rendered: Include the pre-rendered fragments of the metadata
+        format.
+    :returns: Keyword arguments for ``Search.source`` or ``None``.
+    """
+    metadata_formats = current_app.config["OAISERVER_METADATA_FORMATS"]
+    source = dict(metadata_formats.get(metadata_prefix, {}).get("source") or {})
+
+    if source.get("includes"):
+        source["includes"] = list(source["includes"]) + [
+            "_oai",
+            current_oaiserver.last_update_key,
+        ]
+
+    excludes = [
+        "_oai.rendered.{0}".format(prefix)
+        for prefix in current_app.config["OAISERVER_PRERENDER_FORMATS"]
+        if not rendered or prefix != metadata_prefix
+    ]
+    if excludes:
+        source["excludes"] = list(source.get("excludes", [])) + excludes
+
+    return source or None
+
+
+def source_filtered(metadata_prefix):
+    """Return whether a metadata format filters the ``_source`` of the hits.
+
+    :param metadata_prefix: One of the metadata identifiers configured in
+        ``OAISERVER_METADATA_FORMATS``.
+    """
+    metadata_formats = current_app.config["OAISERVER_METADATA_FORMATS"]
+    source = metadata_formats.get(metadata_prefix, {}).get("source") or {}
+    return bool(source.get("includes") or source.get("excludes"))
+
+
+def xslt_transform(filename):
+    """Return the compiled XSLT transformation of a file.
+
+    The transformations are compiled once per thread and cached by path and
+    modification time of the file.
+
+    :param filename: The path of the XSLT file.
+    :returns: A :class:`lxml.etree.XSLT` instance.
+    """
+    key = (filename, os.path.getmtime(filename))
+    transforms = getattr(_xslt_transforms, "cache", None)
+    if transforms is None:
+        transforms = _xslt_transforms.cache = {}
+
+    transform = transforms.get(key)
+    if transform is None:
+        for outdated in [k for k in transforms if k[0] == filename]:
+            del transforms[outdated]
+        transform = transforms[key] = etree.XSLT(etree.parse(filename))
+    return transform
+
+
+def init_xslt_transforms(metadata_formats):
+    """Compile the XSLT transformations used by the metadata formats.
+
+    :param metadata_formats: The ``OAISERVER_METADATA_FORMATS`` configuration.
+    """
+    for metadata_format in metadata_formats.values():
+        for key in ("serializer", "about_serializer"):
+            value = metadata_format.get(key)
+            if isinstance(value, tuple):
+                filename = value[1].get("xslt_filename")
+                if filename and os.path.exists(filename):
+                    xslt_transform(filename)
+
+
 def dumps_etree(pid, record, **kwargs):
     """Dump MARC21 compatible record.
 
     :param pid: The :class:`invenio_pidstore.models.PersistentIdentifier`
         instance.
     :param record: The :class:`invenio_records.api.Record` instance.
+    :param xslt_filename: The XSLT file transforming the MARCXML, compiled
+        by :func:`xslt_transform`.
     :returns: A LXML Element instance.
     """
     from dojson.contrib.to_marc21 import to_marc21
     from dojson.contrib.to_marc21.utils import dumps_etree
 
-    return dumps_etree(to_marc21.do(record["_source"]), **kwargs)
+    xslt_filename = kwargs.pop("xslt_filename", None)
+    root = dumps_etree(to_marc21.do(record["_source"]), **kwargs)
+    if xslt_filename is not None:
+        root = xslt_transform(xslt_filename)(root).getroot()
+    return root
 
 
 def datetime_to_datestamp(dt, day_granularity=False):
@@ -197,9 +295,59 @@ def record_sets_fetcher(record):
     return record.get("_oai", {}).get("sets", [])
 
 
+VERSION_KEY = "_oai_version"
+"""Key of the record version in the data returned by the record fetchers."""
+
+
 def getrecord_fetcher(record_uuid):
-    """Fetch record data as dict for serialization."""
+    """Fetch record data as dict for serialization.
+
+    The version of the record is returned under :data:`VERSION_KEY`.
+    """
     record = current_oaiserver.record_cls.get_record(record_uuid)
     record_dict = record.dumps()
     record_dict["updated"] = record.updated
+    record_dict[VERSION_KEY] = record.revision_id
     return record_dict
+
+
+def record_version(record_uuid):
+    """Return the revision id of a record from the database, or ``None``."""
+    model_cls = current_oaiserver.record_cls.model_cls
+    version_id = (
+        db.session.query(model_cls.version_id)
+        .filter(model_cls.id == record_uuid)
+        .scalar()
+    )
+    return version_id - 1 if version_id is not None else None
+
+
+def search_getrecord_fetcher(identifier, metadata_prefix):
+    """Fetch the indexed record with an OAI identifier.
+
+    The record is resolved by ``_oai.id`` with a single search query, and is
+    serialized like the records of ``ListRecords``. Its ``_source`` is not
+    filtered by the metadata format, so that its sets can be fetched with
+    ``OAISERVER_RECORD_SETS_FETCHER``.
+
+    :param identifier: The OAI identifier of the record.
+    :param metadata_prefix: The requested metadata format.
+    :returns: The search hit or ``None`` if the record is not indexed.
+    """
+    search = (
+        current_oaiserver.search_cls(index=current_app.config["OAISERVER_RECORD_INDEX"])
+        .filter("term", **{"_oai.id": identifier})
+        .extra(version=True)[0:1]
+    )
+    excludes = [
+        "_oai.rendered.{0}".format(prefix)
+        for prefix in current_app.config["OAISERVER_PRERENDER_FORMATS"]
+        if prefix != metadata_prefix
+    ]
+    if excludes:
+        search = search.source(excludes=excludes)
+    hits = search.execute().to_dict()["hits"]["hits"]
+    return hits[0] if hits else None
+
+
+search_getrecord_fetcher.from_index = True
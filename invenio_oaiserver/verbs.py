@@ -6,6 +6,9 @@
 
 """OAI-PMH verbs."""
 
+import re
+from datetime import datetime, timezone
+
 from flask import current_app, request
 from invenio_i18n import gettext as _
 from invenio_rest.serializer import BaseSchema
@@ -13,8 +16,19 @@ from marshmallow import ValidationError, fields, validates_schema
 from marshmallow.fields import DateTime as _DateTime
 from marshmallow.utils import isoformat
 
+from .proxies import current_oaiserver
 from .resumption_token import ResumptionTokenSchema
 
+try:
+    from dateutil import parser as dateutil_parser
+except ImportError:
+    dateutil_parser = None
+
+DATESTAMP_REGEX = re.compile(
+    r"^(\d{4})-(\d{2})-(\d{2})(?:T(\d{2}):(\d{2}):(\d{2})Z)?$", re.ASCII
+)
+"""Datestamps of the two granularities of OAI-PMH."""
+
 
 def validate_metadata_prefix(value, **kwargs):
     """Check metadataPrefix.
@@ -36,23 +50,21 @@ class DateTime(_DateTime):
         """Parse an ISO8601-formatted datetime and return a datetime object.
 
         Inspired by the marshmallow.utils.from_iso function, but also accepts
-        datestrings that don't contain the time.
+        datestrings that don't contain the time. The datestamps of the OAI-PMH
+        granularities are parsed directly, other formats with dateutil.
         """
-        dateutil_available = False
-        try:
-            from dateutil import parser
-
-            dateutil_available = True
-        except ImportError:
-            dateutil_available = False
-            import datetime
+        match = DATESTAMP_REGEX.match(datestring)
+        if match:
+            if match.group(4) is None:
+                return datetime(*map(int, match.group(1, 2, 3)))
+            return datetime(*map(int, match.groups()), tzinfo=timezone.utc)
 
         # Use dateutil's parser if possible
-        if dateutil_available and use_dateutil:
-            return parser.parse(datestring)
+        if dateutil_parser is not None and use_dateutil:
+            return dateutil_parser.parse(datestring)
         else:
             # Strip off timezone info.
-            return datetime.datetime.strptime(datestring[:19], "%Y-%m-%dT%H:%M:%S")
+            return datetime.strptime(datestring[:19], "%Y-%m-%dT%H:%M:%S")
 
     # Marshmallow compatibility 2->3
     try:
@@ -149,25 +161,49 @@ class ResumptionVerbs(Verbs):
         """Arguments for ListSets verb."""
 
 
-def check_extra_params_in_request(verb):
-    """Check for extra arguments in incomming request."""
-    extra = set(request.values.keys()) - set(
-        [
-            f.metadata.get("load_from", None)
-            or f.metadata.get("data_key", None)
-            or f.name
-            for f in verb.fields.values()
-        ]
+def allowed_arguments(verb):
+    """Return the names of the arguments of an initialized verb schema."""
+    return frozenset(
+        f.metadata.get("load_from", None) or f.metadata.get("data_key", None) or f.name
+        for f in verb.fields.values()
     )
-    if extra:
+
+
+def check_extra_params_in_request(verb, allowed=None):
+    """Check for extra arguments in incomming request.
+
+    :param verb: The initialized verb schema.
+    :param allowed: The names of the arguments of the verb, if known.
+    """
+    if allowed is None:
+        allowed = allowed_arguments(verb)
+    if not allowed.issuperset(request.values.keys()):
         raise ValidationError({"_schema": [_("You have passed too many arguments.")]})
 
 
+def _verb_schema(verbs, verb):
+    """Return the schema instance of a verb and its allowed arguments.
+
+    The schemas are initialized once per application, unknown verbs share
+    the schema of :class:`OAISchema`.
+    """
+    schema_cls = getattr(verbs, verb, None)
+    if not isinstance(schema_cls, type) or not issubclass(schema_cls, OAISchema):
+        schema_cls = OAISchema
+
+    cached = current_oaiserver.verb_schemas.get(schema_cls)
+    if cached is None:
+        schema = schema_cls(partial=False)
+        cached = (schema, allowed_arguments(schema))
+        current_oaiserver.verb_schemas[schema_cls] = cached
+    return cached
+
+
 def make_request_validator(request):
     """Validate arguments in incomming request."""
     verb = request.values.get("verb", "", type=str)
     resumption_token = request.values.get("resumptionToken", None)
     schema = Verbs if resumption_token is None else ResumptionVerbs
-    initialized_verb = getattr(schema, verb, OAISchema)(partial=False)
-    check_extra_params_in_request(initialized_verb)
+    initialized_verb, allowed = _verb_schema(schema, verb)
+    check_extra_params_in_request(initialized_verb, allowed)
     return initialized_verb
@@ -4,15 +4,28 @@
 
 """OAI-PMH 2.0 server."""
 
-from flask import Blueprint, make_response
+import zlib
+
+from flask import (
+    Blueprint,
+    current_app,
+    g,
+    make_response,
+    request,
+    stream_with_context,
+)
 from invenio_pidstore.errors import PIDDoesNotExistError
 from itsdangerous import BadSignature
 from lxml import etree
 from marshmallow.exceptions import ValidationError
 from webargs.flaskparser import FlaskParser
+from werkzeug.http import is_resource_modified, quote_etag
 
 from .. import response as xml
+from ..cache import page_key
+from ..conditional import VALIDATORS
 from ..errors import OAINoRecordsMatchError
+from ..proxies import current_oaiserver
 from ..verbs import make_request_validator
 
 try:
@@ -22,6 +35,15 @@ except TypeError:
     # webargs < 6.0.0
     use_args = FlaskParser().use_args
 
+CONTENT_CODINGS = {
+    "gzip": 16 + zlib.MAX_WBITS,
+    "deflate": zlib.MAX_WBITS,
+}
+"""The ``wbits`` of the zlib compressor of every supported content coding."""
+
+REPLAYABLE_VERBS = ("ListIdentifiers", "ListRecords")
+"""Verbs whose responses to a resumption token are kept in the page cache."""
+
 blueprint = Blueprint(
     "invenio_oaiserver",
     __name__,
@@ -112,19 +134,154 @@ def no_records_error(exception):
     )
 
 
+def _negotiate_content_coding():
+    """Return the advertised content coding preferred by the client."""
+    codings = [
+        coding
+        for coding in current_app.config["OAISERVER_COMPRESSIONS"]
+        if coding in CONTENT_CODINGS
+    ]
+    return request.accept_encodings.best_match(codings) if codings else None
+
+
+def _compress_chunks(chunks, compressor):
+    """Compress an iterable of chunks, flushing the output of every chunk."""
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def compress(response):
+    """Encode the response body with the content coding of the request."""
+    if not any(
+        coding in CONTENT_CODINGS
+        for coding in current_app.config["OAISERVER_COMPRESSIONS"]
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    coding = _negotiate_content_coding()
+    if coding is None or response.status_code == 304:
+        return response
+
+    compressor = zlib.compressobj(
+        current_app.config["OAISERVER_COMPRESSION_LEVEL"],
+        zlib.DEFLATED,
+        CONTENT_CODINGS[coding],
+    )
+    if response.is_streamed:
+        response.response = _compress_chunks(response.response, compressor)
+    else:
+        data = response.get_data()
+        if len(data) < current_app.config["OAISERVER_COMPRESSION_MIN_SIZE"]:
+            return response
+        response.set_data(compressor.compress(data) + compressor.flush())
+    response.headers["Content-Encoding"] = coding
+    return response
+
+
+def _validators(args):
+    """Return the entity tag and the last modification date of a response."""
+    if (
+        current_app.config["OAISERVER_CONDITIONAL_REQUESTS"]
+        and args["verb"] in VALIDATORS
+    ):
+        return VALIDATORS[args["verb"]](**args)
+    return None, None
+
+
+def cache_headers(response, verb, etag=None, last_modified=None):
+    """Set the validators and the cache policy of the response to a verb."""
+    if etag:
+        # the same tag is sent with every content coding
+        response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    cache_control = current_app.config["OAISERVER_CACHE_CONTROL"].get(verb)
+    if cache_control:
+        response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def _page_key(args):
+    """Return the page cache key of the response, if it is cached."""
+    if (
+        current_oaiserver.page_cache is not None
+        and args["verb"] in REPLAYABLE_VERBS
+        and "resumptionToken" in args
+    ):
+        return page_key(args["verb"], args["resumptionToken"]["token"])
+
+
+def _cache_chunks(chunks, key):
+    """Yield the chunks of a response and cache the body after the last one.
+
+    The body is buffered until it exceeds ``OAISERVER_PAGE_CACHE_MAX_SIZE``,
+    then the response is not cached, nor is a failed response.
+    """
+    max_size = current_app.config["OAISERVER_PAGE_CACHE_MAX_SIZE"]
+    body, size = [], 0
+    for chunk in chunks:
+        if body is not None:
+            size += len(chunk)
+            if size > max_size:
+                body = None
+            else:
+                body.append(chunk)
+        yield chunk
+    if body is not None and not g.get(xml.STREAM_FAILED_KEY):
+        current_oaiserver.page_cache.set(key, b"".join(body))
+
+
 @blueprint.route("/oai2d", methods=["GET", "POST"])
 @use_args(make_request_validator)
 def response(args):
     """Response endpoint."""
+    etag, last_modified = _validators(args)
+    if etag and not is_resource_modified(
+        request.environ,
+        etag=quote_etag(etag, weak=True),
+        last_modified=last_modified,
+    ):
+        response = current_app.response_class(status=304)
+        cache_headers(response, args["verb"], etag, last_modified)
+        return compress(response)
+
+    key = _page_key(args)
+    if key:
+        # a retried resumption token gets the same page, without searching
+        cached = current_oaiserver.page_cache.get(key)
+        if cached is not None:
+            response = make_response(cached)
+            response.headers["Content-Type"] = "text/xml"
+            cache_headers(response, args["verb"])
+            return compress(response)
+
+    if (
+        current_app.config["OAISERVER_STREAMING_RESPONSE"]
+        and args["verb"] in xml.STREAMING_VERBS
+    ):
+        chunks = xml.stream(**args)
+        if key:
+            chunks = _cache_chunks(chunks, key)
+        response = current_app.response_class(stream_with_context(chunks))
+        response.headers["Content-Type"] = "text/xml"
+        cache_headers(response, args["verb"])
+        return compress(response)
+
     e_tree = getattr(xml, args["verb"].lower())(**args)
 
-    response = make_response(
-        etree.tostring(
-            e_tree,
-            pretty_print=True,
-            xml_declaration=True,
-            encoding="UTF-8",
-        )
+    body = etree.tostring(
+        e_tree,
+        pretty_print=True,
+        xml_declaration=True,
+        encoding="UTF-8",
     )
+    if key:
+        current_oaiserver.page_cache.set(key, body)
+    response = make_response(body)
     response.headers["Content-Type"] = "text/xml"
-    return response
+    cache_headers(response, args["verb"], etag, last_modified)
+    return compress(response)
@@ -20,6 +20,7 @@ def test_alembic(app):
     # Check that this package's SQLAlchemy models have been properly registered
     tables = [x for x in db.metadata.tables]
     assert "oaiserver_set" in tables
+    assert "oaiserver_resumption_token" in tables
 
     # Check that Alembic agrees that there's no further tables to create.
     assert len(ext.alembic.compare_metadata()) == 0
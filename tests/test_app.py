@@ -23,3 +23,18 @@ def test_init():
         UserWarning, match="Please specify the OAISERVER_ID_PREFIX configuration"
     ):
         InvenioOAIServer(app)
+
+
+def test_resumption_token_store_config():
+    """Test the configuration of the resumption token store."""
+    app = Flask("testapp")
+    app.config.update(
+        OAISERVER_ID_PREFIX="oai:example:",
+        OAISERVER_RESUMPTION_TOKEN_STORE="invenio_oaiserver.token_store:CacheTokenStore",
+    )
+    InvenioOAIServer(app)
+
+    schedule = app.config["CELERY_BEAT_SCHEDULE"]["oaiserver-expire-resumption-tokens"]
+    assert schedule["task"] == "invenio_oaiserver.tasks.expire_resumption_tokens"
+    with app.app_context(), pytest.raises(RuntimeError, match="CacheTokenStore"):
+        app.extensions["invenio-oaiserver"].token_store
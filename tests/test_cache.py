@@ -0,0 +1,219 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Fragment and page cache test cases."""
+
+from unittest.mock import patch
+
+import pytest
+from helpers import create_record
+from invenio_db import db
+from invenio_indexer.api import RecordIndexer
+from invenio_search import current_search
+from lxml import etree
+
+from invenio_oaiserver.cache import LRUFragmentCache, LRUPageCache, TimedLRUCache
+from invenio_oaiserver.proxies import current_oaiserver
+from invenio_oaiserver.response import NS_OAIPMH
+
+NAMESPACES = {"x": NS_OAIPMH}
+
+
+def test_lru_fragment_cache(app):
+    """Test the size based eviction of the in-process cache."""
+    app.config["OAISERVER_FRAGMENT_CACHE_MAX_SIZE"] = 10
+    cache = LRUFragmentCache(app)
+
+    cache.set("a", (b"1234",))
+    cache.set("b", (b"12", b"34"))
+    assert cache.get("a") == (b"1234",)
+    assert cache.size == 8
+
+    # "b" is the least recently used
+    cache.set("c", (b"1234",))
+    assert cache.get("b") is None
+    assert cache.get("a") == (b"1234",)
+    assert cache.get("c") == (b"1234",)
+    assert cache.size == 8
+
+    # too large to be cached
+    cache.set("d", (b"12345678901",))
+    assert cache.get("d") is None
+    assert len(cache) == 2
+
+    assert cache.hits == 3
+    assert cache.misses == 2
+
+
+def test_timed_lru_cache():
+    """Test the count and time based eviction of the in-process cache."""
+    cache = TimedLRUCache(2)
+
+    with patch("invenio_oaiserver.cache.time.monotonic", return_value=0):
+        cache.set("a", 1, 10)
+        cache.set("b", 2, 60)
+        assert cache.get("a") == 1
+        # "b" is the least recently used
+        cache.set("c", 3, 60)
+        assert cache.get("b") is None
+        assert len(cache) == 2
+
+    # expired values are evicted when a value is added
+    with patch("invenio_oaiserver.cache.time.monotonic", return_value=30):
+        cache.set("d", 4, 60)
+        assert len(cache) == 2
+        assert cache.get("a") is None
+        assert cache.get("c") == 3
+
+
+def test_earliest_datestamp_timeout(app):
+    """Test the timeout of the in-process earliest datestamp."""
+    app.config["OAISERVER_IDENTIFY_CACHE_TIMEOUT"] = 10
+
+    with patch("invenio_oaiserver.cache.time.monotonic", return_value=0):
+        current_oaiserver.earliest_datestamp = "2000-01-01T13:00:00+00:00"
+        assert current_oaiserver.earliest_datestamp == "2000-01-01T13:00:00+00:00"
+
+    with patch("invenio_oaiserver.cache.time.monotonic", return_value=10):
+        assert current_oaiserver.earliest_datestamp is None
+
+
+def test_lru_page_cache(app):
+    """Test the timeout of the in-process page cache."""
+    app.config["OAISERVER_PAGE_CACHE_MAX_SIZE"] = 10
+    app.config["OAISERVER_PAGE_CACHE_TIMEOUT"] = 60
+    cache = LRUPageCache(app)
+
+    with patch("invenio_oaiserver.cache.time.monotonic", return_value=0):
+        cache.set("a", b"1234")
+        cache.set("b", b"1234")
+        cache.set("c", b"1234")
+    assert cache.evictions == 1
+
+    with patch("invenio_oaiserver.cache.time.monotonic", return_value=30):
+        assert cache.get("b") == b"1234"
+    with patch("invenio_oaiserver.cache.time.monotonic", return_value=61):
+        assert cache.get("c") is None
+    assert len(cache) == 1
+    assert cache.size == 4
+
+
+def test_listrecords_fragment_cache(app):
+    """Test that the fragments are cached by record version."""
+    app.config["OAISERVER_FRAGMENT_CACHE"] = "invenio_oaiserver.cache:LRUFragmentCache"
+    record = create_record(app, {"title_statement": {"title": "Test0"}})
+    current_search.flush_and_refresh("_all")
+
+    def titles():
+        with app.test_client() as c:
+            result = c.get("/oai2d?verb=ListRecords&metadataPrefix=oai_dc")
+        tree = etree.fromstring(result.data)
+        return tree.xpath(
+            "//x:metadata//dc:title/text()",
+            namespaces=dict(NAMESPACES, dc="http://purl.org/dc/elements/1.1/"),
+        )
+
+    assert titles() == ["Test0"]
+    cache = current_oaiserver.fragment_cache
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    assert titles() == ["Test0"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    with app.test_request_context():
+        record["title_statement"]["title"] = "Test1"
+        record.commit()
+        db.session.commit()
+        RecordIndexer().index(record)
+    current_search.flush_and_refresh("_all")
+
+    assert titles() == ["Test1"]
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_prerendered_fragments(app):
+    """Test the metadata formats rendered at index time."""
+    from unittest.mock import patch
+
+    from invenio_oaiserver.cli import check_prerendered
+    from invenio_oaiserver.query import get_records
+
+    app.config.update(
+        OAISERVER_PRERENDER_FORMATS=["oai_dc"],
+        OAISERVER_GETRECORD_FETCHER="invenio_oaiserver.utils:search_getrecord_fetcher",
+    )
+    current_oaiserver.register_signals_record()
+    try:
+        record = create_record(app, {"title_statement": {"title": "Test0"}})
+        current_search.flush_and_refresh("_all")
+
+        hit = next(get_records(metadataPrefix="oai_dc").items)["json"]
+        assert "Test0" in hit["_source"]["_oai"]["rendered"]["oai_dc"][0]
+
+        with patch("invenio_oaiserver.response.serializer") as serializer:
+            with app.test_client() as c:
+                for url in [
+                    "/oai2d?verb=ListRecords&metadataPrefix=oai_dc",
+                    "/oai2d?verb=GetRecord&metadataPrefix=oai_dc&identifier={0}".format(
+                        record["_oai"]["id"]
+                    ),
+                ]:
+                    tree = etree.fromstring(c.get(url).data)
+                    assert tree.xpath(
+                        "//x:metadata//dc:title/text()",
+                        namespaces=dict(
+                            NAMESPACES, dc="http://purl.org/dc/elements/1.1/"
+                        ),
+                    ) == ["Test0"]
+            serializer.assert_not_called()
+
+        runner = app.test_cli_runner()
+        result = runner.invoke(check_prerendered)
+        assert result.exit_code == 0
+        result = runner.invoke(check_prerendered, ["-p", "marc21"])
+        assert result.exit_code == 1
+        assert "missing" in result.output
+    finally:
+        current_oaiserver.unregister_signals_record()
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_page_replay_cache(app, streaming):
+    """Test that a retried resumption token returns the same page."""
+    for idx in range(25):
+        create_record(app, {"title_statement": {"title": "Test{0}".format(idx)}})
+    current_search.flush_and_refresh("_all")
+
+    app.config["OAISERVER_PAGE_CACHE"] = "invenio_oaiserver.cache:LRUPageCache"
+    app.config["OAISERVER_STREAMING_RESPONSE"] = streaming
+    current_oaiserver._page_cache = None
+
+    with app.test_client() as c:
+        token = etree.fromstring(
+            c.get("/oai2d?verb=ListRecords&metadataPrefix=oai_dc").data
+        ).xpath("//x:resumptionToken/text()", namespaces=NAMESPACES)[0]
+        url = "/oai2d?verb=ListRecords&resumptionToken={0}".format(token)
+        first = c.get(url).data
+        replayed = c.get(url).data
+
+    assert replayed == first
+    cache = current_oaiserver.page_cache
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # the replay did not advance the scroll
+    tree = etree.fromstring(first)
+    next_token = tree.xpath("//x:resumptionToken/text()", namespaces=NAMESPACES)[0]
+    identifiers = tree.xpath("//x:header/x:identifier/text()", namespaces=NAMESPACES)
+    with app.test_client() as c:
+        tree = etree.fromstring(
+            c.get("/oai2d?verb=ListRecords&resumptionToken=" + next_token).data
+        )
+    identifiers += tree.xpath("//x:header/x:identifier/text()", namespaces=NAMESPACES)
+    assert len(set(identifiers)) == 20
+
+    # the pages larger than the cache are not cached
+    app.config["OAISERVER_PAGE_CACHE_MAX_SIZE"] = 100
+    current_oaiserver._page_cache = None
+    with app.test_client() as c:
+        assert c.get(url).status_code == 200
+    assert len(current_oaiserver.page_cache) == 0
@@ -0,0 +1,99 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Dublin Core serializer test cases."""
+
+import json
+import os
+import shutil
+from copy import deepcopy
+from importlib.resources import files
+
+import pytest
+from dojson.contrib.marc21 import marc21
+from dojson.contrib.marc21.utils import load
+from lxml import etree
+
+from invenio_oaiserver.oai_dc import dumps_oai_dc
+from invenio_oaiserver.utils import dumps_etree
+
+XSLT_FILENAME = os.path.join(
+    files("invenio_oaiserver"), "static/xsl/MARC21slim2OAIDC.xsl"
+)
+
+
+def _canonical(element):
+    """Return the canonical form of an element."""
+    return etree.tostring(element, method="c14n", exclusive=True)
+
+
+def _assert_same_as_xslt(source):
+    """Check that both serializers create the same element."""
+    expected = dumps_etree(
+        None, {"_source": deepcopy(source)}, xslt_filename=XSLT_FILENAME
+    )
+    assert _canonical(dumps_oai_dc(None, {"_source": source})) == _canonical(expected)
+
+
+@pytest.mark.parametrize(
+    "record",
+    list(load(files("invenio_records") / "data/marc21/bibliographic.xml")),
+)
+def test_dumps_oai_dc_bibliographic(record):
+    """Test the serializer on the bibliographic test records."""
+    _assert_same_as_xslt(json.loads(json.dumps(dict(marc21.do(record)))))
+
+
+def test_dumps_oai_dc():
+    """Test the serializer on records without field order."""
+    _assert_same_as_xslt({"title_statement": {"title": "Test0"}})
+    _assert_same_as_xslt(
+        {
+            "leader": {
+                "type_of_record": "manuscript_language_material",
+                "bibliographic_level": "collection",
+            },
+            "fixed_length_data_elements": "850101s1985    xx            000 0 fre d",
+            "title_statement": {"title": "Test0", "remainder_of_title": "Test1"},
+            "main_entry_personal_name": {"personal_name": "Doe, John"},
+            "added_entry_personal_name": [
+                {"personal_name": "Doe, Jane", "relator_term": ["ed."]},
+                {"personal_name": "Roe, Richard"},
+            ],
+            "publication_distribution_imprint": [
+                {"date_of_publication_distribution": ["2000"]},
+            ],
+            "international_standard_book_number": [
+                {"international_standard_book_number": "0-123-45678-9"},
+            ],
+            "summary": [{"summary": "Summary"}],
+        }
+    )
+
+    e_dc = dumps_oai_dc(None, {"_source": {"title_statement": {"title": "Test0"}}})
+    assert e_dc.findtext("{http://purl.org/dc/elements/1.1/}title") == "Test0"
+
+
+def test_xslt_transform(tmp_path):
+    """Test the cache of the compiled XSLT transformations."""
+    from threading import Thread
+
+    from invenio_oaiserver.utils import xslt_transform
+
+    shutil.copytree(os.path.dirname(XSLT_FILENAME), str(tmp_path / "xsl"))
+    filename = str(tmp_path / "xsl" / os.path.basename(XSLT_FILENAME))
+
+    transform = xslt_transform(filename)
+    assert xslt_transform(filename) is transform
+
+    # the transformations are not shared between threads
+    transforms = []
+    thread = Thread(target=lambda: transforms.append(xslt_transform(filename)))
+    thread.start()
+    thread.join()
+    assert transforms[0] is not transform
+
+    # a modified file is compiled again
+    mtime = os.path.getmtime(filename)
+    os.utime(filename, (mtime + 1, mtime + 1))
+    assert xslt_transform(filename) is not transform
@@ -76,3 +76,166 @@ def test_search_pattern_change(without_oaiset_signals, test0):
     # check records is not in set
     with pytest.raises(OAINoRecordsMatchError):
         get_records(set="test")
+
+
+def test_percolator_index_cache(app):
+    """Test that the percolator index is only read once, and never created."""
+    from unittest.mock import patch
+
+    from invenio_oaiserver.percolator import (
+        _build_percolator_index_name,
+        _find_percolator_index_name,
+        clear_percolator_index_cache,
+        init_percolator_indices,
+        sets_search_all,
+    )
+
+    index = app.config["OAISERVER_RECORD_INDEX"]
+    # without sets, there is nothing to percolate
+    assert _build_percolator_index_name(index) is None
+    assert sets_search_all([{"title_statement": {"title": "Test0"}}]) == [[]]
+
+    assert init_percolator_indices()
+    clear_percolator_index_cache()
+    with (
+        patch(
+            "invenio_oaiserver.percolator._find_percolator_index_name",
+            wraps=_find_percolator_index_name,
+        ) as find,
+        patch("invenio_oaiserver.percolator._resolve_percolator_index_name") as resolve,
+    ):
+        _build_percolator_index_name(index)
+        _build_percolator_index_name(index)
+        assert find.call_count == 1
+        assert not resolve.called
+
+    # a failed resolution keeps the resolved names
+    with (
+        patch(
+            "invenio_oaiserver.percolator._resolve_percolator_index_name",
+            side_effect=ConnectionError,
+        ),
+        pytest.raises(ConnectionError),
+    ):
+        init_percolator_indices()
+    assert _build_percolator_index_name(index)
+
+
+@pytest.mark.parametrize("size", [None, 1, 100])
+def test_percolator_search_size(app, without_oaiset_signals, schema, size):
+    """Test that sets are found with the search and with the scan."""
+    from invenio_oaiserver.percolator import sets_search_all
+
+    app.config["OAISERVER_PERCOLATOR_SEARCH_SIZE"] = size
+    create_oaiset("test0", "Test0")
+    create_oaiset("test1", "Test0")
+
+    sets = sets_search_all(
+        [{"title_statement": {"title": "Test0"}}, {"title_statement": {"title": "x"}}]
+    )
+    assert sorted(sets[0]) == ["test0", "test1"]
+    assert sets[1] == []
+
+
+def test_sets_search_by_ids(app, without_oaiset_signals, schema):
+    """Test that indexed records are percolated by id."""
+    from invenio_oaiserver.percolator import create_percolate_query, sets_search_by_ids
+
+    query = create_percolate_query(
+        percolator_ids=["oaiset-test0"],
+        document_search_ids=["1", "2"],
+        document_search_indices=["records", "records"],
+    )["query"]["bool"]
+    assert [q["percolate"]["name"] for q in query["should"]] == [
+        "records:1",
+        "records:2",
+    ]
+    assert query["filter"] == [{"ids": {"values": ["oaiset-test0"]}}]
+
+    create_oaiset("test0", "Test0")
+    create_oaiset("test1", "Test1")
+    for title in ("Test0", "Test1", "x"):
+        create_record(app, {"title_statement": {"title": title}, "$schema": schema})
+    current_search.flush_and_refresh("records")
+
+    hits = sorted(
+        (next(get_records(set=spec).items)["json"] for spec in ("test0", "test1")),
+        key=lambda hit: hit["_source"]["title_statement"]["title"],
+    )
+    assert sets_search_by_ids(hits) == [["test0"], ["test1"]]
+    assert sets_search_by_ids(hits[1:]) == [["test1"]]
+
+
+def test_materialize_sets(app, schema):
+    """Test that the sets are stored in ``_oai.sets`` at index time."""
+    from invenio_oaiserver import current_oaiserver
+
+    app.config["OAISERVER_MATERIALIZE_SETS"] = True
+    current_oaiserver.register_signals_record()
+    try:
+        create_oaiset("test", "Test0")
+        record = create_record(
+            app, {"title_statement": {"title": "Test0"}, "$schema": schema}
+        )
+        current_search.flush_and_refresh("records")
+
+        rec_in_set = get_records(set="test")
+        assert rec_in_set.total == 1
+        rec = next(rec_in_set.items)
+        assert rec["json"]["_source"]["_oai"]["sets"] == ["test"]
+        assert rec["id"] == str(record.id)
+
+        # Changing the set reindexes its records.
+        oaiset = OAISet.query.filter_by(spec="test").one()
+        oaiset.search_pattern = "title_statement.title:Test1"
+        db.session.commit()
+        current_search.flush_and_refresh("records")
+        with pytest.raises(OAINoRecordsMatchError):
+            get_records(set="test")
+    finally:
+        current_oaiserver.unregister_signals_record()
+
+
+def test_materialize_sets_after_commit(app):
+    """Test that the records are updated once the set change is committed."""
+    from unittest.mock import patch
+
+    app.config["OAISERVER_MATERIALIZE_SETS"] = True
+    with patch("invenio_oaiserver.tasks.update_records_sets.delay") as delay:
+        db.session.add(OAISet(spec="rolledback", search_pattern="title:Test0"))
+        db.session.flush()
+        db.session.rollback()
+        assert not delay.called
+
+        with db.session.begin_nested():
+            db.session.add(OAISet(spec="test", search_pattern="title:Test0"))
+        assert not delay.called
+        db.session.commit()
+        delay.assert_called_once_with("test", search_pattern="title:Test0")
+
+
+def test_set_query_cache(app, without_oaiset_signals):
+    """Test that the compiled set queries are cached."""
+    from unittest.mock import patch
+
+    from invenio_oaiserver.fetchers import (
+        clear_set_query_cache,
+        set_records_query_fetcher,
+    )
+    from invenio_oaiserver.proxies import current_oaiserver
+
+    app.config["OAISERVER_SET_QUERY_CACHE_TIMEOUT"] = 60
+    create_oaiset("test", "Test0")
+    query = set_records_query_fetcher("test")
+
+    with patch("invenio_oaiserver.fetchers.OAISet") as model:
+        assert set_records_query_fetcher("test") == query
+        assert not model.query.filter.called
+
+        clear_set_query_cache("test")
+        set_records_query_fetcher("test")
+        assert model.query.filter.called
+
+    # the unknown sets are not cached
+    set_records_query_fetcher("unknown")
+    assert len(current_oaiserver.set_queries) == 1
@@ -0,0 +1,433 @@
+# SPDX-FileCopyrightText: 2026 CERN.
+# SPDX-License-Identifier: MIT
+
+"""Query test cases."""
+
+import pytest
+from helpers import create_record
+from invenio_search import current_search
+from lxml import etree
+
+from invenio_oaiserver.response import NS_OAIPMH
+
+NAMESPACES = {"x": NS_OAIPMH}
+
+
+def _harvest(app, verb="ListRecords"):
+    """Harvest all pages and return the list of identifiers."""
+    identifiers = []
+    url = "/oai2d?verb={0}&metadataPrefix=oai_dc".format(verb)
+    with app.test_client() as c:
+        while url:
+            result = c.get(url)
+            assert result.status_code == 200
+            tree = etree.fromstring(result.data)
+            identifiers.extend(
+                tree.xpath("//x:header/x:identifier/text()", namespaces=NAMESPACES)
+            )
+            token = tree.xpath("//x:resumptionToken/text()", namespaces=NAMESPACES)
+            url = (
+                "/oai2d?verb={0}&resumptionToken={1}".format(verb, token[0])
+                if token
+                else None
+            )
+    return identifiers
+
+
+@pytest.fixture()
+def records(app):
+    """Create and index 25 records."""
+    created = [
+        create_record(app, {"title_statement": {"title": "Test{0}".format(idx)}})
+        for idx in range(25)
+    ]
+    current_search.flush_and_refresh("_all")
+    return created
+
+
+@pytest.mark.parametrize("mode", ["scroll", "pit"])
+@pytest.mark.parametrize("verb", ["ListRecords", "ListIdentifiers"])
+def test_pagination_modes(app, records, mode, verb):
+    """Test that every pagination mode returns all records exactly once."""
+    app.config["OAISERVER_PAGINATION_MODE"] = mode
+
+    identifiers = _harvest(app, verb)
+
+    assert len(identifiers) == len(records)
+    assert set(identifiers) == {r["_oai"]["id"] for r in records}
+
+
+@pytest.mark.parametrize("mode", ["scroll", "pit"])
+def test_resume_after_context_expired(app, records, mode):
+    """Test that a harvest resumes when the search context has expired."""
+    from invenio_search import current_search_client
+    from itsdangerous import URLSafeTimedSerializer
+
+    from invenio_oaiserver.query import _close_point_in_time
+
+    app.config.update(
+        OAISERVER_PAGINATION_MODE=mode, OAISERVER_SCROLL_SEARCH_AFTER=True
+    )
+    token_builder = URLSafeTimedSerializer(
+        app.config["SECRET_KEY"], salt="ListIdentifiers"
+    )
+
+    identifiers = []
+    url = "/oai2d?verb=ListIdentifiers&metadataPrefix=oai_dc"
+    with app.test_client() as c:
+        while url:
+            tree = etree.fromstring(c.get(url).data)
+            identifiers.extend(
+                tree.xpath("//x:header/x:identifier/text()", namespaces=NAMESPACES)
+            )
+            token = tree.xpath("//x:resumptionToken/text()", namespaces=NAMESPACES)
+            url = None
+            if token:
+                # Drop the search context behind the token.
+                data = token_builder.loads(token[0])
+                assert data["search_after"]
+                if "scroll_id" in data:
+                    current_search_client.clear_scroll(scroll_id=data["scroll_id"])
+                if "pit_id" in data:
+                    _close_point_in_time(data["pit_id"])
+                url = "/oai2d?verb=ListIdentifiers&resumptionToken={0}".format(token[0])
+
+    assert len(identifiers) == len(records)
+    assert set(identifiers) == {r["_oai"]["id"] for r in records}
+
+
+def test_expired_context_without_position(app, records):
+    """Test that an expired scroll without last position is a bad token."""
+    from invenio_search import current_search_client
+    from itsdangerous import URLSafeTimedSerializer
+
+    token_builder = URLSafeTimedSerializer(
+        app.config["SECRET_KEY"], salt="ListIdentifiers"
+    )
+
+    with app.test_client() as c:
+        tree = etree.fromstring(
+            c.get("/oai2d?verb=ListIdentifiers&metadataPrefix=oai_dc").data
+        )
+        token = tree.xpath("//x:resumptionToken/text()", namespaces=NAMESPACES)[0]
+        data = token_builder.loads(token)
+        assert not data.get("search_after")
+        current_search_client.clear_scroll(scroll_id=data["scroll_id"])
+
+        tree = etree.fromstring(
+            c.get("/oai2d?verb=ListIdentifiers&resumptionToken={0}".format(token)).data
+        )
+
+    assert tree.xpath("/x:OAI-PMH/x:error/@code", namespaces=NAMESPACES) == [
+        "badResumptionToken"
+    ]
+
+
+@pytest.mark.parametrize("mode", ["scroll", "pit"])
+def test_compact_resumption_token(app, records, mode):
+    """Test the harvest with compact tokens and the rollover of the layout."""
+    from invenio_oaiserver.resumption_token import loads
+
+    app.config.update(
+        OAISERVER_PAGINATION_MODE=mode, OAISERVER_SCROLL_SEARCH_AFTER=True
+    )
+    url = "/oai2d?verb=ListIdentifiers&metadataPrefix=oai_dc"
+    with app.test_client() as c:
+        legacy = etree.fromstring(c.get(url).data).xpath(
+            "//x:resumptionToken/text()", namespaces=NAMESPACES
+        )[0]
+
+        app.config["OAISERVER_RESUMPTION_TOKEN_VERSION"] = 2
+        token = etree.fromstring(c.get(url).data).xpath(
+            "//x:resumptionToken/text()", namespaces=NAMESPACES
+        )[0]
+        assert len(token) < len(legacy)
+        with app.test_request_context():
+            data = loads("ListIdentifiers", token)
+            assert data["kwargs"] == {"metadataPrefix": "oai_dc"}
+            assert data["page"] == 2
+            assert data["search_after"]
+
+        # tokens issued before the rollover are still accepted
+        for value in [legacy, token]:
+            result = c.get(
+                "/oai2d?verb=ListIdentifiers&resumptionToken={0}".format(value)
+            )
+            tree = etree.fromstring(result.data)
+            assert len(tree.xpath("//x:header", namespaces=NAMESPACES)) == 10
+
+    assert set(_harvest(app, "ListIdentifiers")) == {r["_oai"]["id"] for r in records}
+
+
+@pytest.mark.parametrize("store", ["MemoryTokenStore", "SQLTokenStore"])
+def test_resumption_token_store(app, records, store):
+    """Test the harvest with the resumption tokens stored on the server."""
+    from invenio_oaiserver.cli import tokens
+    from invenio_oaiserver.proxies import current_oaiserver
+
+    app.config["OAISERVER_RESUMPTION_TOKEN_STORE"] = (
+        "invenio_oaiserver.token_store:{0}".format(store)
+    )
+    current_oaiserver._token_store = None
+
+    with app.test_client() as c:
+        tree = etree.fromstring(
+            c.get("/oai2d?verb=ListRecords&metadataPrefix=oai_dc").data
+        )
+    token = tree.xpath("//x:resumptionToken/text()", namespaces=NAMESPACES)[0]
+    assert "." not in token
+    assert len(token) < 32
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(tokens, ["list"])
+    assert token in result.output
+    assert "page=2" in result.output
+
+    # the token is bound to its verb
+    with app.test_client() as c:
+        result = c.get("/oai2d?verb=ListIdentifiers&resumptionToken=" + token)
+        assert b"badResumptionToken" in result.data
+
+    assert set(_harvest(app)) == {r["_oai"]["id"] for r in records}
+
+    result = runner.invoke(tokens, ["revoke", token])
+    assert result.exit_code == 0
+    with app.test_client() as c:
+        result = c.get("/oai2d?verb=ListRecords&resumptionToken=" + token)
+        assert b"badResumptionToken" in result.data
+
+    result = runner.invoke(tokens, ["sweep"])
+    assert result.exit_code == 0
+
+
+@pytest.mark.parametrize("mode", ["scroll", "pit"])
+def test_prefetch_next_page(app, records, mode):
+    """Test the harvest with the next pages prefetched in the background."""
+    from invenio_oaiserver.proxies import current_oaiserver
+
+    app.config.update(
+        OAISERVER_PAGINATION_MODE=mode,
+        OAISERVER_SCROLL_SEARCH_AFTER=True,
+        OAISERVER_PREFETCH_WORKERS=1,
+        OAISERVER_PREFETCH_SERIALIZE=True,
+        OAISERVER_FRAGMENT_CACHE="invenio_oaiserver.cache:LRUFragmentCache",
+    )
+    current_oaiserver._fragment_cache = None
+    current_oaiserver._prefetched_pages = None
+
+    identifiers = _harvest(app)
+    assert len(identifiers) == len(records)
+    assert set(identifiers) == {r["_oai"]["id"] for r in records}
+
+    pages = current_oaiserver.prefetched_pages
+    assert (pages.hits, pages.misses) == (2, 0)
+    assert len(pages) == 0
+    # the records of the prefetched pages were serialized in the background
+    assert current_oaiserver.fragment_cache.hits == 15
+
+
+def test_prefetched_pages_cancel_dropped(app):
+    """Test that the futures of the dropped pages are cancelled."""
+    from concurrent.futures import Future
+
+    from invenio_oaiserver.prefetch import PrefetchedPages
+
+    app.config["OAISERVER_PREFETCH_MAX_PAGES"] = 2
+    pages = PrefetchedPages(app)
+    futures = [Future() for _ in range(3)]
+    for key, future in enumerate(futures):
+        pages.put(key, future)
+
+    assert [future.cancelled() for future in futures] == [True, False, False]
+    assert len(pages) == pages.pending == 2
+    assert pages.pop(1) is futures[1]
+    assert pages.pending == 1
+
+
+@pytest.mark.parametrize("mode", ["scroll", "pit"])
+def test_track_total_hits(app, records, mode):
+    """Test the harvest with a limited count of the hits."""
+    from invenio_oaiserver.proxies import current_oaiserver
+
+    app.config.update(OAISERVER_PAGINATION_MODE=mode, OAISERVER_TRACK_TOTAL_HITS=5)
+    url = "/oai2d?verb=ListIdentifiers&metadataPrefix=oai_dc"
+
+    assert set(_harvest(app, "ListIdentifiers")) == {r["_oai"]["id"] for r in records}
+    with app.test_client() as c:
+        token = etree.fromstring(c.get(url).data).xpath(
+            "//x:resumptionToken", namespaces=NAMESPACES
+        )[0]
+    assert token.get("completeListSize") is None
+    assert token.get("cursor") == "0"
+
+    # the size of the list is counted once
+    app.config["OAISERVER_LIST_SIZE_CACHE_TIMEOUT"] = 60
+    with app.test_client() as c:
+        for _ in range(2):
+            token = etree.fromstring(c.get(url).data).xpath(
+                "//x:resumptionToken", namespaces=NAMESPACES
+            )[0]
+            assert token.get("completeListSize") == "25"
+    assert len(current_oaiserver.list_sizes) == 1
+
+
+def test_source_filter(app):
+    """Test the ``_source`` filtering of a metadata format."""
+    from invenio_db import db
+
+    from invenio_oaiserver.models import OAISet
+    from invenio_oaiserver.query import get_records
+
+    db.session.add(OAISet(spec="articles", search_pattern="genre:Article"))
+    db.session.commit()
+    create_record(app, {"title_statement": {"title": "Test0"}, "genre": "Article"})
+    current_search.flush_and_refresh("_all")
+
+    hit = get_records(metadataPrefix="oai_dc").response["hits"]["hits"][0]
+    assert "genre" in hit["_source"]
+
+    app.config["OAISERVER_METADATA_FORMATS"]["oai_dc"]["source"] = {
+        "includes": ["title_statement"],
+    }
+    try:
+        hit = get_records(metadataPrefix="oai_dc").response["hits"]["hits"][0]
+        assert "genre" not in hit["_source"]
+        assert hit["_source"]["title_statement"]["title"] == "Test0"
+        assert hit["_source"]["_oai"]["id"]
+        assert hit["_source"]["_updated"]
+
+        # the record is percolated by id, with the filtered out fields
+        with app.test_client() as c:
+            tree = etree.fromstring(
+                c.get("/oai2d?verb=ListRecords&metadataPrefix=oai_dc").data
+            )
+        assert tree.xpath("//x:header/x:setSpec/text()", namespaces=NAMESPACES) == [
+            "articles"
+        ]
+    finally:
+        del app.config["OAISERVER_METADATA_FORMATS"]["oai_dc"]["source"]
+
+
+def test_listidentifiers_source_free(app, records):
+    """Test ListIdentifiers without fetching the ``_source``."""
+    from invenio_oaiserver.query import get_records
+
+    app.config["OAISERVER_LISTIDENTIFIERS_SOURCE_FREE"] = True
+
+    hit = get_records(verb="ListIdentifiers").response["hits"]["hits"][0]
+    assert "_source" not in hit
+    assert hit["fields"]["_oai.id"]
+
+    identifiers = _harvest(app, "ListIdentifiers")
+    assert set(identifiers) == {r["_oai"]["id"] for r in records}
+
+
+@pytest.mark.parametrize("verb", ["ListRecords", "ListIdentifiers"])
+def test_streaming_response(app, records, verb):
+    """Test that streamed responses contain all records."""
+    app.config["OAISERVER_STREAMING_RESPONSE"] = True
+
+    with app.test_client() as c:
+        result = c.get("/oai2d?verb={0}&metadataPrefix=oai_dc".format(verb))
+        assert result.is_streamed
+
+    identifiers = _harvest(app, verb)
+    assert set(identifiers) == {r["_oai"]["id"] for r in records}
+
+    # the namespace is only declared by the root element
+    with app.test_client() as c:
+        result = c.get("/oai2d?verb={0}&metadataPrefix=oai_dc".format(verb))
+    assert result.data.count('xmlns="{0}"'.format(NS_OAIPMH).encode()) == 1
+
+
+def test_streaming_response_error(app, records):
+    """Test the serializer errors of a streamed response."""
+    from unittest.mock import patch
+
+    from invenio_oaiserver import response
+
+    app.config["OAISERVER_STREAMING_RESPONSE"] = True
+    app.config["OAISERVER_PAGE_SIZE"] = 10
+    record_fragments = response.record_fragments
+    calls = []
+
+    def fail_third(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 3:
+            raise ValueError()
+        return record_fragments(*args, **kwargs)
+
+    # an error on the first record is raised before the response starts
+    with (
+        patch("invenio_oaiserver.response.record_fragments", side_effect=ValueError),
+        app.test_client() as c,
+        pytest.raises(ValueError),
+    ):
+        c.get("/oai2d?verb=ListRecords&metadataPrefix=oai_dc")
+
+    # a later error ends the list without the resumption token
+    with (
+        patch("invenio_oaiserver.response.record_fragments", side_effect=fail_third),
+        app.test_client() as c,
+    ):
+        result = c.get("/oai2d?verb=ListRecords&metadataPrefix=oai_dc")
+
+    tree = etree.fromstring(result.data)
+    assert (
+        len(tree.xpath("/x:OAI-PMH/x:ListRecords/x:record", namespaces=NAMESPACES)) == 2
+    )
+    assert tree.xpath("//x:resumptionToken", namespaces=NAMESPACES) == []
+    assert tree.xpath("//x:error", namespaces=NAMESPACES) == []
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+@pytest.mark.parametrize("coding", ["gzip", "deflate"])
+def test_compression(app, records, streaming, coding):
+    """Test the content coding of the responses."""
+    import zlib
+
+    from invenio_oaiserver.views.server import CONTENT_CODINGS
+
+    app.config["OAISERVER_STREAMING_RESPONSE"] = streaming
+    app.config["OAISERVER_COMPRESSIONS"] = ["identity", "gzip", "deflate"]
+    app.config["OAISERVER_COMPRESSION_MIN_SIZE"] = 0
+    url = "/oai2d?verb=ListRecords&metadataPrefix=oai_dc"
+
+    with app.test_client() as c:
+        plain = c.get(url)
+        assert "Content-Encoding" not in plain.headers
+        assert plain.headers["Vary"] == "Accept-Encoding"
+
+        result = c.get(url, headers={"Accept-Encoding": coding})
+        assert result.headers["Content-Encoding"] == coding
+        assert len(result.data) < len(plain.data)
+        tree = etree.fromstring(zlib.decompress(result.data, CONTENT_CODINGS[coding]))
+        assert len(tree.xpath("//x:record", namespaces=NAMESPACES)) == 10
+
+        app.config["OAISERVER_COMPRESSIONS"] = ["identity"]
+        result = c.get(url, headers={"Accept-Encoding": coding})
+        assert "Content-Encoding" not in result.headers
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_serialization_workers(app, records, processes):
+    """Test that parallel serialization keeps the order of the records."""
+    from invenio_oaiserver.proxies import current_oaiserver
+
+    url = "/oai2d?verb=ListRecords&metadataPrefix=oai_dc"
+    with app.test_client() as c:
+        expected = etree.fromstring(c.get(url).data)
+
+    app.config["OAISERVER_SERIALIZATION_WORKERS"] = 2
+    app.config["OAISERVER_METADATA_FORMATS"]["oai_dc"]["processes"] = processes
+    try:
+        with app.test_client() as c:
+            tree = etree.fromstring(c.get(url).data)
+    finally:
+        del app.config["OAISERVER_METADATA_FORMATS"]["oai_dc"]["processes"]
+        current_oaiserver.shutdown_executors()
+
+    for path in ["//x:header/x:identifier/text()", "//x:metadata//text()"]:
+        assert tree.xpath(path, namespaces=NAMESPACES) == expected.xpath(
+            path, namespaces=NAMESPACES
+        )
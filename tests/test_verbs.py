@@ -253,6 +253,112 @@ def test_identify_earliest_date(app, schema):
         assert earliestDatestamp[0].text == "2000-01-01T13:00:00Z"
 
 
+def test_identify_cache(app, schema):
+    """Test the cached identify response."""
+    app.config["OAISERVER_IDENTIFY_CACHE"] = True
+    current_oaiserver.register_signals_record()
+
+    def earliest_datestamp():
+        with app.test_client() as c:
+            result = c.get("/oai2d?verb=Identify")
+        assert 200 == result.status_code
+        tree = etree.fromstring(result.data)
+        return tree.xpath(
+            "/x:OAI-PMH/x:Identify/x:earliestDatestamp/text()", namespaces=NAMESPACES
+        )[0]
+
+    try:
+        record = create_record(
+            app, {"title_statement": {"title": "Test0"}, "$schema": schema}
+        )
+        app.extensions["invenio-search"].flush_and_refresh("records")
+        earliest = earliest_datestamp()
+        assert earliest != "0001-01-01T00:00:00Z"
+        assert earliest_datestamp() == earliest
+
+        # a newer record does not move the watermark
+        create_record(app, {"title_statement": {"title": "Test1"}, "$schema": schema})
+        assert earliest_datestamp() == earliest
+
+        record.model.created = datetime(2000, 1, 1, 13, 0, 0)
+        RecordIndexer().index(record)
+        assert earliest_datestamp() == "2000-01-01T13:00:00Z"
+    finally:
+        current_oaiserver.unregister_signals_record()
+
+
+def test_conditional_requests(app):
+    """Test the conditional GetRecord requests."""
+    app.config["OAISERVER_CONDITIONAL_REQUESTS"] = True
+    app.config["OAISERVER_CACHE_CONTROL"] = {"GetRecord": "public, max-age=60"}
+    record = create_record(app, {"title_statement": {"title": "Test0"}})
+    url = "/oai2d?verb=GetRecord&metadataPrefix=oai_dc&identifier={0}".format(
+        record["_oai"]["id"]
+    )
+
+    with app.test_client() as c:
+        result = c.get(url)
+        assert result.status_code == 200
+        assert result.headers["Cache-Control"] == "public, max-age=60"
+        etag = result.headers["ETag"]
+        assert etag.startswith("W/")
+        assert result.headers["Last-Modified"]
+
+        result = c.get(url, headers={"If-None-Match": etag})
+        assert result.status_code == 304
+        assert not result.data
+
+        with app.test_request_context():
+            record["title_statement"]["title"] = "Test1"
+            record.commit()
+            db.session.commit()
+
+        result = c.get(url, headers={"If-None-Match": etag})
+        assert result.status_code == 200
+        assert result.headers["ETag"] != etag
+
+
+def test_getrecord_from_index(app):
+    """Test GetRecord with the search fetcher."""
+    from unittest.mock import patch
+
+    from invenio_oaiserver.provider import OAIIDProvider
+
+    app.config["OAISERVER_GETRECORD_FETCHER"] = (
+        "invenio_oaiserver.utils:search_getrecord_fetcher"
+    )
+    record = create_record(app, {"title_statement": {"title": "Test0"}})
+    url = "/oai2d?verb=GetRecord&metadataPrefix=oai_dc&identifier={0}".format(
+        record["_oai"]["id"]
+    )
+
+    def titles():
+        with app.test_client() as c:
+            tree = etree.fromstring(c.get(url).data)
+        return tree.xpath(
+            "//x:metadata//dc:title/text()",
+            namespaces=dict(NAMESPACES, dc=NS_DC),
+        )
+
+    # not searchable yet, read from the database
+    with patch.object(OAIIDProvider, "get", wraps=OAIIDProvider.get) as get:
+        assert titles() == ["Test0"]
+        get.assert_called_once()
+
+    current_search.flush_and_refresh("_all")
+    with patch.object(OAIIDProvider, "get", wraps=OAIIDProvider.get) as get:
+        assert titles() == ["Test0"]
+        get.assert_not_called()
+
+    # the sets are fetched with the configured fetcher
+    app.config["OAISERVER_RECORD_SETS_FETCHER"] = lambda record: ["custom"]
+    with app.test_client() as c:
+        tree = etree.fromstring(c.get(url).data)
+    assert tree.xpath("//x:header/x:setSpec/text()", namespaces=NAMESPACES) == [
+        "custom"
+    ]
+
+
 def test_getrecord(app):
     """Test get record verb."""
     with app.test_request_context():
@@ -407,6 +513,34 @@ def test_identify_with_additional_args(app):
         assert "You have passed too many arguments." == _xpath_errors(tree)[0].text
 
 
+@pytest.mark.parametrize(
+    "datestamp",
+    ["2020-01-02", "2020-01-02T03:04:05Z", "2020-01-02T03:04:05+00:00", "2020-1-2"],
+)
+def test_from_iso_permissive(datestamp):
+    """Test that the datestamps are parsed like dateutil does."""
+    from dateutil import parser
+
+    from invenio_oaiserver.verbs import DateTime
+
+    assert DateTime.from_iso_permissive(datestamp) == parser.parse(datestamp)
+
+
+def test_request_validator_cache(app):
+    """Test that the verb schemas are initialized once."""
+    from invenio_oaiserver.verbs import make_request_validator
+
+    url = "/oai2d?verb=ListSets"
+    with app.test_request_context(url) as ctx:
+        schema = make_request_validator(ctx.request)
+    with app.test_request_context(url + "&resumptionToken=x") as ctx:
+        assert make_request_validator(ctx.request) is not schema
+    with app.test_request_context(url) as ctx:
+        assert make_request_validator(ctx.request) is schema
+    with app.test_request_context("/oai2d?verb=__class__") as ctx:
+        assert make_request_validator(ctx.request).__class__.__name__ == "OAISchema"
+
+
 def test_listmetadataformats(app):
     """Test ListMetadataFormats."""
     _listmetadataformats(app=app, query="/oai2d?verb=ListMetadataFormats")
@@ -1236,6 +1370,30 @@ def test_list_sets_long(app):
         assert not resumption_token.text
 
 
+def test_listsets_fragment_cache(app):
+    """Test the cached set fragments and their invalidation."""
+    app.config["OAISERVER_SET_FRAGMENT_CACHE_TIMEOUT"] = 60
+    with app.app_context():
+        with db.session.begin_nested():
+            oaiset = OAISet(spec="test", name="Test", search_pattern="title:Test")
+            db.session.add(oaiset)
+        db.session.commit()
+
+    def names():
+        with app.test_client() as c:
+            tree = etree.fromstring(c.get("/oai2d?verb=ListSets").data)
+        return tree.xpath("//x:set/x:setName/text()", namespaces=NAMESPACES)
+
+    assert names() == ["Test"]
+    assert len(current_oaiserver.set_fragments) == 1
+
+    with app.app_context():
+        OAISet.query.filter_by(spec="test").one().name = "Renamed"
+        db.session.commit()
+    assert not current_oaiserver.set_fragments
+    assert names() == ["Renamed"]
+
+
 def test_list_sets_with_resumption_token_and_other_args(app):
     """Test list sets with resumption tokens."""
     pass